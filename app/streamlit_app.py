@@ -3,15 +3,17 @@
 from __future__ import annotations
 
 import asyncio
+import queue
+import threading
+from concurrent.futures import Future
 from datetime import UTC, datetime
-from typing import List
 
 import streamlit as st
 
 from manus.agents.flows import AgentEvent
 from manus.agents.orchestrator import ManusAgent
-from manus.config import LLMConfig, ManusSettings
-from manus.llm import HttpLLMClient
+from manus.config import DEFAULT_PHASE, PLANNING_PHASE, SUMMARY_PHASE, LLMConfig, ManusSettings, PhaseConfig
+from manus.llm import LLMClient, client_from_config
 from manus.memory import MemoryStore
 from manus.tools import build_default_registry
 
@@ -46,6 +48,11 @@ with st.sidebar:
     max_steps = st.slider("最大步骤", min_value=1, max_value=30, value=3)
     temperature = st.slider("Temperature", 0.0, 1.0, 0.2, step=0.05)
     st.divider()
+    st.subheader("分阶段模型")
+    same_as_main = "(与主模型相同)"
+    planner_model = st.selectbox("规划模型", [same_as_main, *model_candidates], index=0)
+    escalate_planning = st.checkbox("规划无法解析时升级到主模型", value=True)
+    summary_model = st.selectbox("总结模型", [same_as_main, *model_candidates], index=0)
 
 task = st.text_area("任务输入", value="列出 Manus 的关键组件", height=120)
 run_button = st.button("运行 Manus", type="primary")
@@ -55,46 +62,100 @@ events_box = st.container()
 final_box = st.container()
 status_placeholder = st.empty()
 
-async def _run(task_text: str):
+class _Runtime:
+    """Process-wide warm state shared by every Streamlit session.
+
+    Holds one tool registry (so the corpus is indexed once), pooled LLM
+    clients, and a background event loop that runs agents without blocking
+    script threads. Blocking tool work (``execute_python``) is pushed to worker
+    threads, so one session's step does not stall the others on this loop.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="manus-streamlit-loop", daemon=True
+        )
+        self.thread.start()
+        self.registry = build_default_registry()
+        self._clients: dict[tuple, LLMClient] = {}
+        self._lock = threading.Lock()
+
+    def client(self, config: LLMConfig) -> LLMClient:
+        key = (config.base_url, config.api_key, tuple(config.replicas), config.hedge_after, config.timeout)
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = client_from_config(config)
+            return self._clients[key]
+
+    def submit(self, coro) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+@st.cache_resource
+def _runtime() -> _Runtime:
+    return _Runtime()
+
+
+def _build_settings() -> ManusSettings:
     settings = ManusSettings()
     settings.llm.model = default_model
     settings.llm.temperature = temperature
     settings.max_steps = max_steps
-    client = HttpLLMClient(
-        base_url=settings.llm.base_url,
-        api_key=settings.llm.api_key,
-        timeout=settings.llm.timeout,
-    )
+    if planner_model != same_as_main:
+        settings.phases[PLANNING_PHASE] = PhaseConfig(
+            model=planner_model, escalate_to=DEFAULT_PHASE if escalate_planning else None
+        )
+    if summary_model != same_as_main:
+        settings.phases[SUMMARY_PHASE] = PhaseConfig(model=summary_model)
+    return settings
+
+
+def _render(event: AgentEvent) -> None:
+    # 每个事件只追加一个新元素，不重绘已有输出
+    if event.type == "plan":
+        steps = event.payload.get("steps", [])
+        markdown = "\n".join(
+            [f"{idx+1}. {step.get('instruction', '')}" for idx, step in enumerate(steps)]
+        )
+        plan_box.subheader("计划")
+        if event.payload.get("escalated"):
+            plan_box.caption(f"规划已升级到 {event.payload.get('model')}")
+        plan_box.markdown(markdown or event.payload.get("raw", "(空)"))
+        events_box.subheader("实时工具输出")
+    elif event.type == "tool":
+        result = event.payload.get("output", {})
+        summary = f"[{datetime.now().strftime('%H:%M:%S')}] {event.message}\n```"
+        summary += f"{result.get('content', '')}"
+        summary += "```"
+        events_box.markdown(summary)
+    elif event.type == "dispatch":
+        events_box.caption(f"[{datetime.now().strftime('%H:%M:%S')}] {event.message}")
+    elif event.type in {"timeout", "rejected"}:
+        events_box.warning(f"[{datetime.now().strftime('%H:%M:%S')}] {event.message}")
+    elif event.type == "final":
+        final_box.subheader("最终回答")
+        final_box.success(event.payload.get("answer", ""))
+
+
+def _run(task_text: str):
+    runtime = _runtime()
+    settings = _build_settings()
     agent = ManusAgent(
         settings=settings,
-        llm_client=client,
-        tool_registry=build_default_registry(),
+        llm_client=runtime.client(settings.llm),
+        tool_registry=runtime.registry,
         memory=MemoryStore(),
     )
-
-    event_log: List[str] = []
-
-    def on_event(event: AgentEvent):
-        if event.type == "plan":
-            steps = event.payload.get("steps", [])
-            markdown = "\n".join(
-                [f"{idx+1}. {step.get('instruction', '')}" for idx, step in enumerate(steps)]
-            )
-            plan_box.subheader("计划")
-            plan_box.markdown(markdown or event.payload.get("raw", "(空)"))
-        elif event.type == "tool":
-            result = event.payload.get("output", {})
-            summary = f"[{datetime.now().strftime('%H:%M:%S')}] {event.message}\n```"
-            summary += f"{result.get('content', '')}"
-            summary += "```"
-            event_log.append(summary)
-            events_box.subheader("实时工具输出")
-            events_box.markdown("\n\n".join(event_log))
-        elif event.type == "final":
-            final_box.subheader("最终回答")
-            final_box.success(event.payload.get("answer", ""))
-
-    result = await agent.arun(task_text, event_callback=on_event)
+    # 事件在后台循环线程产生，经队列交给脚本线程渲染
+    pending: queue.Queue[AgentEvent] = queue.Queue()
+    future = runtime.submit(agent.arun(task_text, event_callback=pending.put))
+    while not (future.done() and pending.empty()):
+        try:
+            _render(pending.get(timeout=0.1))
+        except queue.Empty:
+            continue
+    result = future.result()
     st.session_state.history.append(
         {
             "task": task_text,
@@ -106,13 +167,30 @@ async def _run(task_text: str):
 if run_button and task.strip():
     status_placeholder.info("运行中……")
     try:
-        asyncio.run(_run(task.strip()))
+        _run(task.strip())
         status_placeholder.success("执行完成")
     except Exception as exc:  # pragma: no cover - UI feedback only
         status_placeholder.error(f"运行出错: {exc}")
 else:
     st.info("输入任务并点击运行即可开始。")
 
+with st.sidebar.expander("工具调度"):
+    scheduler = _runtime().registry.scheduler
+    if scheduler is not None:
+        st.table(
+            {
+                name: {
+                    "运行中": m.running,
+                    "排队": m.queued,
+                    "已放行": m.admitted,
+                    "拒绝": m.rejected + m.timed_out,
+                    "平均等待(s)": round(m.mean_wait, 3),
+                    "最长等待(s)": round(m.max_wait, 3),
+                }
+                for name, m in scheduler.metrics().items()
+            }
+        )
+
 if st.session_state.history:
     st.divider()
     st.subheader("运行历史")
@@ -1,7 +1,7 @@
 """Manus lightweight agent package."""
 
-from .config import LLMConfig, ManusSettings
+from .config import LLMConfig, ManusSettings, PhaseConfig
 from .agents.orchestrator import ManusAgent
 
-__all__ = ["LLMConfig", "ManusSettings", "ManusAgent"]
+__all__ = ["LLMConfig", "ManusSettings", "PhaseConfig", "ManusAgent"]
 __version__ = "0.1.0"
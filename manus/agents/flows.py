@@ -10,12 +10,16 @@ class PlanStep:
     index: int
     instruction: str
     suggested_tool: Optional[str] = None
+    # function calling 模式下经 schema 校验的参数，执行时并入 ToolInput.context
+    arguments: Optional[dict[str, Any]] = None
 
 @dataclass
 class Plan:
     task: str
     steps: List[PlanStep]
     raw_text: str
+    model: Optional[str] = None
+    escalated: bool = False
 
 @dataclass
 class AgentEvent:
@@ -2,15 +2,33 @@
 
 from __future__ import annotations
 
-from typing import Callable, List
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Sequence, TypeVar
 
-from ..config import ManusSettings
-from ..llm import ChatMessage, LLMClient
+from ..config import SUMMARY_PHASE, ManusSettings
+from ..events import EventSink
+from ..llm import (
+    PROCESS_USAGE,
+    ChatMessage,
+    LLMClient,
+    UsageLedger,
+    estimate_prompt_tokens,
+    remaining_tokens,
+    usage_for,
+)
 from ..memory import MemoryStore
-from ..tools import ToolInput, ToolRegistry, build_default_registry
-from .flows import AgentEvent, Plan
+from ..tools import ToolInput, ToolOutput, ToolRegistry, ToolRejected, build_default_registry
+from .flows import AgentEvent, Plan, PlanStep
 from .planning import PlanBuilder
 
+T = TypeVar("T")
+
+# 预算剩余不足以写出这么多 token 时不再调用总结模型
+_MIN_SUMMARY_TOKENS = 64
+
 class ManusAgent:
     def __init__(
         self,
@@ -20,12 +38,23 @@ class ManusAgent:
         tool_registry: ToolRegistry | None = None,
         memory: MemoryStore | None = None,
         planner: PlanBuilder | None = None,
+        phase_clients: Mapping[str, LLMClient] | None = None,
+        event_sink: EventSink | None = None,
+        retain_events: bool = True,
     ):
+        if not retain_events and event_sink is None:
+            raise ValueError("不保留事件时必须配置 event_sink")
         self.settings = settings
         self.llm = llm_client
+        self.phase_clients = dict(phase_clients or {})
+        self.event_sink = event_sink
+        # 配置了 sink 时可以不在内存里保留整个 run 的事件，结果中的 events 为空
+        self.retain_events = retain_events
         self.memory = memory or MemoryStore()
         self.tool_registry = tool_registry or build_default_registry()
-        self.planner = planner or PlanBuilder(llm_client=llm_client, settings=settings)
+        self.planner = planner or PlanBuilder(
+            llm_client=llm_client, settings=settings, phase_clients=self.phase_clients
+        )
 
     async def arun(
         self,
@@ -33,58 +62,313 @@ class ManusAgent:
         *,
         max_steps: int | None = None,
         event_callback: Callable[[AgentEvent], None] | None = None,
+        timeout: float | None = None,
     ) -> dict:
         events: List[AgentEvent] = []
+        run_id = uuid.uuid4().hex
 
         def emit(event: AgentEvent):
-            events.append(event)
+            if self.retain_events:
+                events.append(event)
+            if self.event_sink:
+                self.event_sink.write(event, run_id=run_id)
             if event_callback:
                 event_callback(event)
 
-        plan: Plan = await self.planner.build(task, self.memory, self.tool_registry)
+        run_timeout = timeout if timeout is not None else self.settings.run_timeout
+        deadline = work_deadline = None
+        if run_timeout:
+            deadline = time.monotonic() + run_timeout
+            work_deadline = deadline - run_timeout * self.settings.summary_reserve
+        # 未完成的步骤 -> 原因，总结时据此说明答案为何不完整
+        incomplete: Dict[int, str] = {}
+        usage = UsageLedger(parent=PROCESS_USAGE)
+        limit = max_steps or self.settings.max_steps
+
+        planned = False
+        plan = Plan(task=task, steps=[], raw_text="")
+        dispatched: List[asyncio.Future] | None = None
+        if self._budget_left(usage) == 0:
+            # 进程级预算已用尽：不再规划，直接给出部分答案
+            plan_message = "token 预算已用尽"
+        elif self.settings.planner_mode == "pipelined":
+            plan, planned, plan_message, dispatched = await self._plan_pipelined(
+                task,
+                run_id=run_id,
+                deadline=deadline,
+                work_deadline=work_deadline,
+                limit=limit,
+                usage=usage,
+                emit=emit,
+            )
+        else:
+            try:
+                plan = await _bounded(
+                    self.planner.build(task, self.memory, self.tool_registry, usage=usage),
+                    _remaining(work_deadline),
+                )
+                planned = True
+                plan_message = "生成计划"
+            except asyncio.TimeoutError:
+                plan_message = "规划超时"
         emit(
             AgentEvent(
                 type="plan",
-                message="生成计划",
-                payload={"raw": plan.raw_text, "steps": [s.__dict__ for s in plan.steps]},
+                message=plan_message,
+                payload={
+                    "raw": plan.raw_text,
+                    "steps": [s.__dict__ for s in plan.steps],
+                    "model": plan.model,
+                    "escalated": plan.escalated,
+                },
             )
         )
-        limit = max_steps or self.settings.max_steps
-        for step in plan.steps[:limit]:
-            tool_name = self._resolve_tool(step.instruction, step.suggested_tool)
-            tool = self.tool_registry.get(tool_name)
-            tool_input = ToolInput(
-                task=step.instruction,
-                context={"original_task": task, "step": step.index},
+        try:
+            if dispatched is not None:
+                # 流水线模式：步骤早已派发，这里只按计划顺序提交结果
+                for pending in dispatched:
+                    self._commit(await pending, emit, incomplete)
+            else:
+                for step in plan.steps[:limit]:
+                    outcome = await self._run_step(step, task, run_id, deadline, work_deadline)
+                    self._commit(outcome, emit, incomplete)
+        finally:
+            for pending in dispatched or []:
+                pending.cancel()
+        partial = not planned or bool(incomplete)
+        reasons = list(dict.fromkeys(([] if planned else [plan_message]) + list(incomplete.values())))
+        answer = await self._summarize(
+            task, partial=partial, reasons=reasons, timeout=_remaining(deadline), usage=usage
+        )
+        emit(
+            AgentEvent(
+                type="final",
+                message="答案",
+                payload={
+                    "answer": answer,
+                    "partial": partial,
+                    "incomplete_steps": list(incomplete),
+                    "usage": usage.summary(),
+                },
             )
-            result = await tool.arun(tool_input)
+        )
+        if self.event_sink:
+            self.event_sink.flush()
+        return {
+            "run_id": run_id,
+            "task": task,
+            "plan": plan,
+            "events": events,
+            "answer": answer,
+            "partial": partial,
+            "usage": usage.summary(),
+        }
+
+    async def _plan_pipelined(
+        self,
+        task: str,
+        *,
+        run_id: str,
+        deadline: float | None,
+        work_deadline: float | None,
+        limit: int,
+        usage: UsageLedger,
+        emit: Callable[[AgentEvent], None],
+    ) -> tuple[Plan, bool, str, List[asyncio.Future]]:
+        """Stream the plan and start each step's tool as soon as its line is complete.
+
+        Steps for the same (canonical) tool run one after another, so stateful
+        tools such as the Python interpreter see them in plan order; other
+        tools overlap with planning and with each other.
+        """
+        stream = self.planner.stream(task, self.memory, self.tool_registry, usage=usage)
+        steps = aiter(stream)
+        seen: List[PlanStep] = []
+        dispatched: List[asyncio.Future] = []
+        chains: dict[str, asyncio.Future] = {}
+        planned, message = True, "生成计划"
+        try:
+            while True:
+                try:
+                    step = await _bounded(anext(steps), _remaining(work_deadline))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    planned, message = False, "规划超时"
+                    await stream.aclose()
+                    break
+                seen.append(step)
+                if len(dispatched) >= limit:
+                    continue
+                tool_name = self._resolve_tool(step.instruction, step.suggested_tool)
+                chain = self.tool_registry.canonical(tool_name)
+                pending = asyncio.ensure_future(
+                    self._run_after(
+                        chains.get(chain), step, task, run_id, deadline, work_deadline, tool_name
+                    )
+                )
+                chains[chain] = pending
+                dispatched.append(pending)
+                emit(
+                    AgentEvent(
+                        type="dispatch",
+                        message=f"Step {step.index}: {tool_name} 已派发",
+                        payload={"step": step.__dict__},
+                    )
+                )
+        except BaseException:
+            # 规划流出错或被取消时，不留下无人等待的工具任务
+            for pending in dispatched:
+                pending.cancel()
+            raise
+        # 规划超时时保留已经流式收到的计划文本
+        plan = stream.plan or Plan(task=task, steps=seen, raw_text=stream.raw_text)
+        return plan, planned, message, dispatched
+
+    async def _run_after(
+        self,
+        previous: asyncio.Future | None,
+        step: PlanStep,
+        task: str,
+        run_id: str,
+        deadline: float | None,
+        work_deadline: float | None,
+        tool_name: str,
+    ) -> "_StepOutcome":
+        if previous is not None:
+            await asyncio.wait([previous])
+        return await self._run_step(step, task, run_id, deadline, work_deadline, tool_name)
+
+    async def _run_step(
+        self,
+        step: PlanStep,
+        task: str,
+        run_id: str,
+        deadline: float | None,
+        work_deadline: float | None,
+        tool_name: str | None = None,
+    ) -> "_StepOutcome":
+        remaining = _remaining(work_deadline)
+        if remaining is not None and remaining <= 0:
+            return _StepOutcome(step=step, tool=None, tool_input=None, skipped=True)
+        tool_name = tool_name or self._resolve_tool(step.instruction, step.suggested_tool)
+        tool = self.tool_registry.get(tool_name)
+        step_timeout = _min_timeout(self.settings.tool_timeout, remaining)
+        context: dict[str, Any] = {
+            **(step.arguments or {}),
+            "original_task": task,
+            "step": step.index,
+            "run_id": run_id,
+        }
+        if deadline is not None:
+            context["deadline"] = deadline
+        if step_timeout is not None:
+            context["timeout"] = step_timeout
+        tool_input = ToolInput(task=step.instruction, context=context)
+        outcome = _StepOutcome(step=step, tool=tool.name, tool_input=tool_input, timeout=step_timeout)
+        started = time.perf_counter()
+        try:
+            outcome.result = await _bounded(
+                self.tool_registry.call(tool_name, tool_input, run_id=run_id), step_timeout
+            )
+        except asyncio.TimeoutError:
+            pass
+        except ToolRejected as exc:
+            outcome.rejected = exc
+        outcome.elapsed = time.perf_counter() - started
+        return outcome
+
+    def _commit(
+        self, outcome: "_StepOutcome", emit: Callable[[AgentEvent], None], incomplete: Dict[int, str]
+    ) -> None:
+        """Record one finished step in memory and events; called in plan order."""
+        step, tool_name, tool_input = outcome.step, outcome.tool, outcome.tool_input
+        if outcome.skipped:
+            incomplete[step.index] = "时间不足未执行"
+            return
+        if outcome.rejected is not None:
+            # 系统饱和时按准入控制削峰：该步骤记为未完成，其余步骤照常执行
+            exc = outcome.rejected
+            incomplete[step.index] = "系统繁忙被限流"
             self.memory.add(
                 role="tool",
-                content=f"{tool.name}: {result.content}",
-                metadata={"tool": tool.name, **result.metadata},
+                content=f"{tool_name}: 系统繁忙未执行",
+                metadata={"tool": tool_name, "rejected": exc.reason},
             )
             emit(
                 AgentEvent(
-                    type="tool",
-                    message=f"Step {step.index}: {tool.name}",
+                    type="rejected",
+                    message=f"Step {step.index}: {tool_name} 被限流（{exc.reason}）",
                     payload={
                         "input": {"task": tool_input.task, "context": tool_input.context},
-                        "output": {"content": result.content, "metadata": result.metadata},
+                        "resource": exc.resource,
+                        "reason": exc.reason,
                     },
                 )
             )
-        answer = await self._summarize(task)
-        emit(AgentEvent(type="final", message="答案", payload={"answer": answer}))
-        return {
-            "task": task,
-            "plan": plan,
-            "events": events,
-            "answer": answer,
-        }
+            return
+        if outcome.result is None:
+            incomplete[step.index] = "执行超时"
+            self.memory.add(
+                role="tool",
+                content=f"{tool_name}: 超时未完成",
+                metadata={"tool": tool_name, "timeout": outcome.timeout},
+            )
+            emit(
+                AgentEvent(
+                    type="timeout",
+                    message=f"Step {step.index}: {tool_name} 超时",
+                    payload={
+                        "input": {"task": tool_input.task, "context": tool_input.context},
+                        "timeout": outcome.timeout,
+                    },
+                )
+            )
+            return
+        result = outcome.result
+        self.memory.add(
+            role="tool",
+            content=f"{tool_name}: {result.content}",
+            metadata={"tool": tool_name, **result.metadata},
+        )
+        emit(
+            AgentEvent(
+                type="tool",
+                message=f"Step {step.index}: {tool_name}",
+                payload={
+                    "input": {"task": tool_input.task, "context": tool_input.context},
+                    "output": {"content": result.content, "metadata": result.metadata},
+                    "elapsed": round(outcome.elapsed, 4),
+                },
+            )
+        )
 
-    async def _summarize(self, task: str) -> str:
+    async def _summarize(
+        self,
+        task: str,
+        *,
+        partial: bool = False,
+        reasons: Sequence[str] = (),
+        timeout: float | None = None,
+        usage: UsageLedger | None = None,
+    ) -> str:
         history = self.memory.tail(6)
         user_context = "\n".join(event.content for event in history)
+        if self.settings.summary_recall_k:
+            # 长会话里被挤出窗口的相关工具结果按任务检索回来，避免重复调用工具
+            recent = {(event.role, event.content) for event in history}
+            recalled = [
+                event
+                for event in self.memory.search(task, self.settings.summary_recall_k)
+                if (event.role, event.content) not in recent
+            ]
+            if recalled:
+                earlier = "\n".join(event.content for event in recalled)
+                user_context = f"相关历史:\n{earlier}\n最近记录:\n{user_context}"
+        request = f"请基于上述记录完成任务: {task}"
+        if partial:
+            why = f"（原因：{'、'.join(reasons)}）" if reasons else ""
+            request += f"\n注意：部分步骤未完成{why}，请基于已有结果作答并说明答案不完整。"
         messages = [
             ChatMessage(
                 role="system",
@@ -94,16 +378,46 @@ class ManusAgent:
                 role="assistant",
                 content=f"工具上下文:\n{user_context}",
             ),
-            ChatMessage(role="user", content=f"请基于上述记录完成任务: {task}"),
+            ChatMessage(role="user", content=request),
         ]
-        completion = await self.llm.chat(
-            messages,
-            temperature=max(0.1, self.settings.llm.temperature - 0.1),
-            max_tokens=self.settings.llm.max_tokens,
-            model=self.settings.llm.model,
-        )
+        config = self.settings.phase_llm(SUMMARY_PHASE)
+        temperature = self.settings.phase(SUMMARY_PHASE).temperature
+        if temperature is None:
+            temperature = max(0.1, self.settings.llm.temperature - 0.1)
+        max_tokens = config.max_tokens
+        remaining = self._budget_left(usage) if usage is not None else None
+        if remaining is not None:
+            # 按剩余预算缩短总结；连最短的总结都放不下时直接返回原始结果
+            max_tokens = min(max_tokens, remaining - estimate_prompt_tokens(messages))
+            if max_tokens < _MIN_SUMMARY_TOKENS:
+                return f"（token 预算已用尽，以下为已完成步骤的原始结果）\n{user_context}".strip()
+        client = self.phase_clients.get(SUMMARY_PHASE, self.llm)
+        try:
+            completion = await _bounded(
+                client.chat(
+                    messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    model=config.model,
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            # 总结也来不及时，直接返回已完成步骤的原始结果
+            return f"（已超时，以下为已完成步骤的原始结果）\n{user_context}".strip()
+        if usage is not None:
+            usage.record(SUMMARY_PHASE, usage_for(completion, messages))
         return completion.content.strip()
 
+    def _budget_left(self, usage: UsageLedger) -> int | None:
+        """Tokens left under the run/process budgets (never negative); ``None`` if unbounded."""
+        remaining = remaining_tokens(
+            usage,
+            run_budget=self.settings.run_token_budget,
+            process_budget=self.settings.process_token_budget,
+        )
+        return None if remaining is None else max(remaining, 0)
+
     def _resolve_tool(self, instruction: str, suggested: str | None) -> str:
         candidates = [suggested] if suggested else []
         text = instruction.lower()
@@ -111,11 +425,35 @@ class ManusAgent:
             candidates.append("calculator")
         candidates.append("search")
         for name in candidates:
-            if not name:
-                continue
-            try:
-                self.tool_registry.get(name)
-                return name
-            except KeyError:
-                continue
+            resolved = self.tool_registry.resolve(name) if name else None
+            if resolved is not None:
+                return resolved
         return self.tool_registry.listed()[0]
+
+@dataclass
+class _StepOutcome:
+    """What happened to one plan step; ``result`` is ``None`` on timeout."""
+
+    step: PlanStep
+    tool: str | None
+    tool_input: ToolInput | None
+    timeout: float | None = None
+    result: ToolOutput | None = None
+    rejected: ToolRejected | None = None
+    skipped: bool = False
+    elapsed: float = 0.0
+
+def _remaining(deadline: float | None) -> float | None:
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def _min_timeout(*timeouts: float | None) -> float | None:
+    values = [t for t in timeouts if t is not None]
+    return min(values) if values else None
+
+async def _bounded(awaitable: Awaitable[T], timeout: float | None) -> T:
+    """Await with an optional timeout; overrunning work is cancelled by ``wait_for``."""
+    if timeout is None:
+        return await awaitable
+    return await asyncio.wait_for(awaitable, max(timeout, 0))
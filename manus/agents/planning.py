@@ -2,11 +2,12 @@
 
 from __future__ import annotations
 
+import json
 import re
-from typing import List
+from typing import Any, AsyncIterator, Dict, List, Mapping, Sequence
 
-from ..config import ManusSettings
-from ..llm import ChatMessage, LLMClient
+from ..config import PLANNING_PHASE, ManusSettings
+from ..llm import ChatCompletion, ChatMessage, LLMClient, ToolCall, UsageLedger, remaining_tokens, usage_for
 from ..memory import MemoryStore
 from ..tools import ToolRegistry
 from .flows import Plan, PlanStep
@@ -18,30 +19,275 @@ annotate it in the format `[tool: TOOL_NAME]` where TOOL_NAME is from the tool l
 Respond using plain text bullet points.
 """.strip()
 
+_FUNCTION_PLAN_PROMPT = """
+You are a planning module for a research agent. Solve the given task in 2-4
+steps by calling the provided tools in execution order, exactly one tool call
+per step, with arguments that satisfy each tool's parameter schema.
+""".strip()
+
 _STEP_PATTERN = re.compile(r"^(?:[-*]?\s*)?(?:step\s*)?(\d+)[\).:-]?\s*(.+)$", re.I)
 _TOOL_PATTERN = re.compile(r"\[tool\s*:?\s*([\w-]+)\]", re.I)
+_BULLET_PATTERN = re.compile(r"^[-*•]\s*\S")
+
+class PlanStream:
+    """Plan steps yielded as soon as the planner finishes writing each line.
+
+    Iterate to receive ``PlanStep`` objects in plan order; ``plan`` holds the
+    complete ``Plan`` once iteration has finished. ``parts`` collects the
+    streamed text as it arrives, so a stream closed early (e.g. on a planning
+    timeout) still exposes what the planner wrote via ``raw_text``.
+    """
+
+    def __init__(self):
+        self.plan: Plan | None = None
+        self.parts: List[str] = []
+        self._steps: AsyncIterator[PlanStep] | None = None
+
+    @property
+    def raw_text(self) -> str:
+        return "".join(self.parts).strip()
+
+    def __aiter__(self) -> AsyncIterator[PlanStep]:
+        return self._steps
+
+    async def aclose(self) -> None:
+        await self._steps.aclose()
 
 class PlanBuilder:
-    def __init__(self, *, llm_client: LLMClient, settings: ManusSettings):
+    def __init__(
+        self,
+        *,
+        llm_client: LLMClient,
+        settings: ManusSettings,
+        phase_clients: Mapping[str, LLMClient] | None = None,
+    ):
         self.llm = llm_client
         self.settings = settings
+        self.phase_clients = dict(phase_clients or {})
+
+    async def build(
+        self,
+        task: str,
+        memory: MemoryStore,
+        registry: ToolRegistry,
+        *,
+        usage: UsageLedger | None = None,
+    ) -> Plan:
+        """Plan ``task``; LLM token usage is recorded into ``usage`` when given."""
+        if self.settings.planner_mode == "function_call":
+            return await self._build_with_tools(task, registry, usage)
+        messages = self._text_messages(task, registry)
+        phase = PLANNING_PHASE
+        raw_text = (await self._complete(phase, messages, usage=usage)).content.strip()
+        escalated = False
+        escalate_to = self.settings.phase(phase).escalate_to
+        if escalate_to and self._within_budget(usage) and not _plan_is_valid(raw_text, registry):
+            # 小模型输出无法解析时才升级到大模型重试
+            phase, escalated = escalate_to, True
+            raw_text = (await self._complete(phase, messages, usage=usage)).content.strip()
+        steps = _parse_plan(raw_text or task)
+        if not steps:
+            steps = [PlanStep(index=1, instruction=task)]
+        return Plan(
+            task=task,
+            steps=steps,
+            raw_text=raw_text,
+            model=self.settings.phase_llm(phase).model,
+            escalated=escalated,
+        )
+
+    def stream(
+        self,
+        task: str,
+        memory: MemoryStore,
+        registry: ToolRegistry,
+        *,
+        usage: UsageLedger | None = None,
+    ) -> PlanStream:
+        """Text-mode planning over a streamed completion, one step per finished line.
+
+        Lines that look like steps (numbered, bulleted or carrying ``[tool: ...]``)
+        are yielded as soon as their newline arrives; other lines are kept in
+        ``raw_text`` only. Escalation is not applied, since validity is only
+        known once the whole plan has been written.
+        """
+        holder = PlanStream()
+        holder._steps = self._stream_steps(task, registry, usage, holder)
+        return holder
 
-    async def build(self, task: str, memory: MemoryStore, registry: ToolRegistry) -> Plan:
+    async def _stream_steps(
+        self,
+        task: str,
+        registry: ToolRegistry,
+        usage: UsageLedger | None,
+        holder: PlanStream,
+    ) -> AsyncIterator[PlanStep]:
+        messages = self._text_messages(task, registry)
+        client, options = self._request(PLANNING_PHASE)
+        steps: List[PlanStep] = []
+        parts = holder.parts
+        reported = None
+        pending = ""
+        try:
+            async for chunk in client.stream_chat(messages, **options):
+                parts.append(chunk.content)
+                reported = chunk.usage or reported
+                *lines, pending = (pending + chunk.content).split("\n")
+                for line in lines:
+                    step = _parse_step_line(line, len(steps) + 1)
+                    if step:
+                        steps.append(step)
+                        yield step
+            step = _parse_step_line(pending, len(steps) + 1)
+            if step:
+                steps.append(step)
+                yield step
+        finally:
+            # 提前中断（如规划超时）时也记下已消耗的 token
+            if usage is not None:
+                completion = ChatCompletion(content="".join(parts), raw={}, usage=reported)
+                usage.record(PLANNING_PHASE, usage_for(completion, messages))
+        raw_text = holder.raw_text
+        if not steps:
+            # 没有可识别的步骤行时与 build 一致：整段解析，兜底为单步
+            for step in _parse_plan(raw_text or task) or [PlanStep(index=1, instruction=task)]:
+                steps.append(step)
+                yield step
+        holder.plan = Plan(
+            task=task,
+            steps=steps,
+            raw_text=raw_text,
+            model=self.settings.phase_llm(PLANNING_PHASE).model,
+        )
+
+    async def _build_with_tools(
+        self, task: str, registry: ToolRegistry, usage: UsageLedger | None
+    ) -> Plan:
         messages = [
-            ChatMessage(role="system", content=_PLAN_PROMPT + "\n工具列表:\n" + registry.as_prompt_block()),
+            ChatMessage(role="system", content=_FUNCTION_PLAN_PROMPT),
             ChatMessage(role="user", content=f"任务: {task}"),
         ]
-        result = await self.llm.chat(
-            messages,
-            temperature=min(0.5, self.settings.llm.temperature + 0.2),
-            max_tokens=512,
-            model=self.settings.llm.model,
-        )
-        raw_text = result.content.strip()
-        steps = _parse_plan(raw_text or task)
+        tools = registry.as_openai_tools(self._tool_names(task, registry))
+        phase = PLANNING_PHASE
+        completion = await self._complete(phase, messages, tools=tools, usage=usage)
+        steps, rejected = _steps_from_tool_calls(completion.tool_calls, registry)
+        escalated = False
+        escalate_to = self.settings.phase(phase).escalate_to
+        if escalate_to and self._within_budget(usage) and (rejected or not steps):
+            phase, escalated = escalate_to, True
+            completion = await self._complete(phase, messages, tools=tools, usage=usage)
+            steps, rejected = _steps_from_tool_calls(completion.tool_calls, registry)
+        raw_lines = [f"{s.index}. {s.instruction} [tool: {s.suggested_tool}]" for s in steps]
+        raw_lines += [f"(已丢弃无效调用) {reason}" for reason in rejected]
+        if not steps:
+            # 模型没有给出可用的 tool_calls 时退回文本解析
+            steps = _parse_plan(completion.content.strip() or task)
+            raw_lines.insert(0, completion.content.strip())
         if not steps:
             steps = [PlanStep(index=1, instruction=task)]
-        return Plan(task=task, steps=steps, raw_text=raw_text)
+        return Plan(
+            task=task,
+            steps=steps,
+            raw_text="\n".join(line for line in raw_lines if line),
+            model=self.settings.phase_llm(phase).model,
+            escalated=escalated,
+        )
+
+    def _text_messages(self, task: str, registry: ToolRegistry) -> List[ChatMessage]:
+        tool_block = registry.as_prompt_block(self._tool_names(task, registry))
+        return [
+            ChatMessage(role="system", content=_PLAN_PROMPT + "\n工具列表:\n" + tool_block),
+            ChatMessage(role="user", content=f"任务: {task}"),
+        ]
+
+    def _tool_names(self, task: str, registry: ToolRegistry) -> list[str] | None:
+        k = self.settings.tool_shortlist_k
+        if not k:
+            return None
+        return registry.shortlist(task, k, pinned=self.settings.default_tools)
+
+    def _within_budget(self, usage: UsageLedger | None) -> bool:
+        if usage is None:
+            return True
+        remaining = remaining_tokens(
+            usage,
+            run_budget=self.settings.run_token_budget,
+            process_budget=self.settings.process_token_budget,
+        )
+        return remaining is None or remaining > 0
+
+    async def _complete(
+        self,
+        phase: str,
+        messages: List[ChatMessage],
+        *,
+        tools: Sequence[Dict[str, Any]] | None = None,
+        usage: UsageLedger | None = None,
+    ) -> ChatCompletion:
+        client, options = self._request(phase)
+        if tools:
+            options["tools"] = tools
+        completion = await client.chat(messages, **options)
+        if usage is not None:
+            usage.record(phase, usage_for(completion, messages, tools))
+        return completion
+
+    def _request(self, phase: str) -> tuple[LLMClient, Dict[str, Any]]:
+        """Client and sampling options for a planning call in ``phase``."""
+        overrides = self.settings.phase(phase)
+        temperature = overrides.temperature
+        if temperature is None:
+            temperature = min(0.5, self.settings.llm.temperature + 0.2)
+        options = {
+            "temperature": temperature,
+            "max_tokens": overrides.max_tokens or 512,
+            "model": self.settings.phase_llm(phase).model,
+        }
+        return self.phase_clients.get(phase, self.llm), options
+
+def _steps_from_tool_calls(
+    calls: Sequence[ToolCall], registry: ToolRegistry
+) -> tuple[List[PlanStep], List[str]]:
+    """Turn tool calls into plan steps, dropping ones with unknown tools or bad arguments."""
+    steps: List[PlanStep] = []
+    rejected: List[str] = []
+    for call in calls:
+        try:
+            arguments = json.loads(call.arguments or "{}")
+            registry.validate_arguments(call.name, arguments)
+        except (KeyError, ValueError) as exc:
+            rejected.append(f"{call.name}: {exc}")
+            continue
+        steps.append(
+            PlanStep(
+                index=len(steps) + 1,
+                instruction=_instruction_from_arguments(arguments),
+                suggested_tool=call.name,
+                arguments=arguments,
+            )
+        )
+    return steps, rejected
+
+def _instruction_from_arguments(arguments: Dict[str, Any]) -> str:
+    if isinstance(arguments.get("task"), str):
+        return arguments["task"]
+    for value in arguments.values():
+        if isinstance(value, str) and value.strip():
+            return value
+    return json.dumps(arguments, ensure_ascii=False)
+
+def _plan_is_valid(raw_text: str, registry: ToolRegistry) -> bool:
+    """Planner output counts as valid when it lists steps that only name known tools."""
+    numbered = 0
+    for line in raw_text.splitlines():
+        line = line.strip()
+        if not line or not (_STEP_PATTERN.match(line) or _BULLET_PATTERN.match(line)):
+            continue
+        numbered += 1
+        for name in _TOOL_PATTERN.findall(line):
+            if registry.resolve(name) is None:
+                return False
+    return numbered > 0
 
 def _parse_plan(text: str) -> List[PlanStep]:
     steps: List[PlanStep] = []
@@ -49,15 +295,28 @@ def _parse_plan(text: str) -> List[PlanStep]:
         line = line.strip()
         if not line:
             continue
-        match = _STEP_PATTERN.match(line)
-        if match:
-            _, content = match.groups()
-        else:
-            content = line
-        tool = None
-        tool_match = _TOOL_PATTERN.search(content)
-        if tool_match:
-            tool = tool_match.group(1).strip().lower()
-            content = _TOOL_PATTERN.sub("", content).strip()
-        steps.append(PlanStep(index=len(steps) + 1, instruction=content, suggested_tool=tool))
+        steps.append(_to_step(line, len(steps) + 1))
     return steps
+
+def _parse_step_line(line: str, index: int) -> PlanStep | None:
+    """Step for a streamed line, or ``None`` for prose around the plan."""
+    line = line.strip()
+    if not line:
+        return None
+    if _STEP_PATTERN.match(line) or _BULLET_PATTERN.match(line) or _TOOL_PATTERN.search(line):
+        return _to_step(line, index)
+    return None
+
+def _to_step(line: str, index: int) -> PlanStep:
+    match = _STEP_PATTERN.match(line)
+    if match:
+        _, content = match.groups()
+    else:
+        content = line
+    tool = None
+    tool_match = _TOOL_PATTERN.search(content)
+    if tool_match:
+        # 保留模型写的大小写，由 ToolRegistry.resolve 统一做不区分大小写的匹配
+        tool = tool_match.group(1).strip()
+        content = _TOOL_PATTERN.sub("", content).strip()
+    return PlanStep(index=index, instruction=content, suggested_tool=tool)
@@ -0,0 +1,125 @@
+"""Re-execute runs recorded in an LLM cassette and diff them against the recording."""
+
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from ..config import LLMConfig, ManusSettings, PhaseConfig
+from ..llm.cassette import Cassette, CassetteMiss, ReplayLLMClient
+from ..tools import ToolRegistry
+from .orchestrator import ManusAgent
+
+@dataclass
+class ReplayReport:
+    task: str
+    diffs: list[str]
+    elapsed: float
+    recorded_elapsed: float
+    hits: int
+    misses: int
+    # 每个工具步骤的 (工具名, 录制耗时, 回放耗时)
+    steps: list[tuple[str, float, float]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.diffs
+
+    @property
+    def slowdown(self) -> float | None:
+        return self.elapsed / self.recorded_elapsed if self.recorded_elapsed else None
+
+def run_record(result: dict, settings: ManusSettings, elapsed: float) -> dict[str, Any]:
+    """Summary of a finished ``ManusAgent.arun`` result for ``Cassette.add_run``."""
+    return {
+        "run_id": result["run_id"],
+        "task": result["task"],
+        "settings": _settings_snapshot(settings),
+        "plan": [[step.suggested_tool, step.instruction] for step in result["plan"].steps],
+        "events": _event_signature(result["events"]),
+        "steps": _step_timings(result["events"]),
+        "answer": result["answer"],
+        "partial": result["partial"],
+        "elapsed": round(elapsed, 4),
+    }
+
+def restore_settings(snapshot: dict[str, Any]) -> ManusSettings:
+    data = dict(snapshot)
+    llm = LLMConfig(**data.pop("llm"))
+    phases = {name: PhaseConfig(**phase) for name, phase in data.pop("phases", {}).items()}
+    return ManusSettings(llm=llm, phases=phases, **data)
+
+async def replay_run(
+    cassette: Cassette,
+    run: dict[str, Any],
+    *,
+    tool_registry: ToolRegistry | None = None,
+    simulate_latency: bool = False,
+    strict: bool = False,
+) -> ReplayReport:
+    """Run ``run`` again against its recorded LLM responses; tools execute live."""
+    client = ReplayLLMClient(
+        cassette.interactions_for(run), simulate_latency=simulate_latency, strict=strict
+    )
+    agent = ManusAgent(
+        settings=restore_settings(run["settings"]), llm_client=client, tool_registry=tool_registry
+    )
+    started = time.perf_counter()
+    try:
+        result = await agent.arun(run["task"])
+    except CassetteMiss as exc:
+        return ReplayReport(
+            task=run["task"],
+            diffs=[str(exc)],
+            elapsed=time.perf_counter() - started,
+            recorded_elapsed=run.get("elapsed", 0.0),
+            hits=client.hits,
+            misses=client.misses,
+        )
+    elapsed = time.perf_counter() - started
+
+    diffs = []
+    plan = [[step.suggested_tool, step.instruction] for step in result["plan"].steps]
+    if plan != run["plan"]:
+        diffs.append(f"计划不同: 录制 {run['plan']} / 回放 {plan}")
+    events = _event_signature(result["events"])
+    if events != run["events"]:
+        diffs.append(f"事件序列不同: 录制 {run['events']} / 回放 {events}")
+    if result["partial"] != run["partial"]:
+        diffs.append(f"partial 不同: 录制 {run['partial']} / 回放 {result['partial']}")
+    if result["answer"] != run["answer"]:
+        diffs.append("最终回答不同")
+    steps = [
+        (tool, recorded, replayed)
+        for (tool, recorded), (_, replayed) in zip(run.get("steps", []), _step_timings(result["events"]))
+    ]
+    return ReplayReport(
+        task=run["task"],
+        diffs=diffs,
+        elapsed=elapsed,
+        recorded_elapsed=run.get("elapsed", 0.0),
+        hits=client.hits,
+        misses=client.misses,
+        steps=steps,
+    )
+
+def _settings_snapshot(settings: ManusSettings) -> dict[str, Any]:
+    data = asdict(settings)
+    # 密钥不落盘；回放也不需要副本地址
+    data["llm"].pop("api_key", None)
+    data["llm"]["replicas"] = []
+    for phase in data["phases"].values():
+        phase.pop("api_key", None)
+    data["default_tools"] = list(data["default_tools"])
+    return data
+
+def _event_signature(events) -> list[list[str]]:
+    return [[event.type, event.message] for event in events]
+
+def _step_timings(events) -> list[list[Any]]:
+    return [
+        [event.message.split(": ", 1)[-1], event.payload.get("elapsed", 0.0)]
+        for event in events
+        if event.type == "tool"
+    ]
@@ -3,19 +3,34 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Optional
+import json
+import re
+import time
+from collections import deque
+from pathlib import Path
+from typing import List, Optional
 
 import typer
 from rich.console import Console
 from rich.panel import Panel
 
 from .agents.orchestrator import ManusAgent
-from .config import ManusSettings
-from .llm import HttpLLMClient
-from .memory import MemoryStore
+from .agents.replay import replay_run, run_record
+from .config import DEFAULT_PHASE, PLANNING_PHASE, SUMMARY_PHASE, ManusSettings, PhaseConfig
+from .events import JsonlEventSink, read_events
+from .llm import (
+    PROCESS_USAGE,
+    Cassette,
+    RecordingLLMClient,
+    client_from_config,
+    phase_clients_from_settings,
+)
+from .memory import MemoryStore, SqliteMemoryStore
 from .tools import build_default_registry
 
 app = typer.Typer(help="Manus lightweight agent")
+events_app = typer.Typer(help="查看持久化的事件日志")
+app.add_typer(events_app, name="events")
 console = Console()
 
 @app.callback()
@@ -28,35 +43,303 @@ def chat(
     task: str = typer.Option(..., "--task", "-t", help="待完成的任务"),
     model: Optional[str] = typer.Option(None, help="LLM 模型 ID"),
     max_steps: int = typer.Option(3, help="执行的最大步骤数"),
+    timeout: Optional[float] = typer.Option(None, help="整个运行的截止时间（秒），超时返回部分答案"),
+    tool_timeout: Optional[float] = typer.Option(None, help="单个工具步骤的超时（秒）"),
+    replica: Optional[List[str]] = typer.Option(None, help="额外的 LLM 副本地址，可重复传入"),
+    hedge_after: Optional[float] = typer.Option(None, help="请求超过该秒数后向次优副本发送对冲请求"),
+    planner_model: Optional[str] = typer.Option(None, help="规划阶段使用的（小）模型 ID"),
+    summary_model: Optional[str] = typer.Option(None, help="总结阶段使用的模型 ID"),
+    escalate_planning: bool = typer.Option(
+        False, help="规划输出无法解析为有效步骤时改用主模型重试"
+    ),
+    planner_mode: str = typer.Option(
+        "text",
+        help="text：解析 [tool: xxx] 标记；function_call：使用 tools/tool_calls 协议；"
+        "pipelined：流式规划，每写完一步即开始执行",
+    ),
+    tool_shortlist: Optional[int] = typer.Option(None, help="规划时只列出最相关的 K 个工具"),
+    recall: int = typer.Option(0, help="总结时额外检索的相关历史记忆条数"),
+    session: Optional[str] = typer.Option(None, help="会话 ID；指定后记忆持久化并可跨进程恢复"),
+    memory_db: str = typer.Option(
+        ".manus/sessions.db", envvar="MANUS_MEMORY_DB", help="会话记忆的 SQLite 文件"
+    ),
+    event_dir: Optional[str] = typer.Option(
+        None, envvar="MANUS_EVENT_DIR", help="把事件以 JSONL 流式写入该目录（自动轮转）"
+    ),
+    record: Optional[str] = typer.Option(
+        None, help="把所有 LLM 请求/响应及耗时追加录制到该 cassette 文件，供 manus replay 使用"
+    ),
+    run_token_budget: Optional[int] = typer.Option(None, help="单次运行的 token 上限"),
+    process_token_budget: Optional[int] = typer.Option(
+        None, envvar="MANUS_TOKEN_BUDGET", help="整个进程的 token 上限"
+    ),
 ):
     settings = ManusSettings()
     if model:
         settings.llm.model = model
     settings.max_steps = max_steps
-    asyncio.run(_run_chat(task, settings))
-
-async def _run_chat(task: str, settings: ManusSettings) -> None:
-    client = HttpLLMClient(
-        base_url=settings.llm.base_url,
-        api_key=settings.llm.api_key,
-        timeout=settings.llm.timeout,
+    settings.run_timeout = timeout
+    settings.tool_timeout = tool_timeout
+    settings.planner_mode = planner_mode
+    settings.tool_shortlist_k = tool_shortlist
+    settings.summary_recall_k = recall
+    settings.run_token_budget = run_token_budget
+    settings.process_token_budget = process_token_budget
+    if replica:
+        settings.llm.replicas = replica
+    settings.llm.hedge_after = hedge_after
+    if planner_model or escalate_planning:
+        settings.phases[PLANNING_PHASE] = PhaseConfig(
+            model=planner_model, escalate_to=DEFAULT_PHASE if escalate_planning else None
+        )
+    if summary_model:
+        settings.phases[SUMMARY_PHASE] = PhaseConfig(model=summary_model)
+    memory = (
+        # 只有总结阶段要检索早期记录时，才在恢复会话时为全部历史建索引
+        SqliteMemoryStore(memory_db, session_id=session, index_history=recall > 0)
+        if session
+        else MemoryStore()
     )
+    sink = JsonlEventSink(event_dir) if event_dir else None
+    cassette = None
+    if record:
+        cassette = Cassette.load(record) if Path(record).exists() else Cassette()
+    try:
+        asyncio.run(_run_chat(task, settings, memory, sink, cassette))
+    finally:
+        if cassette:
+            cassette.save(record)
+        if isinstance(memory, SqliteMemoryStore):
+            memory.close()
+        if sink:
+            sink.close()
+
+async def _run_chat(
+    task: str,
+    settings: ManusSettings,
+    memory: MemoryStore,
+    sink: JsonlEventSink | None,
+    cassette: Cassette | None = None,
+) -> None:
+    client = client_from_config(settings.llm)
+    phase_clients = phase_clients_from_settings(settings)
+    if cassette is not None:
+        client = RecordingLLMClient(client, cassette)
+        phase_clients = {
+            name: RecordingLLMClient(phase_client, cassette)
+            for name, phase_client in phase_clients.items()
+        }
     agent = ManusAgent(
         settings=settings,
         llm_client=client,
         tool_registry=build_default_registry(),
-        memory=MemoryStore(),
+        memory=memory,
+        phase_clients=phase_clients,
+        event_sink=sink,
     )
     console.rule("计划")
-    result = await agent.arun(task)
+    started = time.perf_counter()
+    try:
+        result = await agent.arun(task)
+        if cassette is not None:
+            cassette.add_run(run_record(result, settings, time.perf_counter() - started))
+    finally:
+        await client.aclose()
+        for phase_client in agent.phase_clients.values():
+            await phase_client.aclose()
     plan = result["plan"]
+    if plan.model:
+        escalated = "（已升级）" if plan.escalated else ""
+        console.print(f"规划模型: {plan.model}{escalated}")
     for step in plan.steps:
         console.print(f"[bold]{step.index}. {step.instruction}[/bold] (tool={step.suggested_tool or 'auto'})")
     console.rule("执行事件")
     for event in result["events"]:
         console.print(f"[{event.type}] {event.message}")
     console.rule("回答")
-    console.print(Panel(result["answer"], title="Manus", subtitle=task))
+    title = "Manus（部分结果）" if result["partial"] else "Manus"
+    console.print(Panel(result["answer"], title=title, subtitle=task))
+    console.print(_format_usage(result["usage"]), highlight=False, markup=False)
+
+@app.command()
+def batch(
+    tasks_file: str = typer.Argument(..., help="任务文件，每行一个任务"),
+    model: Optional[str] = typer.Option(None, help="LLM 模型 ID"),
+    max_steps: int = typer.Option(3, help="每个任务执行的最大步骤数"),
+    concurrency: int = typer.Option(4, help="同时运行的任务数"),
+    run_token_budget: Optional[int] = typer.Option(None, help="单个任务的 token 上限"),
+    process_token_budget: Optional[int] = typer.Option(
+        None, envvar="MANUS_TOKEN_BUDGET", help="整批任务共用的 token 上限"
+    ),
+    output: Optional[str] = typer.Option(None, help="把每个任务的回答与用量写入该 JSONL 文件"),
+    event_dir: Optional[str] = typer.Option(
+        None, envvar="MANUS_EVENT_DIR", help="把事件流式写入该目录，内存中不再保留各任务的事件"
+    ),
+):
+    """并发执行一批任务，并汇总 token 用量与吞吐。"""
+    tasks = [line.strip() for line in Path(tasks_file).read_text(encoding="utf-8").splitlines()]
+    tasks = [task for task in tasks if task]
+    if not tasks:
+        console.print("任务文件为空")
+        raise typer.Exit(code=1)
+    settings = ManusSettings()
+    if model:
+        settings.llm.model = model
+    settings.max_steps = max_steps
+    settings.run_token_budget = run_token_budget
+    settings.process_token_budget = process_token_budget
+    started = time.perf_counter()
+    baseline = PROCESS_USAGE.total.total_tokens
+    sink = JsonlEventSink(event_dir) if event_dir else None
+    try:
+        results = asyncio.run(_run_batch(tasks, settings, concurrency, sink))
+    finally:
+        if sink:
+            sink.close()
+    elapsed = time.perf_counter() - started
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            for result in results:
+                record = {key: result[key] for key in ("run_id", "task", "answer", "partial", "usage")}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    for result in results:
+        flag = "partial" if result["partial"] else "ok"
+        console.print(
+            f"[{flag}] {result['usage']['total_tokens']:>7} tokens  {result['task'][:60]}",
+            highlight=False,
+            markup=False,
+        )
+    total_tokens = PROCESS_USAGE.total.total_tokens - baseline
+    per_task = total_tokens / len(results)
+    console.rule("汇总")
+    console.print(_format_usage(PROCESS_USAGE.summary()), highlight=False, markup=False)
+    console.print(
+        f"{len(results)} 个任务，耗时 {elapsed:.1f}s，平均每任务 {per_task:.0f} tokens，"
+        f"吞吐 {total_tokens / elapsed:.0f} tokens/s、{len(results) * 60 / elapsed:.1f} 任务/分钟",
+        highlight=False,
+        markup=False,
+    )
+    if process_token_budget and per_task:
+        left = max(process_token_budget - PROCESS_USAGE.total.total_tokens, 0)
+        console.print(f"按当前均值，剩余预算约可再运行 {left / per_task:.0f} 个任务", highlight=False, markup=False)
+
+async def _run_batch(
+    tasks: List[str], settings: ManusSettings, concurrency: int, sink: JsonlEventSink | None = None
+) -> List[dict]:
+    client = client_from_config(settings.llm)
+    phase_clients = phase_clients_from_settings(settings)
+    registry = build_default_registry()
+    gate = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run_one(task: str) -> dict:
+        async with gate:
+            agent = ManusAgent(
+                settings=settings,
+                llm_client=client,
+                tool_registry=registry,
+                memory=MemoryStore(),
+                phase_clients=phase_clients,
+                event_sink=sink,
+                retain_events=sink is None,
+            )
+            return await agent.arun(task)
+
+    try:
+        return await asyncio.gather(*(run_one(task) for task in tasks))
+    finally:
+        await client.aclose()
+        for phase_client in phase_clients.values():
+            await phase_client.aclose()
+
+def _format_usage(usage: dict) -> str:
+    estimated = "，含本地估算" if usage["estimated"] else ""
+    phases = "、".join(f"{name} {tokens}" for name, tokens in usage["phases"].items())
+    return (
+        f"Token 用量: {usage['total_tokens']}（prompt {usage['prompt_tokens']} / "
+        f"completion {usage['completion_tokens']}，{usage['calls']} 次调用{estimated}）"
+        + (f"；按阶段: {phases}" if phases else "")
+    )
+
+@app.command()
+def replay(
+    cassette_path: str = typer.Argument(..., help="manus chat --record 录制的 cassette 文件"),
+    simulate_latency: bool = typer.Option(False, help="按录制时的耗时延迟返回 LLM 响应"),
+    strict: bool = typer.Option(False, help="请求未被录制时直接失败，而不是按顺序回退"),
+    max_slowdown: Optional[float] = typer.Option(
+        None, help="回放耗时超过录制耗时的该倍数即视为性能回退"
+    ),
+):
+    """离线重放录制的运行，并与录制结果对比。"""
+    cassette = Cassette.load(cassette_path)
+    if not cassette.runs:
+        console.print("cassette 中没有完整的运行记录")
+        raise typer.Exit(code=1)
+    failed = asyncio.run(_replay_all(cassette, simulate_latency, strict, max_slowdown))
+    if failed:
+        raise typer.Exit(code=1)
+
+async def _replay_all(
+    cassette: Cassette, simulate_latency: bool, strict: bool, max_slowdown: float | None
+) -> int:
+    registry = build_default_registry()
+    failed = 0
+    for run in cassette.runs:
+        report = await replay_run(
+            cassette, run, tool_registry=registry, simulate_latency=simulate_latency, strict=strict
+        )
+        slow = max_slowdown is not None and (report.slowdown or 0.0) > max_slowdown
+        status = "OK" if report.ok and not slow else "FAIL"
+        failed += status == "FAIL"
+        console.print(
+            f"{status} {run['run_id'][:8]} {report.task[:40]} "
+            f"录制 {report.recorded_elapsed:.3f}s / 回放 {report.elapsed:.3f}s "
+            f"(命中 {report.hits}, 未命中 {report.misses})",
+            highlight=False,
+            markup=False,
+        )
+        for tool, recorded, replayed in report.steps:
+            console.print(f"    {tool}: {recorded:.3f}s -> {replayed:.3f}s", highlight=False, markup=False)
+        for diff in report.diffs:
+            console.print(f"    {diff}", highlight=False, markup=False)
+        if slow:
+            console.print(f"    耗时超过录制的 {max_slowdown} 倍", highlight=False, markup=False)
+    return failed
+
+@events_app.command("tail")
+def events_tail(
+    directory: str = typer.Option(".manus/events", "--dir", envvar="MANUS_EVENT_DIR", help="事件目录"),
+    lines: int = typer.Option(20, "--lines", "-n", help="显示最近多少条事件"),
+    run: Optional[str] = typer.Option(None, help="只看指定 run_id"),
+):
+    recent = deque(
+        (r for r in read_events(directory) if not run or r["run"] == run), maxlen=lines
+    )
+    for record in recent:
+        _print_record(record)
+
+@events_app.command("grep")
+def events_grep(
+    pattern: str = typer.Argument(..., help="正则表达式，匹配事件消息与 payload"),
+    directory: str = typer.Option(".manus/events", "--dir", envvar="MANUS_EVENT_DIR", help="事件目录"),
+    event_type: Optional[str] = typer.Option(None, "--type", help="只匹配该类型的事件"),
+):
+    regex = re.compile(pattern)
+    for record in read_events(directory):
+        if event_type and record["type"] != event_type:
+            continue
+        text = record["msg"] + " " + json.dumps(record["payload"], ensure_ascii=False)
+        if regex.search(text):
+            _print_record(record)
+
+def _print_record(record: dict) -> None:
+    payload = record.get("payload") or {}
+    detail = payload.get("answer") or (payload.get("output") or {}).get("content") or ""
+    preview = str(detail).replace("\n", " ")[:120]
+    console.print(
+        f"{record['run'][:8]}#{record['seq']} [{record['type']}] {record['msg']} {preview}",
+        highlight=False,
+        markup=False,
+    )
 
 if __name__ == "__main__":  # pragma: no cover
     app()
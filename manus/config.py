@@ -3,11 +3,15 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass, field
-from typing import Sequence
+from dataclasses import dataclass, field, replace
+from typing import Dict, Sequence
 
 DEFAULT_BASE_URL = "https://api.siliconflow.cn/v1"
 DEFAULT_API_KEY = "YOUR_API_KEY_FROM_CLOUD_SILICONFLOW_CN"
+# 阶段名称；未在 ManusSettings.phases 中配置的阶段直接使用 ManusSettings.llm
+PLANNING_PHASE = "planning"
+SUMMARY_PHASE = "summary"
+DEFAULT_PHASE = "default"
 
 def _env(key: str, fallback: str) -> str:
     value = os.getenv(key)
@@ -15,6 +19,9 @@ def _env(key: str, fallback: str) -> str:
         return value
     return fallback
 
+def _env_list(key: str) -> list[str]:
+    return [item.strip() for item in os.getenv(key, "").split(",") if item.strip()]
+
 @dataclass
 class LLMConfig:
     """LLM connection details with safe defaults."""
@@ -31,6 +38,10 @@ class LLMConfig:
     temperature: float = 0.2
     max_tokens: int = 1024
     timeout: float = 120.0
+    # 额外的 OpenAI-compatible 副本地址，非空时按延迟路由
+    replicas: Sequence[str] = field(default_factory=lambda: _env_list("MANUS_LLM_REPLICAS"))
+    # 请求挂起超过该秒数后向次优副本发送对冲请求
+    hedge_after: float | None = None
 
     def as_headers(self) -> dict[str, str]:
         return {
@@ -38,6 +49,18 @@ class LLMConfig:
             "Content-Type": "application/json",
         }
 
+@dataclass
+class PhaseConfig:
+    """Per-phase overrides on top of ``ManusSettings.llm``; ``None`` inherits."""
+
+    model: str | None = None
+    base_url: str | None = None
+    api_key: str | None = None
+    max_tokens: int | None = None
+    temperature: float | None = None
+    # 输出无法解析为有效计划时，改用该阶段的配置重试（如 DEFAULT_PHASE 即主模型）
+    escalate_to: str | None = None
+
 @dataclass
 class ManusSettings:
     """Top level settings shared across Manus components."""
@@ -45,11 +68,45 @@ class ManusSettings:
     llm: LLMConfig = field(default_factory=LLMConfig)
     default_tools: Sequence[str] = field(default_factory=lambda: ["search", "calculator"])
     max_steps: int = 4
+    # 整个 run 的截止时间（秒），None 表示不限
+    run_timeout: float | None = None
+    # 单个工具步骤的超时（秒），同时受 run_timeout 剩余时间约束
+    tool_timeout: float | None = None
+    # run_timeout 中预留给总结阶段的比例，保证超时也能按时给出部分答案
+    summary_reserve: float = 0.25
+    phases: Dict[str, PhaseConfig] = field(default_factory=dict)
+    # "text" 解析 [tool: xxx] 标记；"function_call" 走 tools/tool_calls 协议拿结构化参数；
+    # "pipelined" 流式读取规划输出，每写完一行步骤就派发对应工具
+    planner_mode: str = "text"
+    # 规划提示词只列出与任务最相关的 k 个工具（另含 default_tools），None 表示全部列出
+    tool_shortlist_k: int | None = None
+    # 总结时除最近 6 条外，再按任务检索 k 条相关的更早记忆；0 表示只用最近记录
+    summary_recall_k: int = 0
+    # 单个 run / 整个进程的 token 上限；超出后停止规划升级、缩短或跳过总结
+    run_token_budget: int | None = None
+    process_token_budget: int | None = None
 
     def copy(self, **overrides) -> "ManusSettings":
-        data = {
-            "llm": overrides.get("llm", self.llm),
-            "default_tools": overrides.get("default_tools", self.default_tools),
-            "max_steps": overrides.get("max_steps", self.max_steps),
+        return replace(self, **overrides)
+
+    def phase(self, name: str) -> PhaseConfig:
+        return self.phases.get(name) or PhaseConfig()
+
+    def phase_llm(self, name: str) -> LLMConfig:
+        """``LLMConfig`` for a phase: connection and model overrides applied."""
+        phase = self.phase(name)
+        overrides = {
+            key: value
+            for key, value in {
+                "model": phase.model,
+                "base_url": phase.base_url,
+                "api_key": phase.api_key,
+                "max_tokens": phase.max_tokens,
+                "temperature": phase.temperature,
+            }.items()
+            if value is not None
         }
-        return ManusSettings(**data)
+        if phase.base_url:
+            # 副本列表属于主 endpoint，换了地址就不再沿用
+            overrides["replicas"] = ()
+        return replace(self.llm, **overrides)
@@ -0,0 +1,5 @@
+"""Persistent event sinks and readers."""
+
+from .sink import EventSink, JsonlEventSink, read_events
+
+__all__ = ["EventSink", "JsonlEventSink", "read_events"]
@@ -0,0 +1,186 @@
+"""Streaming JSONL sinks for AgentEvent audit logs."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import IO, Any, Iterator
+
+from ..agents.flows import AgentEvent
+
+_TRUNCATED = "…[truncated {0} chars]"
+
+class EventSink:
+    """Receives every event emitted by ``ManusAgent`` as it happens."""
+
+    def write(self, event: AgentEvent, *, run_id: str) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Persist buffered events."""
+
+    def close(self) -> None:
+        self.flush()
+
+class JsonlEventSink(EventSink):
+    """Appends compact JSONL records to rotating segment files.
+
+    Strings longer than ``inline_limit`` are written once per segment as a
+    ``blob`` record and referenced by hash afterwards, so the task text and
+    large tool outputs are not repeated in every event. Strings longer than
+    ``max_field_chars`` are truncated first. Segments rotate once they exceed
+    ``max_bytes`` or ``max_age`` seconds; ``compress=True`` writes gzip segments.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        *,
+        prefix: str = "events",
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age: float | None = 3600.0,
+        max_field_chars: int | None = 20_000,
+        inline_limit: int = 256,
+        buffer_size: int = 64,
+        compress: bool = False,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_field_chars = max_field_chars
+        self.inline_limit = inline_limit
+        self.buffer_size = buffer_size
+        self.compress = compress
+        self._lock = threading.Lock()
+        self._buffer: list[str] = []
+        self._file: IO[str] | None = None
+        self._segment_bytes = 0
+        self._segment_opened = 0.0
+        self._segment_count = 0
+        self._seen_blobs: set[str] = set()
+        self._seq = 0
+
+    @property
+    def current_path(self) -> Path | None:
+        return Path(self._file.name) if self._file else None
+
+    def write(self, event: AgentEvent, *, run_id: str) -> None:
+        with self._lock:
+            if self._file is None or self._should_rotate():
+                self._rotate()
+            self._seq += 1
+            record = {
+                "ts": round(time.time(), 3),
+                "run": run_id,
+                "seq": self._seq,
+                "type": event.type,
+                "msg": event.message,
+                "payload": self._encode(event.payload or {}),
+            }
+            self._append(record)
+            if len(self._buffer) >= self.buffer_size:
+                self._drain()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._drain()
+
+    def close(self) -> None:
+        with self._lock:
+            self._drain()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _encode(self, value: Any) -> Any:
+        if isinstance(value, str):
+            if self.max_field_chars is not None and len(value) > self.max_field_chars:
+                dropped = len(value) - self.max_field_chars
+                value = value[: self.max_field_chars] + _TRUNCATED.format(dropped)
+            if len(value) <= self.inline_limit:
+                return value
+            digest = hashlib.sha1(value.encode("utf-8")).hexdigest()[:16]
+            if digest not in self._seen_blobs:
+                self._seen_blobs.add(digest)
+                self._append({"blob": digest, "data": value})
+            return {"$ref": digest}
+        if isinstance(value, dict):
+            return {str(key): self._encode(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._encode(item) for item in value]
+        return value
+
+    def _append(self, record: dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str)
+        self._buffer.append(line + "\n")
+        self._segment_bytes += len(line.encode("utf-8")) + 1
+
+    def _drain(self) -> None:
+        if self._buffer and self._file is not None:
+            self._file.write("".join(self._buffer))
+            self._file.flush()
+        self._buffer.clear()
+
+    def _should_rotate(self) -> bool:
+        if self._segment_bytes >= self.max_bytes:
+            return True
+        return self.max_age is not None and time.time() - self._segment_opened >= self.max_age
+
+    def _rotate(self) -> None:
+        self._drain()
+        if self._file is not None:
+            self._file.close()
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        suffix = ".jsonl.gz" if self.compress else ".jsonl"
+        while True:
+            self._segment_count += 1
+            # 文件名带 PID，并以独占方式创建：多个进程同一秒轮转也不会写进同一个文件
+            name = f"{self.prefix}-{stamp}-{os.getpid()}-{self._segment_count:04d}{suffix}"
+            try:
+                if self.compress:
+                    self._file = gzip.open(self.directory / name, "xt", encoding="utf-8")
+                else:
+                    self._file = open(self.directory / name, "x", encoding="utf-8")
+            except FileExistsError:
+                continue
+            break
+        self._segment_bytes = 0
+        self._segment_opened = time.time()
+        # 每个分段自包含，blob 引用不跨文件
+        self._seen_blobs.clear()
+
+def read_events(directory: str | Path, *, prefix: str = "events") -> Iterator[dict[str, Any]]:
+    """Yield event records from all segments in order, with blob refs resolved."""
+    segments = sorted(Path(directory).glob(f"{prefix}-*.jsonl*"))
+    for segment in segments:
+        blobs: dict[str, str] = {}
+        opener = gzip.open if segment.suffix == ".gz" else open
+        with opener(segment, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:  # 进程中断时最后一行可能不完整
+                    continue
+                if "blob" in record:
+                    blobs[record["blob"]] = record["data"]
+                    continue
+                record["payload"] = _resolve(record.get("payload"), blobs)
+                yield record
+
+def _resolve(value: Any, blobs: dict[str, str]) -> Any:
+    if isinstance(value, dict):
+        if set(value) == {"$ref"}:
+            return blobs.get(value["$ref"], value)
+        return {key: _resolve(item, blobs) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve(item, blobs) for item in value]
+    return value
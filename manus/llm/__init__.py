@@ -1,6 +1,37 @@
 """LLM helpers."""
 
-from .base import ChatCompletion, ChatMessage, LLMClient
+from .base import ChatCompletion, ChatMessage, LLMClient, ToolCall, Usage
+from .cassette import Cassette, CassetteMiss, RecordingLLMClient, ReplayLLMClient
 from .http_client import HttpLLMClient
+from .routing import LLMEndpoint, RoutingLLMClient, client_from_config, phase_clients_from_settings
+from .usage import (
+    PROCESS_USAGE,
+    UsageLedger,
+    estimate_prompt_tokens,
+    estimate_tokens,
+    remaining_tokens,
+    usage_for,
+)
 
-__all__ = ["ChatCompletion", "ChatMessage", "LLMClient", "HttpLLMClient"]
+__all__ = [
+    "ChatCompletion",
+    "ChatMessage",
+    "LLMClient",
+    "ToolCall",
+    "Usage",
+    "UsageLedger",
+    "PROCESS_USAGE",
+    "estimate_prompt_tokens",
+    "estimate_tokens",
+    "remaining_tokens",
+    "usage_for",
+    "Cassette",
+    "CassetteMiss",
+    "RecordingLLMClient",
+    "ReplayLLMClient",
+    "HttpLLMClient",
+    "LLMEndpoint",
+    "RoutingLLMClient",
+    "client_from_config",
+    "phase_clients_from_settings",
+]
@@ -2,18 +2,49 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Sequence
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Sequence
 
 @dataclass
 class ChatMessage:
     role: str
     content: str
 
+@dataclass
+class ToolCall:
+    id: str
+    name: str
+    # 模型返回的 JSON 字符串；解析失败时保留原文交给调用方处理
+    arguments: str
+
+@dataclass
+class Usage:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # True 表示服务端未返回 usage，数值来自本地估算
+    estimated: bool = False
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @classmethod
+    def from_raw(cls, raw: dict[str, Any]) -> "Usage | None":
+        """Parse the OpenAI-style ``usage`` block of a response, if present."""
+        usage = raw.get("usage") if isinstance(raw, dict) else None
+        if not isinstance(usage, dict) or "prompt_tokens" not in usage:
+            return None
+        return cls(
+            prompt_tokens=int(usage.get("prompt_tokens") or 0),
+            completion_tokens=int(usage.get("completion_tokens") or 0),
+        )
+
 @dataclass
 class ChatCompletion:
     content: str
     raw: dict[str, Any]
+    tool_calls: List[ToolCall] = field(default_factory=list)
+    usage: Usage | None = None
 
 class LLMClient:
     """Abstract base class for chat completion providers."""
@@ -25,5 +56,25 @@ class LLMClient:
         temperature: float,
         max_tokens: int,
         model: str,
+        tools: Sequence[Dict[str, Any]] | None = None,
     ) -> ChatCompletion:
+        """Run one completion; ``tools`` enables OpenAI-style function calling."""
         raise NotImplementedError
+
+    async def stream_chat(
+        self,
+        messages: Sequence[ChatMessage],
+        *,
+        temperature: float,
+        max_tokens: int,
+        model: str,
+    ) -> AsyncIterator[ChatCompletion]:
+        """Yield the completion as it is generated; each chunk's ``content`` is a delta.
+
+        Clients without streaming support yield the whole ``chat`` result once.
+        Usage, when the provider reports it, arrives on the last chunk.
+        """
+        yield await self.chat(messages, temperature=temperature, max_tokens=max_tokens, model=model)
+
+    async def aclose(self) -> None:
+        """Release pooled connections; a no-op for clients without any."""
@@ -0,0 +1,263 @@
+"""Record/replay cassettes for LLM traffic."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Sequence
+
+from .base import ChatCompletion, ChatMessage, LLMClient, ToolCall, Usage
+
+class CassetteMiss(LookupError):
+    """Raised by a strict ``ReplayLLMClient`` when a request was never recorded."""
+
+def request_key(
+    messages: Sequence[ChatMessage],
+    *,
+    temperature: float,
+    max_tokens: int,
+    model: str,
+    tools: Sequence[Dict[str, Any]] | None = None,
+) -> str:
+    """Stable hash of everything that determines an LLM response."""
+    request = _request_dict(messages, temperature, max_tokens, model, tools)
+    blob = json.dumps(request, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:32]
+
+class Cassette:
+    """Recorded request/response pairs plus the runs that produced them.
+
+    Stored as JSONL: one ``interaction`` record per LLM call, followed by a
+    ``run`` record that claims every interaction recorded since the previous
+    run, so each run can be replayed on its own.
+    """
+
+    def __init__(self):
+        self.interactions: list[dict[str, Any]] = []
+        self.runs: list[dict[str, Any]] = []
+        self._claimed = 0
+
+    @classmethod
+    def load(cls, path: str | Path) -> "Cassette":
+        cassette = cls()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("kind") == "interaction":
+                    cassette.interactions.append(record)
+                elif record.get("kind") == "run":
+                    cassette.runs.append(record)
+        cassette._claimed = len(cassette.interactions)
+        return cassette
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            start = 0
+            for run in self.runs:
+                end = run["interactions"][1]
+                for record in self.interactions[start:end]:
+                    f.write(_dumps(record))
+                f.write(_dumps(run))
+                start = end
+            # 尚未归属到 run 的交互（如运行中途失败）也保留下来
+            for record in self.interactions[start:]:
+                f.write(_dumps(record))
+
+    def record(
+        self, key: str, request: dict[str, Any], completion: ChatCompletion, latency: float
+    ) -> None:
+        self.interactions.append(
+            {
+                "kind": "interaction",
+                "key": key,
+                "request": request,
+                "response": {
+                    "content": completion.content,
+                    "tool_calls": [call.__dict__ for call in completion.tool_calls],
+                    "raw": completion.raw,
+                },
+                "latency": round(latency, 4),
+            }
+        )
+
+    def add_run(self, run: dict[str, Any]) -> None:
+        """Attach ``run`` and claim the interactions recorded since the last one."""
+        run = {**run, "kind": "run", "interactions": [self._claimed, len(self.interactions)]}
+        self._claimed = len(self.interactions)
+        self.runs.append(run)
+
+    def interactions_for(self, run: dict[str, Any]) -> list[dict[str, Any]]:
+        start, end = run["interactions"]
+        return self.interactions[start:end]
+
+class RecordingLLMClient(LLMClient):
+    """Passes calls through to ``inner`` and records each one with its latency."""
+
+    def __init__(self, inner: LLMClient, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    async def chat(
+        self,
+        messages: Sequence[ChatMessage],
+        *,
+        temperature: float,
+        max_tokens: int,
+        model: str,
+        tools: Sequence[Dict[str, Any]] | None = None,
+    ) -> ChatCompletion:
+        options = {"tools": tools} if tools else {}
+        started = time.perf_counter()
+        completion = await self.inner.chat(
+            messages, temperature=temperature, max_tokens=max_tokens, model=model, **options
+        )
+        latency = time.perf_counter() - started
+        request = _request_dict(messages, temperature, max_tokens, model, tools)
+        key = request_key(
+            messages, temperature=temperature, max_tokens=max_tokens, model=model, tools=tools
+        )
+        self.cassette.record(key, request, completion, latency)
+        return completion
+
+    async def stream_chat(
+        self,
+        messages: Sequence[ChatMessage],
+        *,
+        temperature: float,
+        max_tokens: int,
+        model: str,
+    ) -> AsyncIterator[ChatCompletion]:
+        """Forward the stream and record it as one interaction with the joined content.
+
+        The recording is replayed as a single chunk through ``chat``. A stream
+        the consumer stops early (e.g. a planning timeout) is recorded with the
+        content received so far, so later interactions keep their order.
+        """
+        parts: list[str] = []
+        usage: Usage | None = None
+        started = time.perf_counter()
+        failed = False
+        try:
+            async for chunk in self.inner.stream_chat(
+                messages, temperature=temperature, max_tokens=max_tokens, model=model
+            ):
+                parts.append(chunk.content)
+                usage = chunk.usage or usage
+                yield chunk
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if not failed:
+                latency = time.perf_counter() - started
+                raw: dict[str, Any] = {}
+                if usage is not None and not usage.estimated:
+                    # 回放时经 Usage.from_raw 还原服务端报告的 token 数
+                    raw["usage"] = {
+                        "prompt_tokens": usage.prompt_tokens,
+                        "completion_tokens": usage.completion_tokens,
+                    }
+                request = _request_dict(messages, temperature, max_tokens, model, None)
+                key = request_key(messages, temperature=temperature, max_tokens=max_tokens, model=model)
+                completion = ChatCompletion(content="".join(parts), raw=raw, usage=usage)
+                self.cassette.record(key, request, completion, latency)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+class ReplayLLMClient(LLMClient):
+    """Serves recorded responses by request hash, without any network access.
+
+    Identical requests are answered in recorded order. When a request was not
+    recorded (e.g. a live tool returned different output), a non-strict client
+    falls back to the next unused interaction and counts a miss; a strict one
+    raises ``CassetteMiss``. ``simulate_latency`` sleeps for the recorded
+    latency before answering.
+    """
+
+    def __init__(
+        self,
+        interactions: Sequence[dict[str, Any]],
+        *,
+        simulate_latency: bool = False,
+        strict: bool = False,
+    ):
+        self.interactions = list(interactions)
+        self.simulate_latency = simulate_latency
+        self.strict = strict
+        self.hits = 0
+        self.misses = 0
+        self._by_key: dict[str, deque[int]] = defaultdict(deque)
+        for idx, record in enumerate(self.interactions):
+            self._by_key[record["key"]].append(idx)
+        self._used: set[int] = set()
+        self._cursor = 0
+
+    async def chat(
+        self,
+        messages: Sequence[ChatMessage],
+        *,
+        temperature: float,
+        max_tokens: int,
+        model: str,
+        tools: Sequence[Dict[str, Any]] | None = None,
+    ) -> ChatCompletion:
+        key = request_key(
+            messages, temperature=temperature, max_tokens=max_tokens, model=model, tools=tools
+        )
+        record = self._take(key)
+        if self.simulate_latency:
+            await asyncio.sleep(record.get("latency", 0.0))
+        response = record["response"]
+        raw = response.get("raw") or {}
+        return ChatCompletion(
+            content=response["content"],
+            raw=raw,
+            tool_calls=[ToolCall(**call) for call in response.get("tool_calls") or []],
+            usage=Usage.from_raw(raw),
+        )
+
+    def _take(self, key: str) -> dict[str, Any]:
+        queue = self._by_key.get(key)
+        while queue:
+            idx = queue.popleft()
+            if idx not in self._used:
+                self._used.add(idx)
+                self.hits += 1
+                return self.interactions[idx]
+        if self.strict:
+            raise CassetteMiss(f"录制中没有匹配的请求: {key}")
+        while self._cursor < len(self.interactions):
+            idx = self._cursor
+            self._cursor += 1
+            if idx not in self._used:
+                self._used.add(idx)
+                self.misses += 1
+                return self.interactions[idx]
+        raise CassetteMiss(f"录制的请求已用尽: {key}")
+
+def _request_dict(
+    messages: Sequence[ChatMessage],
+    temperature: float,
+    max_tokens: int,
+    model: str,
+    tools: Sequence[Dict[str, Any]] | None,
+) -> dict[str, Any]:
+    return {
+        "messages": [{"role": m.role, "content": m.content} for m in messages],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "model": model,
+        "tools": list(tools or []),
+    }
+
+def _dumps(record: dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
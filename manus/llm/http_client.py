@@ -2,15 +2,24 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
+import threading
+from typing import AsyncIterator
+
 import httpx
 
-from .base import ChatCompletion, ChatMessage, LLMClient
+from .base import ChatCompletion, ChatMessage, LLMClient, ToolCall, Usage
 
 class HttpLLMClient(LLMClient):
     def __init__(self, *, base_url: str, api_key: str, timeout: float = 120.0):
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
         self.timeout = timeout
+        # 连接池绑定在事件循环上，每个循环各用一个 client
+        self._clients: dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+        self._closers: dict[asyncio.AbstractEventLoop, AsyncIterator[None]] = {}
+        self._lock = threading.Lock()
 
     async def chat(
         self,
@@ -19,22 +28,109 @@ class HttpLLMClient(LLMClient):
         temperature: float,
         max_tokens: int,
         model: str,
+        tools=None,
     ) -> ChatCompletion:
-        payload = {
+        payload = self._payload(messages, temperature, max_tokens, model)
+        if tools:
+            payload["tools"] = list(tools)
+            payload["tool_choice"] = "auto"
+        client = await self._pooled_client()
+        resp = await client.post(self._url, headers=self._headers, json=payload)
+        resp.raise_for_status()
+        data = resp.json()
+        choice = data["choices"][0]["message"]
+        content = choice.get("content") or ""
+        tool_calls = [
+            ToolCall(
+                id=call.get("id", ""),
+                name=call["function"]["name"],
+                arguments=call["function"].get("arguments") or "{}",
+            )
+            for call in choice.get("tool_calls") or []
+        ]
+        return ChatCompletion(
+            content=content, raw=data, tool_calls=tool_calls, usage=Usage.from_raw(data)
+        )
+
+    async def stream_chat(
+        self,
+        messages,
+        *,
+        temperature: float,
+        max_tokens: int,
+        model: str,
+    ) -> AsyncIterator[ChatCompletion]:
+        payload = self._payload(messages, temperature, max_tokens, model)
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+        client = await self._pooled_client()
+        async with client.stream(
+            "POST", self._url, headers=self._headers, json=payload
+        ) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                # SSE：只关心 data 行，忽略注释与心跳
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                choices = chunk.get("choices") or []
+                delta = (choices[0].get("delta") or {}).get("content") or "" if choices else ""
+                usage = Usage.from_raw(chunk)
+                if delta or usage:
+                    yield ChatCompletion(content=delta, raw=chunk, usage=usage)
+
+    async def aclose(self) -> None:
+        """Close the connection pool of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._clients.pop(loop, None)
+            closer = self._closers.pop(loop, None)
+        if closer is not None:
+            await closer.aclose()
+
+    @property
+    def _url(self) -> str:
+        return f"{self.base_url}/chat/completions"
+
+    @property
+    def _headers(self) -> dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    @staticmethod
+    def _payload(messages, temperature: float, max_tokens: int, model: str) -> dict:
+        return {
             "model": model,
             "messages": [m.__dict__ for m in messages],
             "temperature": temperature,
             "max_tokens": max_tokens,
         }
-        url = f"{self.base_url}/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            resp = await client.post(url, headers=headers, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
-        choice = data["choices"][0]["message"]
-        content = choice.get("content") or ""
-        return ChatCompletion(content=content, raw=data)
+
+    async def _pooled_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for stale in [other for other in self._clients if other.is_closed()]:
+                # 未经 shutdown_asyncgens 就关闭的循环，其连接已无法在原循环上关闭
+                del self._clients[stale]
+                self._closers.pop(stale, None)
+            client = self._clients.get(loop)
+            if client is not None and not client.is_closed:
+                return client
+            client = httpx.AsyncClient(timeout=self.timeout)
+            self._clients[loop] = client
+            closer = _close_with_loop(client)
+            self._closers[loop] = closer
+        # 先启动一步，循环结束时 shutdown_asyncgens 会在该循环上关闭 client
+        await closer.__anext__()
+        return client
+
+async def _close_with_loop(client: httpx.AsyncClient) -> AsyncIterator[None]:
+    try:
+        yield
+    finally:
+        await client.aclose()
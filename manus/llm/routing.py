@@ -0,0 +1,234 @@
+"""Latency-aware routing across several OpenAI-compatible endpoints."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Sequence
+
+from ..config import LLMConfig, ManusSettings
+from .base import ChatCompletion, ChatMessage, LLMClient
+from .http_client import HttpLLMClient
+
+@dataclass
+class LLMEndpoint:
+    name: str
+    client: LLMClient
+    # 副本部署的模型 ID 不同时覆盖请求里的 model
+    model: str | None = None
+
+@dataclass
+class EndpointStats:
+    latency_ewma: float | None = None
+    error_ewma: float = 0.0
+    consecutive_failures: int = 0
+    open_until: float = 0.0
+    requests: int = 0
+    failures: int = 0
+
+class RoutingLLMClient(LLMClient):
+    """Sends each request to the endpoint with the best latency/error EWMA.
+
+    With ``hedge_after`` set, a duplicate request goes to the next best
+    endpoint once the first has been pending that long; the first success
+    wins and the other request is cancelled. Endpoints that fail
+    ``failure_threshold`` times in a row are skipped for ``cooldown`` seconds.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[LLMEndpoint],
+        *,
+        hedge_after: float | None = None,
+        alpha: float = 0.2,
+        error_penalty: float = 4.0,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not endpoints:
+            raise ValueError("至少需要一个 endpoint")
+        self.endpoints = list(endpoints)
+        self.hedge_after = hedge_after
+        self.alpha = alpha
+        self.error_penalty = error_penalty
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        # 同名（如相同 base_url）的 endpoint 各自统计，重复的名字加 "#n" 后缀
+        self._keys: dict[int, str] = {}
+        self._stats: dict[str, EndpointStats] = {}
+        for endpoint in self.endpoints:
+            key, n = endpoint.name, 1
+            while key in self._stats:
+                n += 1
+                key = f"{endpoint.name}#{n}"
+            self._keys[id(endpoint)] = key
+            self._stats[key] = EndpointStats()
+
+    async def chat(
+        self,
+        messages: Sequence[ChatMessage],
+        *,
+        temperature: float,
+        max_tokens: int,
+        model: str,
+        **options: Any,
+    ) -> ChatCompletion:
+        candidates = self._rank()
+        pending: dict[asyncio.Task, LLMEndpoint] = {}
+        errors: list[BaseException] = []
+        hedged = False
+
+        def launch() -> None:
+            endpoint = candidates.pop(0)
+            call = endpoint.client.chat(
+                messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                model=endpoint.model or model,
+                **options,
+            )
+            pending[asyncio.ensure_future(self._timed(endpoint, call))] = endpoint
+
+        launch()
+        try:
+            while pending:
+                can_hedge = self.hedge_after is not None and not hedged and candidates
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    hedged = True
+                    launch()
+                    continue
+                for task in done:
+                    pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(task.exception())
+                if not pending and candidates:
+                    # 失败转移到下一个可用 endpoint
+                    launch()
+            raise errors[-1]
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def stream_chat(
+        self,
+        messages: Sequence[ChatMessage],
+        *,
+        temperature: float,
+        max_tokens: int,
+        model: str,
+    ) -> AsyncIterator[ChatCompletion]:
+        """Stream from the best endpoint; fails over only before the first chunk."""
+        errors: list[BaseException] = []
+        for endpoint in self._rank():
+            stats = self._stats_for(endpoint)
+            stats.requests += 1
+            started = self._clock()
+            yielded = False
+            try:
+                async for chunk in endpoint.client.stream_chat(
+                    messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    model=endpoint.model or model,
+                ):
+                    yielded = True
+                    yield chunk
+            except Exception as exc:
+                self._record_failure(stats)
+                if yielded:
+                    # 已经交出部分内容，换 endpoint 会让输出重复
+                    raise
+                errors.append(exc)
+                continue
+            self._record_success(stats, self._clock() - started)
+            return
+        raise errors[-1]
+
+    async def aclose(self) -> None:
+        for endpoint in self.endpoints:
+            await endpoint.client.aclose()
+
+    def stats(self) -> dict[str, EndpointStats]:
+        return dict(self._stats)
+
+    def _rank(self) -> list[LLMEndpoint]:
+        now = self._clock()
+        available = [ep for ep in self.endpoints if self._stats_for(ep).open_until <= now]
+        if not available:
+            # 全部熔断时选最早恢复的一个做半开探测
+            return [min(self.endpoints, key=lambda ep: self._stats_for(ep).open_until)]
+        measured = [s.latency_ewma for s in self._stats.values() if s.latency_ewma is not None]
+        # 没有成功过的 endpoint 按其余 endpoint 的平均延迟估计，错误惩罚照常生效
+        prior = sum(measured) / len(measured) if measured else 1.0
+        return sorted(available, key=lambda ep: self._score(ep, prior))
+
+    def _score(self, endpoint: LLMEndpoint, prior: float) -> float:
+        stats = self._stats_for(endpoint)
+        if stats.latency_ewma is None and stats.error_ewma == 0.0:
+            # 从未请求过的 endpoint 得分为 0，优先探测
+            return 0.0
+        latency = prior if stats.latency_ewma is None else stats.latency_ewma
+        return latency * (1.0 + self.error_penalty * stats.error_ewma)
+
+    def _stats_for(self, endpoint: LLMEndpoint) -> EndpointStats:
+        return self._stats[self._keys[id(endpoint)]]
+
+    async def _timed(self, endpoint: LLMEndpoint, call) -> ChatCompletion:
+        stats = self._stats_for(endpoint)
+        stats.requests += 1
+        started = self._clock()
+        try:
+            result = await call
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._record_failure(stats)
+            raise
+        self._record_success(stats, self._clock() - started)
+        return result
+
+    def _record_success(self, stats: EndpointStats, latency: float) -> None:
+        if stats.latency_ewma is None:
+            stats.latency_ewma = latency
+        else:
+            stats.latency_ewma += self.alpha * (latency - stats.latency_ewma)
+        stats.error_ewma *= 1.0 - self.alpha
+        stats.consecutive_failures = 0
+        stats.open_until = 0.0
+
+    def _record_failure(self, stats: EndpointStats) -> None:
+        stats.failures += 1
+        stats.error_ewma += self.alpha * (1.0 - stats.error_ewma)
+        stats.consecutive_failures += 1
+        if stats.consecutive_failures >= self.failure_threshold:
+            stats.open_until = self._clock() + self.cooldown
+
+def client_from_config(config: LLMConfig) -> LLMClient:
+    """Single ``HttpLLMClient``, or a router when ``config.replicas`` is set."""
+    primary = HttpLLMClient(base_url=config.base_url, api_key=config.api_key, timeout=config.timeout)
+    if not config.replicas:
+        return primary
+    endpoints = [LLMEndpoint(name=config.base_url, client=primary)]
+    for base_url in config.replicas:
+        client = HttpLLMClient(base_url=base_url, api_key=config.api_key, timeout=config.timeout)
+        endpoints.append(LLMEndpoint(name=base_url, client=client))
+    return RoutingLLMClient(endpoints, hedge_after=config.hedge_after)
+
+def phase_clients_from_settings(settings: ManusSettings) -> Dict[str, LLMClient]:
+    """Dedicated clients for phases that point at their own endpoint or key."""
+    clients: Dict[str, LLMClient] = {}
+    for name, phase in settings.phases.items():
+        if phase.base_url or phase.api_key:
+            clients[name] = client_from_config(settings.phase_llm(name))
+    return clients
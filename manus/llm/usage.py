@@ -0,0 +1,116 @@
+"""Token usage accounting and budgets."""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+import threading
+from typing import Any, Dict, Sequence
+
+from .base import ChatCompletion, ChatMessage, Usage
+
+_CJK = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uff00-\uffef]")
+# 每条消息的角色与分隔符开销（OpenAI chat 格式的经验值）
+_MESSAGE_OVERHEAD = 4
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: one per CJK character, one per four other characters."""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+def estimate_prompt_tokens(
+    messages: Sequence[ChatMessage], tools: Sequence[Dict[str, Any]] | None = None
+) -> int:
+    total = sum(estimate_tokens(m.content) + _MESSAGE_OVERHEAD for m in messages)
+    if tools:
+        total += estimate_tokens(json.dumps(list(tools), ensure_ascii=False))
+    return total
+
+def usage_for(
+    completion: ChatCompletion,
+    messages: Sequence[ChatMessage],
+    tools: Sequence[Dict[str, Any]] | None = None,
+) -> Usage:
+    """Provider-reported usage when available, otherwise a local estimate."""
+    usage = completion.usage or Usage.from_raw(completion.raw)
+    if usage is not None:
+        return usage
+    output = completion.content + "".join(c.name + c.arguments for c in completion.tool_calls)
+    return Usage(
+        prompt_tokens=estimate_prompt_tokens(messages, tools),
+        completion_tokens=estimate_tokens(output),
+        estimated=True,
+    )
+
+class UsageLedger:
+    """Token totals per phase; records are forwarded to ``parent`` as well.
+
+    A run ledger normally has the process-wide ``PROCESS_USAGE`` as parent,
+    so per-run and per-process budgets see the same calls.
+    """
+
+    def __init__(self, *, parent: "UsageLedger | None" = None):
+        self.parent = parent
+        self.calls = 0
+        self._phases: dict[str, Usage] = {}
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, usage: Usage) -> None:
+        with self._lock:
+            current = self._phases.setdefault(phase, Usage())
+            current.prompt_tokens += usage.prompt_tokens
+            current.completion_tokens += usage.completion_tokens
+            current.estimated = current.estimated or usage.estimated
+            self.calls += 1
+        if self.parent is not None:
+            self.parent.record(phase, usage)
+
+    @property
+    def total(self) -> Usage:
+        with self._lock:
+            phases = list(self._phases.values())
+        return Usage(
+            prompt_tokens=sum(u.prompt_tokens for u in phases),
+            completion_tokens=sum(u.completion_tokens for u in phases),
+            estimated=any(u.estimated for u in phases),
+        )
+
+    def by_phase(self) -> dict[str, Usage]:
+        with self._lock:
+            return {name: Usage(**usage.__dict__) for name, usage in self._phases.items()}
+
+    def summary(self) -> dict[str, Any]:
+        total = self.total
+        return {
+            "prompt_tokens": total.prompt_tokens,
+            "completion_tokens": total.completion_tokens,
+            "total_tokens": total.total_tokens,
+            "estimated": total.estimated,
+            "calls": self.calls,
+            "phases": {name: usage.total_tokens for name, usage in self.by_phase().items()},
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._phases.clear()
+            self.calls = 0
+
+# 进程内所有 run 共享的累计用量，供 ManusSettings.process_token_budget 使用
+PROCESS_USAGE = UsageLedger()
+
+def remaining_tokens(
+    ledger: UsageLedger, *, run_budget: int | None, process_budget: int | None
+) -> int | None:
+    """Tokens left under the tighter of the two budgets; ``None`` when unbounded."""
+    limits = []
+    if run_budget is not None:
+        limits.append(run_budget - ledger.total.total_tokens)
+    if process_budget is not None:
+        root = ledger
+        while root.parent is not None:
+            root = root.parent
+        limits.append(process_budget - root.total.total_tokens)
+    return min(limits) if limits else None
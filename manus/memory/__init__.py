@@ -1,3 +1,4 @@
-from .store import MemoryEvent, MemoryStore
+from .sqlite_store import SqliteMemoryStore
+from .store import MemoryEvent, MemoryIndex, MemoryStore
 
-__all__ = ["MemoryEvent", "MemoryStore"]
+__all__ = ["MemoryEvent", "MemoryIndex", "MemoryStore", "SqliteMemoryStore"]
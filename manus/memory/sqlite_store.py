@@ -0,0 +1,235 @@
+"""Durable MemoryStore backed by SQLite in WAL mode."""
+
+from __future__ import annotations
+
+import json
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Iterable, List
+
+from .store import MemoryEvent, MemoryStore
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memory_events (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID
+"""
+
+_STOP = object()
+
+class SqliteMemoryStore(MemoryStore):
+    """Session-scoped ``MemoryStore`` that survives restarts.
+
+    ``add`` only appends to the in-process window and enqueues the row; a
+    writer thread commits queued rows in batches, so the agent loop never waits
+    on disk. Resuming a session loads just the last ``cache_size`` events;
+    older ones are read from SQLite on demand. ``search`` covers the resumed
+    window plus everything added since; pass ``index_history=True`` (as the
+    CLI does when recall is enabled) to index the whole session at resume,
+    at the cost of reading every row.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        session_id: str,
+        cache_size: int = 256,
+        batch_size: int = 64,
+        index_history: bool = False,
+    ):
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.session_id = session_id
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self._conn = _connect(self.path)
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self._read_lock = threading.Lock()
+        self._persisted_before = 0
+        self._next_seq = 0
+        # 写线程已提交到的位置：seq 小于它的事件都能直接从 SQLite 读到
+        self._written_through = 0
+        self._resume(index_history=index_history)
+        self._queue: queue.Queue = queue.Queue()
+        self._error: BaseException | None = None
+        self._writer = threading.Thread(
+            target=self._write_loop, name=f"manus-memory-{session_id}", daemon=True
+        )
+        self._writer.start()
+
+    @staticmethod
+    def list_sessions(path: str | Path) -> list[str]:
+        conn = _connect(Path(path))
+        try:
+            conn.execute(_SCHEMA)
+            rows = conn.execute("SELECT DISTINCT session_id FROM memory_events ORDER BY session_id")
+            return [row[0] for row in rows]
+        finally:
+            conn.close()
+
+    def add(self, role: str, content: str, *, metadata: dict[str, Any] | None = None) -> None:
+        self._append(MemoryEvent(role=role, content=content, metadata=metadata or {}))
+
+    def extend(self, events: Iterable[MemoryEvent]) -> None:
+        for event in events:
+            self._append(event)
+
+    def tail(self, limit: int = 10) -> List[MemoryEvent]:
+        if limit <= len(self._events) or not self._persisted_before:
+            return super().tail(limit)
+        # 窗口不够时才回表读取更早的事件；窗口内的部分直接用缓存
+        first_cached = self._next_seq - len(self._events)
+        self._wait_for_write(first_cached)
+        with self._read_lock:
+            rows = self._conn.execute(
+                "SELECT role, content, metadata FROM memory_events WHERE session_id = ? AND seq < ?"
+                " ORDER BY seq DESC LIMIT ?",
+                (self.session_id, first_cached, limit - len(self._events)),
+            ).fetchall()
+        return [_row_to_event(row) for row in reversed(rows)] + list(self._events)
+
+    def clear(self) -> None:
+        self.flush()
+        super().clear()
+        with self._read_lock:
+            self._conn.execute("DELETE FROM memory_events WHERE session_id = ?", (self.session_id,))
+            self._conn.commit()
+        self._persisted_before = 0
+
+    def flush(self) -> None:
+        """Block until every queued event is committed."""
+        self._queue.join()
+        if self._error is not None:
+            raise RuntimeError("写入会话存储失败") from self._error
+
+    def __enter__(self) -> "SqliteMemoryStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        self._conn.close()
+        if self._error is not None:
+            raise RuntimeError("写入会话存储失败") from self._error
+
+    def __len__(self) -> int:
+        return self._persisted_before + len(self._events)
+
+    def _append(self, event: MemoryEvent) -> None:
+        seq = self._next_seq
+        self._next_seq += 1
+        self._events.append(event)
+        self._index.add(seq, event.content)
+        if len(self._events) > self.cache_size:
+            overflow = len(self._events) - self.cache_size
+            del self._events[:overflow]
+            self._persisted_before += overflow
+        self._queue.put((seq, event))
+
+    def _wait_for_write(self, seq: int) -> None:
+        # 被挤出窗口的事件通常早已提交；只有仍在写队列里时才阻塞等待
+        if self._written_through < seq:
+            self.flush()
+
+    def _event_at(self, seq: int) -> MemoryEvent:
+        offset = seq - (self._next_seq - len(self._events))
+        if 0 <= offset < len(self._events):
+            return self._events[offset]
+        self._wait_for_write(seq + 1)
+        with self._read_lock:
+            row = self._conn.execute(
+                "SELECT role, content, metadata FROM memory_events WHERE session_id = ? AND seq = ?",
+                (self.session_id, seq),
+            ).fetchone()
+        return _row_to_event(row)
+
+    def _resume(self, *, index_history: bool) -> None:
+        count, last_seq = self._conn.execute(
+            "SELECT COUNT(*), MAX(seq) FROM memory_events WHERE session_id = ?",
+            (self.session_id,),
+        ).fetchone()
+        if not count:
+            return
+        rows = self._conn.execute(
+            "SELECT seq, role, content, metadata FROM memory_events WHERE session_id = ?"
+            " ORDER BY seq DESC LIMIT ?",
+            (self.session_id, self.cache_size),
+        ).fetchall()
+        rows.reverse()
+        self._events = [_row_to_event(row[1:]) for row in rows]
+        self._persisted_before = count - len(self._events)
+        self._next_seq = last_seq + 1
+        self._written_through = self._next_seq
+        if index_history:
+            history = self._conn.execute(
+                "SELECT seq, content FROM memory_events WHERE session_id = ? ORDER BY seq",
+                (self.session_id,),
+            )
+            for seq, content in history:
+                self._index.add(seq, content)
+        else:
+            for seq, _, content, _ in rows:
+                self._index.add(seq, content)
+
+    def _write_loop(self) -> None:
+        conn = _connect(self.path)
+        try:
+            while True:
+                item = self._queue.get()
+                batch = [item]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = any(entry is _STOP for entry in batch)
+                rows = [
+                    (
+                        self.session_id,
+                        seq,
+                        event.role,
+                        event.content,
+                        json.dumps(event.metadata or {}, ensure_ascii=False, default=str),
+                    )
+                    for seq, event in (entry for entry in batch if entry is not _STOP)
+                ]
+                try:
+                    if rows:
+                        with conn:
+                            conn.executemany("INSERT INTO memory_events VALUES (?, ?, ?, ?, ?)", rows)
+                        # 队列按 seq 顺序写入，提交后整段都已可读
+                        self._written_through = rows[-1][1] + 1
+                except sqlite3.Error as exc:
+                    self._error = exc
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+def _connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL 下 NORMAL 只在 checkpoint 时 fsync，提交不阻塞
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def _row_to_event(row: tuple) -> MemoryEvent:
+    role, content, metadata = row
+    return MemoryEvent(role=role, content=content, metadata=json.loads(metadata))
@@ -2,35 +2,103 @@
 
 from __future__ import annotations
 
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
 from dataclasses import dataclass, field
 from typing import Any, Iterable, List
 
+_WORD_PATTERN = re.compile(r"[a-z0-9_]+|[\u3400-\u9fff]+")
+
 @dataclass
 class MemoryEvent:
     role: str
     content: str
     metadata: dict[str, Any] | None = field(default_factory=dict)
 
+class MemoryIndex:
+    """Incremental BM25 index keyed by event sequence number.
+
+    ASCII words are indexed as-is and CJK runs as character bigrams, so
+    Chinese tool output is searchable without a tokenizer.
+    """
+
+    def __init__(self, *, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, dict[int, int]] = defaultdict(dict)
+        self._lengths: dict[int, int] = {}
+        self._total_length = 0
+
+    def add(self, seq: int, text: str) -> None:
+        terms = Counter(_terms(text))
+        self._lengths[seq] = sum(terms.values())
+        self._total_length += self._lengths[seq]
+        for term, count in terms.items():
+            self._postings[term][seq] = count
+
+    def search(self, query: str, k: int) -> list[tuple[int, float]]:
+        if not self._lengths:
+            return []
+        docs = len(self._lengths)
+        average = self._total_length / docs or 1.0
+        scores: dict[int, float] = defaultdict(float)
+        for term in set(_terms(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for seq, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[seq] / average)
+                scores[seq] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
 class MemoryStore:
     def __init__(self):
         self._events: List[MemoryEvent] = []
+        self._index = MemoryIndex()
 
     def add(self, role: str, content: str, *, metadata: dict[str, Any] | None = None) -> None:
         event = MemoryEvent(role=role, content=content, metadata=metadata or {})
+        self._index.add(len(self._events), event.content)
         self._events.append(event)
 
     def extend(self, events: Iterable[MemoryEvent]) -> None:
         for event in events:
+            self._index.add(len(self._events), event.content)
             self._events.append(event)
 
     def tail(self, limit: int = 10) -> List[MemoryEvent]:
         return self._events[-limit:]
 
+    def search(self, query: str, k: int = 5) -> List[MemoryEvent]:
+        """Events most relevant to ``query`` (BM25), best first."""
+        return [self._event_at(seq) for seq, _ in self._index.search(query, k)]
+
     def as_prompt(self, limit: int = 10) -> list[dict[str, str]]:
         return [{"role": e.role, "content": e.content} for e in self.tail(limit)]
 
     def clear(self) -> None:
         self._events.clear()
+        self._index = MemoryIndex()
+
+    def _event_at(self, seq: int) -> MemoryEvent:
+        return self._events[seq]
 
     def __len__(self) -> int:  # pragma: no cover - trivial
         return len(self._events)
+
+def _terms(text: str) -> list[str]:
+    terms: list[str] = []
+    for token in _WORD_PATTERN.findall(text.lower()):
+        if token[0].isascii():
+            terms.append(token)
+        elif len(token) == 1:
+            terms.append(token)
+        else:
+            terms.extend(token[i : i + 2] for i in range(len(token) - 1))
+    return terms
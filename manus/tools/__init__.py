@@ -1,9 +1,13 @@
 """Tool registry exports."""
 
-from .base import Tool, ToolInput, ToolOutput, ToolRegistry
+from .base import Tool, ToolInput, ToolOutput, ToolRegistry, run_in_thread
 from .calculator import CalculatorTool
+from .federated_search import FederatedSearchTool
+from .file_index import FileHit, TrigramIndex
 from .functools_component import register_functools_tools
+from .interpreter import InterpreterPool, InterpreterSession
 from .local_search import LocalSearchTool
+from .scheduler import ResourceClass, ResourceMetrics, ToolRejected, ToolScheduler
 
 __all__ = [
     "Tool",
@@ -12,12 +16,22 @@ __all__ = [
     "ToolRegistry",
     "LocalSearchTool",
     "CalculatorTool",
+    "FederatedSearchTool",
+    "FileHit",
+    "TrigramIndex",
+    "InterpreterPool",
+    "InterpreterSession",
+    "ResourceClass",
+    "ResourceMetrics",
+    "ToolRejected",
+    "ToolScheduler",
     "register_functools_tools",
     "build_default_registry",
+    "run_in_thread",
 ]
 
 def build_default_registry() -> ToolRegistry:
-    registry = ToolRegistry()
+    registry = ToolRegistry(scheduler=ToolScheduler.default_limits())
     registry.register(LocalSearchTool())
     registry.register(CalculatorTool())
     register_functools_tools(registry)
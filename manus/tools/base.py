@@ -2,8 +2,48 @@
 
 from __future__ import annotations
 
+import asyncio
+import re
 from dataclasses import dataclass
-from typing import Any, Awaitable, Callable, Dict, Protocol
+from typing import Any, Awaitable, Callable, Dict, Iterable, Protocol, TypeVar
+
+from .scheduler import ToolScheduler
+from .vector_index import HashedEmbedder, top_k_indices
+
+# 未声明参数的工具统一接收一个自由文本 task
+DEFAULT_PARAMETERS: Dict[str, Any] = {
+    "type": "object",
+    "properties": {"task": {"type": "string", "description": "该步骤要完成的内容"}},
+    "required": ["task"],
+}
+
+# 不同工具子集的 prompt 缓存上限，超过后整体清空
+_CACHE_LIMIT = 512
+
+T = TypeVar("T")
+
+async def run_in_thread(func: Callable[..., T], *args: Any) -> T:
+    """``asyncio.to_thread`` for tools whose work cannot be interrupted.
+
+    When the awaiting task is cancelled (e.g. a step timeout), the task stays
+    alive until the thread really finishes, so ``ToolRegistry.call`` keeps the
+    scheduler slot for the whole thread instead of over-admitting new work.
+    """
+    work = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        return await asyncio.shield(work)
+    except asyncio.CancelledError:
+        await asyncio.wait([work])
+        raise
+
+_JSON_TYPES: Dict[str, tuple[type, ...]] = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "array": (list,),
+    "object": (dict,),
+}
 
 @dataclass
 class ToolInput:
@@ -23,26 +63,196 @@ class Tool(Protocol):
         ...
 
 class ToolRegistry:
-    def __init__(self):
+    def __init__(self, *, scheduler: ToolScheduler | None = None):
         self._tools: dict[str, Tool] = {}
+        # 设置后 call() 经准入控制执行工具，限制各资源类的并发
+        self.scheduler = scheduler
+        self._aliases: dict[str, str] = {}
+        # 反向映射：目标工具 -> 指向它的别名，register 时维护
+        self._alias_names: dict[str, set[str]] = {}
+        # 以下缓存在 register 时整体失效
+        self._sorted: list[str] | None = None
+        self._lowered: dict[str, str] | None = None
+        self._prompt_cache: dict[tuple[str, ...] | None, str] = {}
+        self._openai_cache: dict[tuple[str, ...] | None, list[Dict[str, Any]]] = {}
+        self._index: _ToolIndex | None = None
 
-    def register(self, tool: Tool) -> None:
+    def register(self, tool: Tool, *, alias_of: str | None = None) -> None:
+        """Register ``tool``; ``alias_of`` marks it as a duplicate of another tool.
+
+        Aliases stay callable by name but are folded into their canonical
+        tool in prompt blocks and shortlists.
+        """
         self._tools[tool.name] = tool
+        previous = self._aliases.pop(tool.name, None)
+        if previous is not None:
+            self._alias_names[previous].discard(tool.name)
+        if alias_of and alias_of != tool.name:
+            self._aliases[tool.name] = alias_of
+            self._alias_names.setdefault(alias_of, set()).add(tool.name)
+        self._sorted = None
+        self._lowered = None
+        self._prompt_cache.clear()
+        self._openai_cache.clear()
+        self._index = None
 
     def get(self, name: str) -> Tool:
         if name not in self._tools:
             raise KeyError(f"Tool '{name}' not registered")
         return self._tools[name]
 
+    def resolve(self, name: str) -> str | None:
+        """Registered name for ``name``: exact match first, then case-insensitive."""
+        name = name.strip()
+        if name in self._tools:
+            return name
+        if self._lowered is None:
+            self._lowered = {}
+            for registered in self.listed():
+                self._lowered.setdefault(registered.lower(), registered)
+        return self._lowered.get(name.lower())
+
+    async def call(self, name: str, tool_input: ToolInput, *, run_id: str | None = None) -> ToolOutput:
+        """Run tool ``name``, holding a scheduler slot for its canonical name if set.
+
+        The slot is held until the tool's task ends, even when the caller has
+        already given up on it. Raises ``ToolRejected`` when admission control
+        sheds the call.
+        """
+        tool = self.get(name)
+        if self.scheduler is None:
+            return await tool.arun(tool_input)
+        release = await self.scheduler.acquire(self.canonical(name), run_id=run_id)
+        task = asyncio.ensure_future(tool.arun(tool_input))
+
+        def finished(done: asyncio.Future) -> None:
+            # 名额随工具任务真正结束才归还：超时后仍在跑的线程继续计入并发上限
+            release()
+            if not done.cancelled():
+                done.exception()  # 调用方已放弃时也标记为已读取，避免告警
+
+        task.add_done_callback(finished)
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+
     def listed(self) -> list[str]:
-        return sorted(self._tools)
+        if self._sorted is None:
+            self._sorted = sorted(self._tools)
+        return list(self._sorted)
+
+    def canonical(self, name: str) -> str:
+        target = self._aliases.get(name, name)
+        return target if target in self._tools else name
+
+    def canonical_names(self) -> list[str]:
+        return [name for name in self.listed() if self.canonical(name) == name]
+
+    def aliases_of(self, name: str) -> list[str]:
+        if name not in self._tools:
+            return []
+        return sorted(self._alias_names.get(name, ()))
 
-    def as_prompt_block(self) -> str:
-        lines = []
-        for key in self.listed():
-            tool = self._tools[key]
-            lines.append(f"- {tool.name}: {tool.description}")
-        return "\n".join(lines)
+    def as_prompt_block(self, names: Iterable[str] | None = None) -> str:
+        """Prompt lines for ``names`` (default: all), memoized and byte-stable.
+
+        Names are canonicalized and sorted, so the same tool set always yields
+        the same text regardless of the order it was selected in.
+        """
+        key = self._cache_key(names)
+        if key not in self._prompt_cache:
+            lines = []
+            for name in key if key is not None else self.canonical_names():
+                tool = self._tools[name]
+                line = f"- {tool.name}: {tool.description}"
+                aliases = self.aliases_of(name)
+                if aliases:
+                    line += f"（别名: {', '.join(aliases)}）"
+                lines.append(line)
+            self._prompt_cache[key] = "\n".join(lines)
+        return self._prompt_cache[key]
+
+    def shortlist(self, task: str, k: int, *, pinned: Iterable[str] = ()) -> list[str]:
+        """The ``k`` canonical tools most relevant to ``task``, plus ``pinned`` ones.
+
+        Tools named verbatim in the task are always kept. The result is
+        sorted by name so it can key prompt caches directly.
+        """
+        if self._index is None:
+            self._index = _ToolIndex(self)
+        chosen = set(self._index.top(task, k))
+        chosen.update(self.canonical(name) for name in self._index.mentioned(task))
+        chosen.update(self.canonical(name) for name in pinned if name in self._tools)
+        return sorted(chosen)
+
+    def schema(self, name: str) -> Dict[str, Any]:
+        # 工具可选地声明 JSON Schema 形式的 parameters 属性
+        return getattr(self.get(name), "parameters", None) or DEFAULT_PARAMETERS
+
+    def as_openai_tools(self, names: Iterable[str] | None = None) -> list[Dict[str, Any]]:
+        """Tool declarations for the OpenAI-compatible ``tools`` request field."""
+        key = self._cache_key(names)
+        if key not in self._openai_cache:
+            specs = []
+            for name in key if key is not None else self.canonical_names():
+                tool = self.get(name)
+                specs.append(
+                    {
+                        "type": "function",
+                        "function": {
+                            "name": tool.name,
+                            "description": tool.description,
+                            "parameters": self.schema(name),
+                        },
+                    }
+                )
+            self._openai_cache[key] = specs
+        return self._openai_cache[key]
+
+    def validate_arguments(self, name: str, arguments: Any) -> Dict[str, Any]:
+        return validate_arguments(self.schema(name), arguments)
+
+    def _cache_key(self, names: Iterable[str] | None) -> tuple[str, ...] | None:
+        if names is None:
+            return None
+        key = tuple(sorted({self.canonical(name) for name in names}))
+        for name in key:
+            self.get(name)
+        if len(self._prompt_cache) >= _CACHE_LIMIT:
+            self._prompt_cache.clear()
+            self._openai_cache.clear()
+        return key
+
+
+class _ToolIndex:
+    """Hashed n-gram vectors over canonical tool names, aliases and descriptions."""
+
+    def __init__(self, registry: ToolRegistry):
+        self.names = registry.canonical_names()
+        self.embedder = HashedEmbedder(dim=1024)
+        texts = []
+        for name in self.names:
+            tool = registry.get(name)
+            aliases = " ".join(registry.aliases_of(name))
+            texts.append(f"{name} {aliases} {tool.description}")
+        self.matrix = self.embedder.embed_many(texts)
+        # 按词边界匹配任务中直接点名的工具，避免 "research" 命中 "search"
+        names = sorted(registry.listed(), key=len, reverse=True)
+        self.mention_pattern = re.compile(
+            r"(?<![a-z0-9_])(" + "|".join(re.escape(name.lower()) for name in names) + r")(?![a-z0-9_])"
+        ) if names else None
+        self.by_lower = {name.lower(): name for name in registry.listed()}
+
+    def mentioned(self, task: str) -> list[str]:
+        if self.mention_pattern is None:
+            return []
+        return [self.by_lower[match] for match in self.mention_pattern.findall(task.lower())]
+
+    def top(self, task: str, k: int) -> list[str]:
+        scores = self.matrix @ self.embedder.embed(task)
+        return [self.names[idx] for idx in top_k_indices(scores, k)]
 
 
 class FunctionTool:
@@ -54,10 +264,48 @@ class FunctionTool:
         name: str,
         description: str,
         func: Callable[[ToolInput], Awaitable[ToolOutput]],
+        parameters: Dict[str, Any] | None = None,
     ):
         self.name = name
         self.description = description
+        self.parameters = parameters
         self._func = func
 
     async def arun(self, tool_input: ToolInput) -> ToolOutput:  # pragma: no cover - thin wrapper
         return await self._func(tool_input)
+
+
+def validate_arguments(schema: Dict[str, Any], arguments: Any) -> Dict[str, Any]:
+    """Check tool-call arguments against the subset of JSON Schema tools use.
+
+    Supports ``type``, ``properties``, ``required``, ``enum`` and array
+    ``items``; raises ``ValueError`` describing the first violation.
+    """
+    if not isinstance(arguments, dict):
+        raise ValueError("参数必须是 JSON 对象")
+    properties = schema.get("properties", {})
+    missing = [key for key in schema.get("required", []) if key not in arguments]
+    if missing:
+        raise ValueError(f"缺少必填参数: {', '.join(missing)}")
+    for key, value in arguments.items():
+        if key not in properties:
+            if schema.get("additionalProperties", True) is False:
+                raise ValueError(f"未知参数: {key}")
+            continue
+        _check_value(key, properties[key], value)
+    return arguments
+
+
+def _check_value(path: str, schema: Dict[str, Any], value: Any) -> None:
+    expected = schema.get("type")
+    if expected in _JSON_TYPES:
+        valid = isinstance(value, _JSON_TYPES[expected])
+        if expected in {"integer", "number"} and isinstance(value, bool):
+            valid = False
+        if not valid:
+            raise ValueError(f"参数 {path} 应为 {expected}")
+    if "enum" in schema and value not in schema["enum"]:
+        raise ValueError(f"参数 {path} 取值不在 {schema['enum']} 中")
+    if expected == "array" and "items" in schema:
+        for idx, item in enumerate(value):
+            _check_value(f"{path}[{idx}]", schema["items"], item)
@@ -40,6 +40,11 @@ _OPERATORS = {
 class CalculatorTool:
     name = "calculator"
     description = "安全的 +, -, *, /, %, ** 计算工具"
+    parameters = {
+        "type": "object",
+        "properties": {"expression": {"type": "string", "description": "纯算式，如 (3+4)*2"}},
+        "required": ["expression"],
+    }
 
     async def arun(self, tool_input: ToolInput) -> ToolOutput:
         raw_expression = tool_input.context.get("expression") or tool_input.task
@@ -0,0 +1,145 @@
+"""Federated search across independently indexed corpus shards."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Mapping
+
+from .base import ToolInput, ToolOutput
+from .local_search import LocalSearchTool
+
+NORMALIZATIONS = ("global", "none")
+
+class FederatedSearchTool:
+    """Scores a query on N ``LocalSearchTool`` shards in parallel and merges them.
+
+    Each shard keeps its own index (and hot reload). All shards must use the
+    same search mode so their raw scores are comparable and merge through a
+    global top-k heap; ``normalize="global"`` only rescales them by the
+    overall best hit. In hybrid mode the lexical half is divided by the best
+    lexical score across all queried shards (fetched in a first, cheap pass),
+    so scores match those of one index over the combined corpus.
+    Lexical and dense scoring are numpy postings/matrix work, which is what
+    lets the thread pool overlap shards. Pass ``context["shards"]`` to query
+    a subset.
+    """
+
+    name = "federated_search"
+    description = "跨多个团队/产品语料分片的并行检索"
+    parameters = {
+        "type": "object",
+        "properties": {
+            "query": {"type": "string", "description": "检索关键词"},
+            "shards": {"type": "array", "items": {"type": "string"}, "description": "只检索这些分片"},
+            "top_k": {"type": "integer", "description": "返回条数"},
+        },
+        "required": ["query"],
+    }
+
+    def __init__(
+        self,
+        shards: Mapping[str, LocalSearchTool],
+        *,
+        top_k: int = 5,
+        normalize: str = "global",
+        max_workers: int | None = None,
+    ):
+        if normalize not in NORMALIZATIONS:
+            raise ValueError(f"未知归一化方式: {normalize}")
+        _check_modes(shards.values())
+        self.shards: Dict[str, LocalSearchTool] = dict(shards)
+        self.top_k = top_k
+        self.normalize = normalize
+        workers = max_workers or min(32, max(len(self.shards), 1), (os.cpu_count() or 4) * 2)
+        # 打分都落在 numpy 向量运算上，运算期间释放 GIL，分片在线程池里可以重叠执行
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="manus-shard")
+
+    @classmethod
+    def from_paths(
+        cls, paths: Mapping[str, str | Path], *, mode: str = "lexical", **kwargs: Any
+    ) -> "FederatedSearchTool":
+        shards = {name: LocalSearchTool(data_path=Path(path), mode=mode) for name, path in paths.items()}
+        return cls(shards, **kwargs)
+
+    def add_shard(self, name: str, shard: LocalSearchTool) -> None:
+        _check_modes([*self.shards.values(), shard])
+        self.shards = {**self.shards, name: shard}
+
+    def remove_shard(self, name: str) -> None:
+        self.shards = {key: value for key, value in self.shards.items() if key != name}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    async def search(
+        self, query: str, *, shards: Iterable[str] | None = None, top_k: int | None = None
+    ) -> list[tuple[float, str, Dict[str, Any]]]:
+        limit = top_k or self.top_k
+        selected = self._select(shards)
+        loop = asyncio.get_running_loop()
+        peak = None
+        if any(shard.mode == "hybrid" for shard in selected.values()):
+            # 逐分片按各自最高分归一化词法分会抬高弱分片，先取所有分片的全局词法最高分
+            peaks = await asyncio.gather(
+                *(
+                    loop.run_in_executor(self._executor, shard.lexical_peak, query)
+                    for shard in selected.values()
+                )
+            )
+            peak = max(peaks, default=0.0)
+        per_shard = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self._executor, functools.partial(shard.search, query, limit, lexical_peak=peak)
+                )
+                for shard in selected.values()
+            )
+        )
+        candidates = [
+            (score, name, doc) for name, hits in zip(selected, per_shard) for score, doc in hits
+        ]
+        top = heapq.nlargest(limit, candidates, key=lambda item: item[0])
+        if self.normalize == "global" and top and top[0][0] > 0:
+            # 按全局最高分缩放，不改变排序；逐分片归一化会让弱分片的首条与强分片并列
+            peak = top[0][0]
+            top = [(score / peak, name, doc) for score, name, doc in top]
+        return top
+
+    async def arun(self, tool_input: ToolInput) -> ToolOutput:
+        query = tool_input.context.get("query") or tool_input.task
+        requested = tool_input.context.get("shards")
+        if isinstance(requested, str):
+            # 单个分片名按字符串传入时，不要逐字符迭代
+            requested = [requested]
+        missing = [name for name in requested or [] if name not in self.shards]
+        hits = await self.search(query, shards=requested, top_k=tool_input.context.get("top_k"))
+        if not hits:
+            return ToolOutput(content="未找到匹配结果", metadata={"results": [], "missing_shards": missing})
+        summary_lines = []
+        payload = []
+        for score, shard, doc in hits:
+            summary_lines.append(f"- ({score:.2f}) [{shard}] {doc['title']}: {doc['text'][:160]}...")
+            payload.append(
+                {"title": doc["title"], "score": score, "source": doc.get("source"), "shard": shard}
+            )
+        return ToolOutput(
+            content="\n".join(summary_lines),
+            metadata={"results": payload, "missing_shards": missing},
+        )
+
+    def _select(self, names: Iterable[str] | None) -> Dict[str, LocalSearchTool]:
+        shards = self.shards
+        if names is None:
+            return shards
+        wanted = set(names)
+        return {name: shard for name, shard in shards.items() if name in wanted}
+
+def _check_modes(shards: Iterable[LocalSearchTool]) -> None:
+    modes = {shard.mode for shard in shards}
+    if len(modes) > 1:
+        raise ValueError(f"分片的检索模式必须一致: {sorted(modes)}")
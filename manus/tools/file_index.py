@@ -0,0 +1,361 @@
+"""Trigram index over repository files for the find_in_files tool."""
+
+from __future__ import annotations
+
+import fnmatch
+import os
+import re
+import stat as stat_module
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+try:  # Python 3.11+
+    import re._parser as _sre_parse
+except ImportError:  # pragma: no cover - Python 3.10
+    import sre_parse as _sre_parse
+
+DEFAULT_EXCLUDED_DIRS = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".manus",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".venv",
+        "__pycache__",
+        "build",
+        "dist",
+        "node_modules",
+        "venv",
+    }
+)
+
+# 定义所在行（"X 在哪里定义"）比普通引用更有用
+_DEFINITION = re.compile(r"^\s*(?:async\s+def|def|class|function|interface|type|const|let|var)\b")
+
+@dataclass(frozen=True)
+class FileHit:
+    path: str
+    line: int
+    column: int
+    text: str
+    score: float
+
+@dataclass
+class _IndexedFile:
+    file_id: int
+    mtime_ns: int
+    size: int
+
+class TrigramIndex:
+    """Maps every lowercase 3-character substring to the files containing it.
+
+    A query is first narrowed to the files holding all of its trigrams (for a
+    regex: the trigrams of the literal runs every match must contain), and only
+    those candidates are read and verified line by line. ``refresh`` stats the
+    tree and re-indexes files whose mtime or size changed, so after the first
+    build an update only touches what was edited.
+
+    Postings are sorted ``array("I")`` file ids; a file's trigrams are not kept
+    per file. A changed file gets a fresh id and its old id becomes a tombstone
+    that queries skip, and postings are compacted once tombstones outnumber
+    live files. ``search`` only builds the index if it has never been built;
+    ``start_watching`` keeps it fresh from a daemon thread instead. A refresh
+    walks, stats and reads files without holding the lock queries use, and
+    takes it only briefly to apply each file's postings.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        *,
+        excluded_dirs: Iterable[str] = DEFAULT_EXCLUDED_DIRS,
+        max_file_bytes: int = 1024 * 1024,
+        max_candidates: int = 500,
+    ):
+        self.root = Path(root).resolve()
+        self.excluded_dirs = frozenset(excluded_dirs)
+        self.max_file_bytes = max_file_bytes
+        self.max_candidates = max_candidates
+        # _lock 只保护索引结构的读写；_refresh_lock 让刷新串行，遍历与读文件期间不阻塞查询
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._files: dict[str, _IndexedFile] = {}
+        # file id -> 相对路径；None 为已失效的旧 id，查询时跳过
+        self._paths: list[str | None] = []
+        self._postings: dict[str, array] = {}
+        self._dead = 0
+        self._built = False
+        self._watcher: threading.Thread | None = None
+        self._stop_watching = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def refresh(self) -> dict[str, int]:
+        """Bring the index in line with the tree; returns per-kind change counts."""
+        with self._refresh_lock:
+            return self._refresh()
+
+    def start_watching(self, interval: float = 2.0) -> None:
+        """Re-check the tree every ``interval`` seconds in a daemon thread."""
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(
+            target=self._watch_loop,
+            args=(interval,),
+            name="manus-file-index",
+            daemon=True,
+        )
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop_watching.set()
+        if self._watcher:
+            self._watcher.join()
+            self._watcher = None
+
+    def search(
+        self,
+        query: str,
+        *,
+        regex: bool = False,
+        case_sensitive: bool = False,
+        glob: str | None = None,
+        max_results: int = 20,
+        per_file: int = 5,
+        max_candidates: int | None = None,
+    ) -> tuple[list[FileHit], dict[str, Any]]:
+        """Ranked ``path:line`` hits for ``query`` plus lookup statistics.
+
+        Files are ranked by matching lines, with bonuses for hits on definition
+        lines and for a query that also appears in the file name; hits keep
+        line order within a file. At most ``max_candidates`` files are read
+        and verified (files named after the query first), which bounds the
+        work of a query that runs in a thread and cannot be cancelled.
+        """
+        if not query:
+            raise ValueError("查询不能为空")
+        started = time.perf_counter()
+        if not self._built:
+            with self._refresh_lock:
+                if not self._built:
+                    self._refresh()
+        flags = 0 if case_sensitive else re.IGNORECASE
+        pattern = re.compile(query if regex else re.escape(query), flags)
+        literals = _required_literals(query) if regex else [query]
+        candidates = self.candidates(literals)
+        if glob:
+            candidates = [rel for rel in candidates if _glob_match(rel, glob)]
+        needle = None if regex else query.lower()
+        limit = self.max_candidates if max_candidates is None else max_candidates
+        verified = candidates
+        if len(candidates) > limit:
+            if needle:
+                verified = sorted(candidates, key=lambda rel: needle not in Path(rel).name.lower())
+            verified = verified[:limit]
+        ranked: list[tuple[float, str, list[FileHit]]] = []
+        for rel in verified:
+            hits = self._verify(rel, pattern, per_file)
+            if not hits:
+                continue
+            score = float(len(hits)) + 2.0 * sum(bool(_DEFINITION.match(hit.text)) for hit in hits)
+            if needle and needle in Path(rel).name.lower():
+                score += 3.0
+            ranked.append((score, rel, hits))
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+        results: list[FileHit] = []
+        for score, _, hits in ranked:
+            for hit in hits:
+                if len(results) >= max_results:
+                    break
+                results.append(FileHit(hit.path, hit.line, hit.column, hit.text, score))
+        stats = {
+            "files_indexed": len(self._files),
+            "candidates": len(candidates),
+            "verified": len(verified),
+            "matched_files": len(ranked),
+            "truncated": len(verified) < len(candidates)
+            or sum(len(hits) for _, _, hits in ranked) > len(results),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        return results, stats
+
+    def candidates(self, literals: Iterable[str]) -> list[str]:
+        """Files containing every trigram of ``literals``; all files when none apply."""
+        grams = set()
+        for literal in literals:
+            grams |= _trigrams(literal.lower())
+        with self._lock:
+            if not grams:
+                return sorted(self._files)
+            empty = array("I")
+            postings = sorted((self._postings.get(gram, empty) for gram in grams), key=len)
+            found = set(postings[0])
+            for posting in postings[1:]:
+                if not found:
+                    break
+                found.intersection_update(posting)
+            paths = self._paths
+            return sorted(rel for rel in (paths[file_id] for file_id in found) if rel is not None)
+
+    def _refresh(self) -> dict[str, int]:
+        # 只有持有 _refresh_lock 的刷新会修改索引，这里读 _files 不必加锁
+        changes = {"added": 0, "updated": 0, "removed": 0}
+        seen: set[str] = set()
+        for rel, stat in self._walk():
+            seen.add(rel)
+            known = self._files.get(rel)
+            if known and (known.mtime_ns, known.size) == (stat.st_mtime_ns, stat.st_size):
+                continue
+            grams = self._read_grams(rel)
+            # 每个文件只在写入索引时短暂持锁，查询最多等一个文件的更新
+            with self._lock:
+                if known:
+                    self._retire(known)
+                # 新 id 总是当前最大值，追加到 postings 末尾即保持有序
+                file_id = len(self._paths)
+                self._paths.append(rel)
+                self._files[rel] = _IndexedFile(file_id, stat.st_mtime_ns, stat.st_size)
+                for gram in grams:
+                    posting = self._postings.get(gram)
+                    if posting is None:
+                        posting = self._postings[gram] = array("I")
+                    posting.append(file_id)
+            changes["updated" if known else "added"] += 1
+        removed = [rel for rel in self._files if rel not in seen]
+        if removed:
+            with self._lock:
+                for rel in removed:
+                    self._retire(self._files.pop(rel))
+            changes["removed"] = len(removed)
+        if self._dead > len(self._files):
+            self._compact()
+        self._built = True
+        return changes
+
+    def _walk(self) -> Iterable[tuple[str, os.stat_result]]:
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [name for name in dirnames if name not in self.excluded_dirs]
+            for filename in filenames:
+                full = os.path.join(dirpath, filename)
+                try:
+                    stat = os.lstat(full)
+                except OSError:
+                    continue
+                # 只索引普通文件：符号链接可能指向仓库之外，FIFO 等读取时会阻塞
+                if not stat_module.S_ISREG(stat.st_mode) or stat.st_size > self.max_file_bytes:
+                    continue
+                yield Path(full).relative_to(self.root).as_posix(), stat
+
+    def _read_grams(self, rel: str) -> set[str]:
+        text = self._read_text(rel)
+        return _trigrams(text.lower()) if text else set()
+
+    def _read_text(self, rel: str) -> str | None:
+        path = self.root / rel
+        try:
+            if path.is_symlink():
+                return None
+            data = path.read_bytes()
+        except OSError:
+            return None
+        if b"\0" in data[:8192]:
+            # 二进制文件不参与索引
+            return None
+        return data.decode("utf-8", errors="ignore")
+
+    def _retire(self, known: _IndexedFile) -> None:
+        self._paths[known.file_id] = None
+        self._dead += 1
+
+    def _compact(self) -> None:
+        # 失效 id 多于存活文件时重排 id：新的 postings 在锁外构建，最后整体替换
+        remap: dict[int, int] = {}
+        paths: list[str] = []
+        for old_id, rel in enumerate(self._paths):
+            if rel is not None:
+                remap[old_id] = len(paths)
+                paths.append(rel)
+        postings: dict[str, array] = {}
+        for gram, posting in self._postings.items():
+            kept = array("I", (remap[file_id] for file_id in posting if file_id in remap))
+            if kept:
+                postings[gram] = kept
+        with self._lock:
+            for file_id, rel in enumerate(paths):
+                self._files[rel].file_id = file_id
+            self._paths = list(paths)
+            self._postings = postings
+            self._dead = 0
+
+    def _watch_loop(self, interval: float) -> None:
+        while not self._stop_watching.wait(interval):
+            try:
+                self.refresh()
+            except OSError:  # 遍历途中目录被删除等情况，下一轮再试
+                continue
+
+    def _verify(self, rel: str, pattern: re.Pattern[str], limit: int) -> list[FileHit]:
+        text = self._read_text(rel)
+        if not text:
+            return []
+        hits: list[FileHit] = []
+        for lineno, line in enumerate(text.splitlines(), start=1):
+            match = pattern.search(line)
+            if match is None:
+                continue
+            hits.append(FileHit(rel, lineno, match.start() + 1, line.strip()[:200], 0.0))
+            if len(hits) >= limit:
+                break
+        return hits
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+def _glob_match(rel: str, glob: str) -> bool:
+    return fnmatch.fnmatch(rel, glob) or fnmatch.fnmatch(Path(rel).name, glob)
+
+def _required_literals(pattern: str) -> list[str]:
+    """Literal runs that every match of ``pattern`` must contain.
+
+    Only sequences are followed; alternations, classes and optional repeats
+    end the current run, so the result may be weaker than the regex but is
+    never stricter. An invalid pattern is left to ``re.compile`` to report.
+    """
+    try:
+        parsed = _sre_parse.parse(pattern)
+    except re.error:
+        return []
+    runs: list[str] = []
+    current: list[str] = []
+
+    def flush() -> None:
+        if current:
+            runs.append("".join(current))
+            current.clear()
+
+    def walk(items) -> None:
+        for op, arg in items:
+            if op is _sre_parse.LITERAL:
+                current.append(chr(arg))
+            elif op is _sre_parse.SUBPATTERN:
+                walk(arg[-1])
+            elif op in (_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT) and arg[0] >= 1:
+                # x+ 至少出现一次，但之后的字符不再与前面相邻
+                flush()
+                walk(arg[2])
+                flush()
+            elif op is _sre_parse.AT:
+                continue
+            else:
+                flush()
+
+    walk(parsed)
+    flush()
+    return [run for run in runs if len(run) >= 3]
@@ -3,27 +3,58 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import io
 import json
 import math
 import random
-from contextlib import redirect_stdout
+import re
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Iterable
 
-from .base import FunctionTool, ToolInput, ToolOutput, ToolRegistry
+from .base import FunctionTool, ToolInput, ToolOutput, ToolRegistry, run_in_thread
+from .file_index import TrigramIndex
+from .interpreter import InterpreterPool
 from .local_search import LocalSearchTool
 
 _PROJECT_ROOT = Path(__file__).resolve().parents[2]
-_SEED_DOCS_TOOL = LocalSearchTool()
+_SEED_DOCS_TOOL = LocalSearchTool(mode="hybrid")
 _GLOBAL_MEMORY: list[dict[str, Any]] = []
+# 首次 find_in_files 查询时建立，之后由后台线程按 mtime 增量更新，查询路径上不遍历目录
+_FILE_INDEX = TrigramIndex(_PROJECT_ROOT)
+_PATH_LINE = re.compile(r"^(.+?):(\d+)$")
+
+def _python_globals() -> dict[str, Any]:
+    builtins = {"print": print, "range": range, "len": len, "sum": sum, "min": min, "max": max}
+    return {"__builtins__": builtins, "math": math}
+
+# 按 session_id（默认 run_id）保存解释器状态，同一 run 的后续步骤可直接复用变量
+_INTERPRETERS = InterpreterPool(globals_factory=_python_globals)
 
 @dataclass
 class ToolSpec:
     name: str
     description: str
     handler: Any
+    parameters: dict[str, Any] | None = None
+    # 与另一个工具行为相同，只在提示词里合并展示
+    alias_of: str | None = None
+
+def _params(required: Iterable[str] = (), **properties: str) -> dict[str, Any]:
+    """Compact JSON Schema builder: ``name="type"`` or ``name="array:string"``."""
+    schema: dict[str, Any] = {}
+    for key, kind in properties.items():
+        if kind.startswith("array:"):
+            schema[key] = {"type": "array", "items": {"type": kind.split(":", 1)[1]}}
+        else:
+            schema[key] = {"type": kind}
+    return {"type": "object", "properties": schema, "required": list(required)}
+
+_QUERY = _params(["query"], query="string", top_k="integer")
+# session_id / reset 由宿主通过 context 传入，不暴露给模型，避免跨 run 读取或重置解释器
+_CODE = {**_params(["code"], code="string"), "additionalProperties": False}
+_STEPS = _params(["steps"], steps="array:string")
 
 async def _tool_get_temperature(tool_input: ToolInput) -> ToolOutput:
     city = (tool_input.context.get("city") or tool_input.task or "未知地点").strip()
@@ -66,32 +97,129 @@ async def _tool_google_scholar(tool_input: ToolInput) -> ToolOutput:
     return ToolOutput(content=content, metadata={"query": query, "papers": papers})
 
 async def _tool_parse_file(tool_input: ToolInput) -> ToolOutput:
-    path = (tool_input.context.get("path") or tool_input.task).strip()
-    max_chars = int(tool_input.context.get("max_chars", 400))
-    candidate = Path(path)
-    if not candidate.is_absolute():
-        candidate = (_PROJECT_ROOT / candidate).resolve()
-    if not str(candidate).startswith(str(_PROJECT_ROOT)):
-        raise ValueError("越界访问")
+    context = tool_input.context
+    path = (context.get("path") or tool_input.task).strip()
+    line = context.get("line")
+    candidate = _resolve_repo_path(path)
+    if not candidate.exists():
+        # find_in_files 的 "path:line" 结果可以直接传入
+        match = _PATH_LINE.match(path)
+        if match:
+            candidate = _resolve_repo_path(match.group(1))
+            line = line or int(match.group(2))
     if not candidate.exists():
         raise FileNotFoundError(f"文件不存在: {candidate}")
-    text = candidate.read_text(encoding="utf-8")[:max_chars]
-    return ToolOutput(content=text, metadata={"path": str(candidate), "length": len(text)})
+    text = candidate.read_text(encoding="utf-8")
+    if line is None and context.get("max_lines") is None:
+        offset = int(context.get("offset", 0))
+        max_chars = int(context.get("max_chars", 400))
+        page = text[offset : offset + max_chars]
+        end = offset + len(page)
+        metadata = {
+            "path": str(candidate),
+            "length": len(page),
+            "offset": offset,
+            "next_offset": end if end < len(text) else None,
+        }
+        return ToolOutput(content=page, metadata=metadata)
+    lines = text.splitlines()
+    start = max(int(line or 1), 1)
+    end = min(start - 1 + int(context.get("max_lines", 40)), len(lines))
+    page = "\n".join(lines[start - 1 : end])
+    if context.get("max_chars") is not None:
+        page = page[: int(context["max_chars"])]
+    metadata = {
+        "path": str(candidate),
+        "length": len(page),
+        "start_line": start,
+        "end_line": end,
+        "total_lines": len(lines),
+        "next_line": end + 1 if end < len(lines) else None,
+    }
+    return ToolOutput(content=page, metadata=metadata)
+
+def _resolve_repo_path(path: str) -> Path:
+    # 绝对路径同样解析符号链接，再按路径层级判断是否仍在仓库内
+    candidate = (_PROJECT_ROOT / path).resolve()
+    if not candidate.is_relative_to(_PROJECT_ROOT):
+        raise ValueError("越界访问")
+    return candidate
+
+async def _tool_find_in_files(tool_input: ToolInput) -> ToolOutput:
+    context = tool_input.context
+    query = context.get("query") or tool_input.task
+    # 首次建索引与候选文件的逐行校验都放到线程里，避免阻塞事件循环
+    hits, stats = await asyncio.to_thread(
+        _FILE_INDEX.search,
+        query,
+        regex=bool(context.get("regex")),
+        case_sensitive=bool(context.get("case_sensitive")),
+        glob=context.get("glob"),
+        max_results=int(context.get("max_results", 20)),
+    )
+    # 用到该工具才启动后台刷新，注册工具本身不会遍历安装目录
+    _FILE_INDEX.start_watching()
+    lines = [f"{hit.path}:{hit.line}: {hit.text}" for hit in hits]
+    content = "\n".join(lines) if lines else f"未找到: {query}"
+    metadata = {"query": query, "hits": [hit.__dict__ for hit in hits], **stats}
+    return ToolOutput(content=content, metadata=metadata)
 
 async def _tool_python(tool_input: ToolInput) -> ToolOutput:
-    code = tool_input.context.get("code") or tool_input.task
-    local_vars: dict[str, Any] = {}
+    context = tool_input.context
+    code = context.get("code") or tool_input.task
+    session_id = context.get("session_id") or context.get("run_id")
+    if session_id is None:
+        return await _exec_python(code, _python_globals(), None)
+    if context.get("reset"):
+        _INTERPRETERS.reset(session_id)
+        if not context.get("code"):
+            return ToolOutput(content="会话已重置", metadata={"session_id": session_id, "reset": True})
+    session = _INTERPRETERS.get(session_id)
+    async with session.lock:
+        return await _exec_python(code, session.namespace, session_id)
+
+async def _exec_python(code: str, namespace: dict[str, Any], session_id: str | None) -> ToolOutput:
+    # 会话里上一步留下的 result 不应被当作本步的结果；按身份比较会把两次 result = 1 误判为未赋值
+    namespace.pop("result", None)
+    # exec 是同步执行的，放到线程里，避免卡住共享事件循环上的其他 run / 会话
+    output, error = await run_in_thread(_run_code, code, namespace)
+    if error is not None:
+        metadata: dict[str, Any] = {"error": str(error)}
+        if session_id is not None:
+            metadata.update(_session_report(session_id))
+        return ToolOutput(content=f"执行失败: {error}", metadata=metadata)
+    result = namespace.get("result")
+    metadata = {"stdout": output, "result": result}
+    if session_id is not None:
+        metadata.update(_session_report(session_id))
+    return ToolOutput(content=output or str(result) or "执行完成", metadata=metadata)
+
+def _run_code(code: str, namespace: dict[str, Any]) -> tuple[str, Exception | None]:
     stdout = io.StringIO()
-    env = {"__builtins__": {"print": print, "range": range, "len": len, "sum": sum, "min": min, "max": max}, "math": math}
+    # 每次执行注入自己的 print，而不是 redirect_stdout 全局替换 sys.stdout，多个线程并发时输出不串
+    builtins = dict(namespace.get("__builtins__") or {})
+    builtins["print"] = functools.partial(print, file=stdout)
+    namespace["__builtins__"] = builtins
     try:
-        with redirect_stdout(stdout):
-            exec(code, env, local_vars)
+        exec(code, namespace)
     except Exception as exc:  # pragma: no cover - runtime errors tested via metadata
-        return ToolOutput(content=f"执行失败: {exc}", metadata={"error": str(exc)})
-    output = stdout.getvalue().strip()
-    result = local_vars.get("result")
-    metadata = {"stdout": output, "result": result}
-    return ToolOutput(content=output or str(result) or "执行完成", metadata=metadata)
+        return stdout.getvalue().strip(), exc
+    return stdout.getvalue().strip(), None
+
+def _session_report(session_id: str) -> dict[str, Any]:
+    session = _INTERPRETERS.get(session_id)
+    session.runs += 1
+    size = _INTERPRETERS.measure(session)
+    report = {
+        "session_id": session_id,
+        "session_bytes": size,
+        "session_vars": session.variables(),
+        "session_runs": session.runs,
+    }
+    if size > _INTERPRETERS.max_bytes:
+        _INTERPRETERS.reset(session_id)
+        report["session_reset"] = True
+    return report
 
 async def _tool_qwen_search(tool_input: ToolInput) -> ToolOutput:
     return await _tool_web_search(tool_input)
@@ -100,10 +228,12 @@ async def _tool_batch_search(tool_input: ToolInput) -> ToolOutput:
     queries = tool_input.context.get("queries")
     if not isinstance(queries, Iterable):
         queries = [tool_input.task]
+    queries = [str(q) for q in queries]
     aggregated = {}
-    for q in queries:
-        res = await _SEED_DOCS_TOOL.arun(ToolInput(task=str(q), context={}))
-        aggregated[str(q)] = res.metadata.get("results", [])
+    for q, hits in zip(queries, _SEED_DOCS_TOOL.search_many(queries)):
+        aggregated[q] = [
+            {"title": doc["title"], "score": score, "source": doc.get("source")} for score, doc in hits
+        ]
     return ToolOutput(content=f"已完成 {len(aggregated)} 个查询", metadata={"results": aggregated})
 
 async def _tool_memory(tool_input: ToolInput) -> ToolOutput:
@@ -123,23 +253,36 @@ async def _tool_final_answer(tool_input: ToolInput) -> ToolOutput:
     return ToolOutput(content=tool_input.task, metadata={})
 
 _TOOLS = [
-    ToolSpec("get_temperature_and_windspeed", "查询指定城市的温度与风速", _tool_get_temperature),
-    ToolSpec("generate_image", "根据提示生成示意图片", _tool_generate_image),
-    ToolSpec("web_search", "检索本地知识库", _tool_web_search),
-    ToolSpec("qwen_search", "Qwen 搜索接口", _tool_qwen_search),
-    ToolSpec("open_url", "打开链接并返回标题", _tool_open_url),
-    ToolSpec("get_youtube_video_summary", "总结 YouTube 视频", _tool_youtube_summary),
-    ToolSpec("google_scholar", "返回示例学术结果", _tool_google_scholar),
-    ToolSpec("parse_file", "读取仓库文件", _tool_parse_file),
-    ToolSpec("execute_python", "执行 Python 代码", _tool_python),
-    ToolSpec("python", "执行 Python 代码", _tool_python),
-    ToolSpec("PythonInterpreter", "执行 Python 代码", _tool_python),
-    ToolSpec("execute_python_qwen3", "执行 Python 代码", _tool_python),
-    ToolSpec("batch_search", "批量搜索", _tool_batch_search),
+    ToolSpec("get_temperature_and_windspeed", "查询指定城市的温度与风速", _tool_get_temperature, _params(["city"], city="string")),
+    ToolSpec("generate_image", "根据提示生成示意图片", _tool_generate_image, _params(["prompt"], prompt="string")),
+    ToolSpec("web_search", "检索本地知识库", _tool_web_search, _QUERY),
+    ToolSpec("qwen_search", "Qwen 搜索接口", _tool_qwen_search, _QUERY, alias_of="web_search"),
+    ToolSpec("open_url", "打开链接并返回标题", _tool_open_url, _params(["url"], url="string")),
+    ToolSpec("get_youtube_video_summary", "总结 YouTube 视频", _tool_youtube_summary, _params(["video_id"], video_id="string")),
+    ToolSpec("google_scholar", "返回示例学术结果", _tool_google_scholar, _params(["query"], query="string")),
+    ToolSpec(
+        "parse_file",
+        "读取仓库文件，支持按行或按字符分页",
+        _tool_parse_file,
+        _params(["path"], path="string", max_chars="integer", offset="integer", line="integer", max_lines="integer"),
+    ),
+    ToolSpec(
+        "find_in_files",
+        "在仓库文件中查找字符串或正则，返回 path:line",
+        _tool_find_in_files,
+        _params(
+            ["query"], query="string", regex="boolean", case_sensitive="boolean", glob="string", max_results="integer"
+        ),
+    ),
+    ToolSpec("execute_python", "执行 Python 代码", _tool_python, _CODE),
+    ToolSpec("python", "执行 Python 代码", _tool_python, _CODE, alias_of="execute_python"),
+    ToolSpec("PythonInterpreter", "执行 Python 代码", _tool_python, _CODE, alias_of="execute_python"),
+    ToolSpec("execute_python_qwen3", "执行 Python 代码", _tool_python, _CODE, alias_of="execute_python"),
+    ToolSpec("batch_search", "批量搜索", _tool_batch_search, _params(["queries"], queries="array:string")),
     ToolSpec("memory", "写入长期记忆", _tool_memory),
     ToolSpec("think", "记录思考", _tool_think),
-    ToolSpec("create_plan", "创建计划", _tool_plan),
-    ToolSpec("update_plan", "更新计划", _tool_plan),
+    ToolSpec("create_plan", "创建计划", _tool_plan, _STEPS),
+    ToolSpec("update_plan", "更新计划", _tool_plan, _STEPS),
     ToolSpec("final_answer", "返回最终答案", _tool_final_answer),
 ]
 
@@ -149,7 +292,15 @@ def register_functools_tools(registry: ToolRegistry) -> ToolRegistry:
         try:
             registry.get(spec.name)
         except KeyError:
-            registry.register(FunctionTool(name=spec.name, description=spec.description, func=spec.handler))
+            registry.register(
+                FunctionTool(
+                    name=spec.name,
+                    description=spec.description,
+                    func=spec.handler,
+                    parameters=spec.parameters,
+                ),
+                alias_of=spec.alias_of,
+            )
         else:  # 已存在则跳过，避免覆盖如 LocalSearch 的 search 名称
             continue
     return registry
@@ -0,0 +1,106 @@
+"""Session-scoped Python interpreter state for the execute_python tools."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+import types
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Mapping
+
+@dataclass
+class InterpreterSession:
+    session_id: str
+    namespace: dict[str, Any]
+    created: float
+    last_used: float
+    runs: int = 0
+    size_bytes: int = 0
+    # 同一会话的执行依次进行：超时后仍在跑的线程与下一次执行不会共用命名空间
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False, compare=False)
+
+    def variables(self) -> list[str]:
+        return sorted(key for key in self.namespace if not key.startswith("__") and key != "math")
+
+class InterpreterPool:
+    """Keeps one namespace per session so later steps reuse earlier variables.
+
+    Sessions idle for ``idle_timeout`` seconds are evicted on the next access;
+    beyond ``max_sessions`` the least recently used session is dropped. A
+    session whose namespace grows past ``max_bytes`` is reset after the run:
+    the cap is measured once the code has finished, so a single run can still
+    allocate more than ``max_bytes`` while it executes.
+    """
+
+    def __init__(
+        self,
+        *,
+        globals_factory: Callable[[], dict[str, Any]],
+        max_sessions: int = 32,
+        idle_timeout: float = 600.0,
+        max_bytes: int = 32 * 1024 * 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.globals_factory = globals_factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._sessions: OrderedDict[str, InterpreterSession] = OrderedDict()
+
+    def get(self, session_id: str) -> InterpreterSession:
+        self.evict_idle()
+        now = self._clock()
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = InterpreterSession(session_id, self.globals_factory(), created=now, last_used=now)
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+            session.last_used = now
+        return session
+
+    def reset(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def evict_idle(self) -> list[str]:
+        cutoff = self._clock() - self.idle_timeout
+        expired = [key for key, session in self._sessions.items() if session.last_used < cutoff]
+        for key in expired:
+            del self._sessions[key]
+        return expired
+
+    def measure(self, session: InterpreterSession) -> int:
+        session.size_bytes = namespace_size(session.namespace)
+        return session.size_bytes
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+def namespace_size(namespace: Mapping[str, Any]) -> int:
+    """Approximate bytes held by user values (containers are walked, modules skipped)."""
+    seen: set[int] = set()
+    total = 0
+    stack = [value for key, value in namespace.items() if not key.startswith("__")]
+    while stack:
+        value = stack.pop()
+        if id(value) in seen or isinstance(value, _OPAQUE):
+            continue
+        seen.add(id(value))
+        total += sys.getsizeof(value, 0)
+        if isinstance(value, dict):
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            stack.extend(value)
+    return total
+
+# 模块、函数与类属于代码而非数据，不计入会话大小
+_OPAQUE = (types.ModuleType, types.FunctionType, types.BuiltinFunctionType, type)
@@ -4,40 +4,268 @@ from __future__ import annotations
 
 import json
 import math
+import os
+import threading
 from collections import Counter
+from dataclasses import dataclass
+from functools import cached_property
 from importlib import resources
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, Sequence
+
+import numpy as np
 
 from .base import Tool, ToolInput, ToolOutput
+from .vector_index import HashedEmbedder, top_k_indices
+
+SEARCH_MODES = ("lexical", "dense", "hybrid")
+
+@dataclass(frozen=True)
+class _IndexedDocument:
+    key: str
+    document: Dict[str, Any]
+    terms: Counter
+    vector: np.ndarray | None = None
+
+class _CorpusSnapshot:
+    """Immutable corpus view; a query keeps the snapshot it started with."""
+
+    def __init__(self, entries: Dict[str, _IndexedDocument], version: int):
+        self.entries = entries
+        self.version = version
+
+    @cached_property
+    def documents(self) -> list[Dict[str, Any]]:
+        # 查询路径按行号取文档，每个快照只拼一次
+        return [entry.document for entry in self.entries.values()]
+
+    @cached_property
+    def matrix(self) -> np.ndarray:
+        # 行向量在入索引时已计算，这里只做一次连续内存拼接
+        vectors = [entry.vector for entry in self.entries.values()]
+        if not vectors:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+
+    @cached_property
+    def postings(self) -> Dict[str, tuple[np.ndarray, np.ndarray]]:
+        """term -> (row indices, ``1 + log(freq)`` weights), built once per snapshot."""
+        rows: Dict[str, list[int]] = {}
+        weights: Dict[str, list[float]] = {}
+        for row, entry in enumerate(self.entries.values()):
+            for term, freq in entry.terms.items():
+                rows.setdefault(term, []).append(row)
+                weights.setdefault(term, []).append(1 + math.log(freq))
+        return {
+            term: (np.asarray(rows[term], dtype=np.int64), np.asarray(weights[term], dtype=np.float32))
+            for term in rows
+        }
 
 class LocalSearchTool:
     name = "search"
     description = "基于 seed_documents.json 的关键字检索工具"
+    parameters = {
+        "type": "object",
+        "properties": {
+            "query": {"type": "string", "description": "检索关键词"},
+            "top_k": {"type": "integer", "description": "返回条数"},
+        },
+        "required": ["query"],
+    }
 
-    def __init__(self, *, data_path: Path | None = None, top_k: int = 3):
-        if data_path:
-            with open(data_path, "r", encoding="utf-8") as f:
-                raw = json.load(f)
-        else:
-            with resources.files("manus.data").joinpath("seed_documents.json").open(
-                "r", encoding="utf-8"
-            ) as f:
-                raw = json.load(f)
-        self.documents: list[Dict[str, Any]] = raw
+    def __init__(
+        self,
+        *,
+        data_path: Path | None = None,
+        top_k: int = 3,
+        mode: str = "lexical",
+        dense_weight: float = 0.5,
+        embedder: HashedEmbedder | None = None,
+    ):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"未知检索模式: {mode}")
+        self.data_path = Path(data_path) if data_path else _default_corpus_path()
         self.top_k = top_k
+        self.mode = mode
+        self.dense_weight = dense_weight
+        self.embedder = embedder or (HashedEmbedder() if mode != "lexical" else None)
+        self._lock = threading.Lock()
+        self._snapshot = _CorpusSnapshot({}, version=0)
+        self._signature: tuple[int, int] | None = None
+        # 最近一次加载时文件里的文档，按 key 索引
+        self._file_docs: Dict[str, Dict[str, Any]] = {}
+        # 运行时的增删改：key -> (文档或 None 表示已删除, 修改时文件里的版本)
+        self._overlay: Dict[str, tuple[Dict[str, Any] | None, Dict[str, Any] | None]] = {}
+        self._watcher: threading.Thread | None = None
+        self._stop_watching = threading.Event()
+        self.reload(force=True)
+
+    @property
+    def documents(self) -> list[Dict[str, Any]]:
+        return list(self._snapshot.documents)
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def add_documents(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """Index new documents; raises ``ValueError`` on an existing key.
+
+        The batch is all-or-nothing: keys are checked before anything is
+        indexed or recorded for later reloads.
+        """
+        with self._lock:
+            entries = dict(self._snapshot.entries)
+            documents = list(documents)
+            keys = [_document_key(doc) for doc in documents]
+            seen: set[str] = set()
+            for key in keys:
+                if key in entries or key in seen:
+                    raise ValueError(f"文档已存在: {key}")
+                seen.add(key)
+            for key, doc in zip(keys, documents):
+                entries[key] = _index_document(key, doc, self.embedder)
+                self._record(key, doc)
+            self._publish(entries)
+        return len(documents)
+
+    def upsert(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """Insert or replace documents, re-tokenizing only changed ones."""
+        with self._lock:
+            entries = dict(self._snapshot.entries)
+            documents = list(documents)
+            for doc in documents:
+                key = _document_key(doc)
+                existing = entries.get(key)
+                # 未变化的文档不记录，文件之后对该 key 的修改仍然生效
+                if existing is None or existing.document != doc:
+                    self._record(key, doc)
+            changed = _merge_documents(entries, documents, embedder=self.embedder)
+            if changed:
+                self._publish(entries)
+        return changed
+
+    def remove_documents(self, keys: Iterable[str | Dict[str, Any]]) -> int:
+        with self._lock:
+            entries = dict(self._snapshot.entries)
+            removed = 0
+            for item in keys:
+                key = _document_key(item) if isinstance(item, dict) else str(item)
+                if entries.pop(key, None) is not None:
+                    self._record(key, None)
+                    removed += 1
+            if removed:
+                self._publish(entries)
+        return removed
+
+    def reload(self, *, force: bool = False) -> bool:
+        """Re-read ``data_path`` when its mtime/size changed; returns whether it did.
+
+        Documents added, replaced or removed at runtime are re-applied on top
+        of the file contents, so a hot reload does not drop them. Once the
+        file's version of a key differs from the one the runtime edit was
+        made against, or already equals the edit, the file wins and the edit
+        is forgotten.
+        """
+        # 签名检查与发布放在同一把锁里，并发的 reload 不会以旧内容覆盖新内容
+        with self._lock:
+            stat = os.stat(self.data_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if not force and signature == self._signature:
+                return False
+            documents = _load_documents(self.data_path)
+            previous = self._snapshot.entries
+            entries: Dict[str, _IndexedDocument] = {}
+            _merge_documents(entries, documents, embedder=self.embedder, previous=previous)
+            self._file_docs = {_document_key(doc): doc for doc in documents}
+            for key, (doc, base) in list(self._overlay.items()):
+                current = self._file_docs.get(key)
+                if current != base or current == doc:
+                    del self._overlay[key]
+                elif doc is None:
+                    entries.pop(key, None)
+                else:
+                    _merge_documents(entries, [doc], embedder=self.embedder, previous=previous)
+            self._publish(entries)
+            self._signature = signature
+        return True
+
+    def start_watching(self, interval: float = 2.0) -> None:
+        """Poll ``data_path`` in a daemon thread and hot-reload on change."""
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(
+            target=self._watch_loop,
+            args=(interval,),
+            name="manus-corpus-watcher",
+            daemon=True,
+        )
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop_watching.set()
+        if self._watcher:
+            self._watcher.join()
+            self._watcher = None
+
+    def search(
+        self, query: str, top_k: int | None = None, *, lexical_peak: float | None = None
+    ) -> list[tuple[float, Dict[str, Any]]]:
+        peaks = None if lexical_peak is None else [lexical_peak]
+        return self.search_many([query], top_k, lexical_peaks=peaks)[0]
+
+    def lexical_peak(self, query: str) -> float:
+        """Best raw lexical score of ``query`` on this corpus (0 when nothing matches)."""
+        scores = _lexical_scores(self._snapshot, query)
+        return float(scores.max()) if scores.size else 0.0
+
+    def search_many(
+        self,
+        queries: Sequence[str],
+        top_k: int | None = None,
+        *,
+        lexical_peaks: Sequence[float] | None = None,
+    ) -> list[list[tuple[float, Dict[str, Any]]]]:
+        """Score a batch of queries against one snapshot.
+
+        Dense and hybrid modes embed all queries at once, so the batch costs a
+        single matrix-matrix product instead of one pass per query. Lexical
+        scoring (alone or as half of hybrid) uses the snapshot's term postings,
+        so each query costs one vector update per query term rather than a
+        Python pass over every document. Hybrid mode divides lexical scores by
+        each query's best lexical score on this corpus, or by
+        ``lexical_peaks`` when a caller (e.g. a federated search) supplies the
+        peak across several corpora.
+        """
+        snapshot = self._snapshot
+        limit = top_k or self.top_k
+        if self.mode == "lexical":
+            return [_lexical_top_k(snapshot, query, limit) for query in queries]
+        documents = snapshot.documents
+        if not documents or not queries:
+            return [[] for _ in queries]
+        scores = self.embedder.embed_many(queries) @ snapshot.matrix.T
+        if self.mode == "hybrid":
+            lexical = np.vstack([_lexical_scores(snapshot, query) for query in queries])
+            if lexical_peaks is None:
+                peaks = lexical.max(axis=1, keepdims=True)
+            else:
+                peaks = np.asarray(lexical_peaks, dtype=np.float32).reshape(-1, 1)
+            lexical = np.divide(lexical, peaks, out=np.zeros_like(lexical), where=peaks > 0)
+            scores = self.dense_weight * scores + (1.0 - self.dense_weight) * lexical
+        results = []
+        for row in scores:
+            hits = []
+            for idx in top_k_indices(row, limit):
+                if row[idx] > 0:
+                    hits.append((float(row[idx]), documents[idx]))
+            results.append(hits)
+        return results
 
     async def arun(self, tool_input: ToolInput) -> ToolOutput:
-        query_terms = _normalize(tool_input.task)
-        scored = []
-        for doc in self.documents:
-            text = doc["text"]
-            terms = _normalize(text)
-            score = _score(query_terms, terms)
-            if score > 0:
-                scored.append((score, doc))
-        scored.sort(key=lambda item: item[0], reverse=True)
-        top_docs = scored[: self.top_k]
+        query = tool_input.context.get("query") or tool_input.task
+        top_docs = self.search(query, tool_input.context.get("top_k"))
         if not top_docs:
             return ToolOutput(content="未找到匹配结果", metadata={"results": []})
         summary_lines = []
@@ -47,14 +275,82 @@ class LocalSearchTool:
             payload.append({"title": doc["title"], "score": score, "source": doc.get("source")})
         return ToolOutput(content="\n".join(summary_lines), metadata={"results": payload})
 
+    def _record(self, key: str, doc: Dict[str, Any] | None) -> None:
+        base = self._file_docs.get(key)
+        if doc == base:
+            # 与文件内容一致时无需叠加
+            self._overlay.pop(key, None)
+        else:
+            self._overlay[key] = (doc, base)
+
+    def _publish(self, entries: Dict[str, _IndexedDocument]) -> None:
+        # 整体替换引用，进行中的查询继续使用旧快照
+        self._snapshot = _CorpusSnapshot(entries, version=self._snapshot.version + 1)
+
+    def _watch_loop(self, interval: float) -> None:
+        while not self._stop_watching.wait(interval):
+            try:
+                self.reload()
+            except (OSError, ValueError):  # 文件写到一半时保留旧快照，下轮再试
+                continue
+
+def _default_corpus_path() -> Path:
+    return Path(str(resources.files("manus.data").joinpath("seed_documents.json")))
+
+def _load_documents(path: Path) -> list[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix == ".jsonl":
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+def _document_key(doc: Dict[str, Any]) -> str:
+    return str(doc.get("id") or doc["title"])
+
+def _index_document(
+    key: str, doc: Dict[str, Any], embedder: HashedEmbedder | None = None
+) -> _IndexedDocument:
+    vector = embedder.embed(f"{doc['title']} {doc['text']}") if embedder else None
+    return _IndexedDocument(key=key, document=doc, terms=_normalize(doc["text"]), vector=vector)
+
+def _merge_documents(
+    entries: Dict[str, _IndexedDocument],
+    documents: Iterable[Dict[str, Any]],
+    *,
+    embedder: HashedEmbedder | None = None,
+    previous: Dict[str, _IndexedDocument] | None = None,
+) -> int:
+    previous = entries if previous is None else previous
+    changed = 0
+    for doc in documents:
+        key = _document_key(doc)
+        existing = previous.get(key)
+        if existing is not None and existing.document == doc:
+            entries[key] = existing
+            continue
+        entries[key] = _index_document(key, doc, embedder)
+        changed += 1
+    return changed
+
+def _lexical_scores(snapshot: _CorpusSnapshot, query: str) -> np.ndarray:
+    scores = np.zeros(len(snapshot.entries), dtype=np.float32)
+    postings = snapshot.postings
+    for term, weight in _normalize(query).items():
+        if term in postings:
+            rows, weights = postings[term]
+            scores[rows] += weights * weight
+    return scores
+
+def _lexical_top_k(
+    snapshot: _CorpusSnapshot, query: str, limit: int
+) -> list[tuple[float, Dict[str, Any]]]:
+    scores = _lexical_scores(snapshot, query)
+    documents = snapshot.documents
+    return [
+        (float(scores[idx]), documents[idx])
+        for idx in top_k_indices(scores, limit)
+        if scores[idx] > 0
+    ]
+
 def _normalize(text: str) -> Counter:
     tokens = [token.lower() for token in text.split() if token]
     return Counter(tokens)
-
-def _score(query_terms: Counter, doc_terms: Counter) -> float:
-    score = 0.0
-    for term, weight in query_terms.items():
-        freq = doc_terms.get(term, 0)
-        if freq:
-            score += (1 + math.log(freq)) * weight
-    return score
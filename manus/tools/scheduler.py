@@ -0,0 +1,219 @@
+"""Admission control for tool calls: per-class concurrency caps and fair queuing."""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import os
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, replace
+from typing import AsyncIterator, Callable, Iterable, Mapping
+
+@dataclass(frozen=True)
+class ResourceClass:
+    """Limits shared by every tool assigned to the class."""
+
+    name: str
+    max_concurrency: int
+    # 排队数超过该值的新调用直接拒绝（削峰），而不是无限堆积
+    max_queue: int = 64
+    # 排队超过该秒数仍未轮到则拒绝；None 表示只受调用方超时约束
+    max_wait: float | None = None
+    # 共享全局并发额度时，优先级高的类先被放行
+    priority: int = 0
+
+@dataclass
+class ResourceMetrics:
+    admitted: int = 0
+    rejected: int = 0
+    timed_out: int = 0
+    running: int = 0
+    queued: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.admitted if self.admitted else 0.0
+
+class ToolRejected(RuntimeError):
+    """A tool call was shed by admission control instead of being queued."""
+
+    def __init__(self, tool: str, resource: str, reason: str):
+        super().__init__(f"{tool} 被拒绝执行（资源类 {resource}: {reason}）")
+        self.tool = tool
+        self.resource = resource
+        self.reason = reason
+
+@dataclass(eq=False)
+class _Waiter:
+    resource: ResourceClass
+    run_id: str | None
+    seq: int
+    future: asyncio.Future = field(repr=False)
+
+class ToolScheduler:
+    """Admits tool calls under per-class and global concurrency caps.
+
+    Each tool maps to a ``ResourceClass`` (unassigned tools use ``default``).
+    When a slot frees up, the next waiter is chosen by class priority, then by
+    how few slots its agent run currently holds in that class, then by
+    arrival, so one busy run cannot monopolise a class. Full queues and waits
+    beyond ``max_wait`` raise ``ToolRejected``.
+    """
+
+    def __init__(
+        self,
+        classes: Iterable[ResourceClass] = (),
+        *,
+        assignments: Mapping[str, str] | None = None,
+        default: ResourceClass | None = None,
+        max_total: int | None = None,
+    ):
+        self.default = default or ResourceClass("default", max_concurrency=32, max_queue=256)
+        self.classes: dict[str, ResourceClass] = {}
+        self._metrics: dict[str, ResourceMetrics] = {}
+        for resource in (self.default, *classes):
+            self.add_class(resource)
+        self.assignments = dict(assignments or {})
+        self.max_total = max_total
+        self._waiters: list[_Waiter] = []
+        self._running_total = 0
+        # (资源类, run_id) -> 正在占用的名额数，用于在并发的 run 之间公平放行
+        self._active: dict[tuple[str, str | None], int] = defaultdict(int)
+        self._seq = itertools.count()
+
+    @classmethod
+    def default_limits(cls) -> "ToolScheduler":
+        """Caps for the built-in tools: CPU-bound Python and file I/O are bounded."""
+        cpus = os.cpu_count() or 4
+        return cls(
+            [
+                ResourceClass("compute", max_concurrency=cpus, max_queue=4 * cpus, priority=-1),
+                ResourceClass("file_io", max_concurrency=8, max_queue=64),
+            ],
+            assignments={"execute_python": "compute", "parse_file": "file_io", "find_in_files": "file_io"},
+            max_total=64,
+        )
+
+    def add_class(self, resource: ResourceClass) -> None:
+        self.classes[resource.name] = resource
+        self._metrics.setdefault(resource.name, ResourceMetrics())
+
+    def assign(self, tool_name: str, resource: str) -> None:
+        if resource not in self.classes:
+            raise KeyError(f"未知资源类: {resource}")
+        self.assignments[tool_name] = resource
+
+    def resource_for(self, tool_name: str) -> ResourceClass:
+        return self.classes[self.assignments.get(tool_name, self.default.name)]
+
+    def metrics(self) -> dict[str, ResourceMetrics]:
+        """Snapshot of admission counters and queue waits per resource class."""
+        return {name: replace(metrics) for name, metrics in self._metrics.items()}
+
+    @asynccontextmanager
+    async def slot(self, tool_name: str, *, run_id: str | None = None) -> AsyncIterator[float]:
+        """Hold one slot of the tool's class; yields the seconds spent queued."""
+        resource = self.resource_for(tool_name)
+        waited = await self._acquire(tool_name, resource, run_id)
+        try:
+            yield waited
+        finally:
+            self._release(resource, run_id)
+
+    async def acquire(self, tool_name: str, *, run_id: str | None = None) -> Callable[[], None]:
+        """Take one slot and return a callback that gives it back (safe to call twice).
+
+        Unlike ``slot``, the holder decides when the slot ends, e.g. only once
+        a worker thread the call started has actually finished.
+        """
+        resource = self.resource_for(tool_name)
+        await self._acquire(tool_name, resource, run_id)
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._release(resource, run_id)
+
+        return release
+
+    async def _acquire(self, tool_name: str, resource: ResourceClass, run_id: str | None) -> float:
+        metrics = self._metrics[resource.name]
+        # 有空闲名额时队列里必然没有可放行的等待者，直接进入
+        if self._has_capacity(resource):
+            self._grant(resource, run_id)
+            metrics.admitted += 1
+            return 0.0
+        if metrics.queued >= resource.max_queue:
+            metrics.rejected += 1
+            raise ToolRejected(tool_name, resource.name, "队列已满")
+        waiter = _Waiter(resource, run_id, next(self._seq), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        metrics.queued += 1
+        started = time.monotonic()
+        try:
+            if resource.max_wait is None:
+                await waiter.future
+            else:
+                await asyncio.wait_for(asyncio.shield(waiter.future), resource.max_wait)
+        except BaseException as exc:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                metrics.queued -= 1
+            elif waiter.future.done() and not waiter.future.cancelled():
+                # 刚被放行就被取消：把名额还回去
+                self._release(resource, run_id)
+            if isinstance(exc, asyncio.TimeoutError):
+                metrics.timed_out += 1
+                raise ToolRejected(tool_name, resource.name, "排队超时") from None
+            raise
+        waited = time.monotonic() - started
+        metrics.admitted += 1
+        metrics.total_wait += waited
+        metrics.max_wait = max(metrics.max_wait, waited)
+        return waited
+
+    def _release(self, resource: ResourceClass, run_id: str | None) -> None:
+        self._metrics[resource.name].running -= 1
+        self._running_total -= 1
+        key = (resource.name, run_id)
+        self._active[key] -= 1
+        if not self._active[key]:
+            del self._active[key]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while True:
+            for waiter in [w for w in self._waiters if w.future.cancelled()]:
+                self._waiters.remove(waiter)
+                self._metrics[waiter.resource.name].queued -= 1
+            eligible = [w for w in self._waiters if self._has_capacity(w.resource)]
+            if not eligible:
+                return
+            waiter = min(
+                eligible,
+                key=lambda w: (
+                    -w.resource.priority,
+                    self._active.get((w.resource.name, w.run_id), 0),
+                    w.seq,
+                ),
+            )
+            self._waiters.remove(waiter)
+            self._metrics[waiter.resource.name].queued -= 1
+            self._grant(waiter.resource, waiter.run_id)
+            waiter.future.set_result(None)
+
+    def _grant(self, resource: ResourceClass, run_id: str | None) -> None:
+        self._metrics[resource.name].running += 1
+        self._running_total += 1
+        self._active[(resource.name, run_id)] += 1
+
+    def _has_capacity(self, resource: ResourceClass) -> bool:
+        if self.max_total is not None and self._running_total >= self.max_total:
+            return False
+        return self._metrics[resource.name].running < resource.max_concurrency
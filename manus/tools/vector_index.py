@@ -0,0 +1,64 @@
+"""Feature-hashed character n-gram embeddings for offline dense retrieval."""
+
+from __future__ import annotations
+
+import math
+import re
+import zlib
+from collections import Counter
+from typing import Sequence
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+
+class HashedEmbedder:
+    """Maps text to L2-normalised float32 vectors without any model or network.
+
+    Character n-grams work for CJK text where whitespace tokenization yields a
+    single token per sentence, and for English words alike.
+    """
+
+    def __init__(self, *, dim: int = 2048, ngram_range: tuple[int, int] = (1, 3)):
+        if dim <= 0 or dim & (dim - 1):
+            raise ValueError("dim 必须是 2 的幂")
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for gram, count in self._ngrams(text).items():
+            digest = zlib.crc32(gram.encode("utf-8"))
+            sign = -1.0 if digest & 0x80000000 else 1.0
+            vector[digest & (self.dim - 1)] += sign * (1.0 + math.log(count))
+        norm = float(np.linalg.norm(vector))
+        if norm:
+            vector /= norm
+        return vector
+
+    def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            matrix[row] = self.embed(text)
+        return matrix
+
+    def _ngrams(self, text: str) -> Counter:
+        normalized = _WHITESPACE.sub(" ", text.lower()).strip()
+        low, high = self.ngram_range
+        grams: Counter = Counter()
+        for n in range(low, high + 1):
+            for start in range(len(normalized) - n + 1):
+                gram = normalized[start : start + n]
+                if not gram.isspace():
+                    grams[gram] += 1
+        return grams
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` largest scores, best first, via ``argpartition``."""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
@@ -0,0 +1,110 @@
+import asyncio
+
+from manus.agents.orchestrator import ManusAgent
+from manus.agents.replay import replay_run, run_record
+from manus.config import ManusSettings
+from manus.llm import (
+    Cassette,
+    ChatCompletion,
+    ChatMessage,
+    LLMClient,
+    RecordingLLMClient,
+    ReplayLLMClient,
+    Usage,
+)
+from manus.tools import ToolInput, ToolOutput, ToolRegistry
+from manus.tools.base import FunctionTool
+
+
+class ScriptedLLM(LLMClient):
+    def __init__(self, plan: str):
+        self.plan = plan
+        self.calls = 0
+
+    async def chat(self, messages, *, temperature, max_tokens, model, tools=None):
+        self.calls += 1
+        if "请基于上述记录" in messages[-1].content:
+            return ChatCompletion(content=f"答案: {messages[1].content[-8:]}", raw={"id": "s"})
+        return ChatCompletion(content=self.plan, raw={"id": "p"})
+
+
+def _registry(output: str = "42") -> ToolRegistry:
+    async def echo(tool_input: ToolInput) -> ToolOutput:
+        return ToolOutput(content=output, metadata={})
+
+    registry = ToolRegistry()
+    registry.register(FunctionTool(name="echo", description="echo", func=echo))
+    return registry
+
+
+def _record(tmp_path) -> Cassette:
+    cassette = Cassette()
+    settings = ManusSettings(max_steps=2)
+    client = RecordingLLMClient(ScriptedLLM("1. 计算 [tool: echo]"), cassette)
+    agent = ManusAgent(settings=settings, llm_client=client, tool_registry=_registry())
+    result = asyncio.run(agent.arun("算一下"))
+    cassette.add_run(run_record(result, settings, elapsed=0.5))
+    path = tmp_path / "run.jsonl"
+    cassette.save(path)
+    return Cassette.load(path)
+
+
+def test_replay_matches_recording_without_llm(tmp_path):
+    cassette = _record(tmp_path)
+
+    assert len(cassette.interactions) == 2
+    assert cassette.runs[0]["settings"]["llm"].get("api_key") is None
+    report = asyncio.run(replay_run(cassette, cassette.runs[0], tool_registry=_registry()))
+
+    assert report.ok, report.diffs
+    assert (report.hits, report.misses) == (2, 0)
+    assert [tool for tool, _, _ in report.steps] == ["echo"]
+
+
+def test_replay_reports_divergence(tmp_path):
+    cassette = _record(tmp_path)
+
+    lenient = asyncio.run(replay_run(cassette, cassette.runs[0], tool_registry=_registry("43")))
+    assert lenient.misses == 1
+    assert lenient.diffs == []  # 按顺序回退到录制的总结
+
+    strict = asyncio.run(
+        replay_run(cassette, cassette.runs[0], tool_registry=_registry("43"), strict=True)
+    )
+    assert not strict.ok
+    assert "没有匹配的请求" in strict.diffs[0]
+
+
+def test_replay_simulates_recorded_latency(tmp_path):
+    cassette = _record(tmp_path)
+    for interaction in cassette.interactions:
+        interaction["latency"] = 0.1
+
+    report = asyncio.run(
+        replay_run(cassette, cassette.runs[0], tool_registry=_registry(), simulate_latency=True)
+    )
+
+    assert report.elapsed >= 0.2
+
+
+def test_recording_client_records_streamed_completions():
+    class StreamingLLM(LLMClient):
+        async def chat(self, messages, *, temperature, max_tokens, model, tools=None):
+            raise AssertionError("应走流式接口")
+
+        async def stream_chat(self, messages, *, temperature, max_tokens, model):
+            yield ChatCompletion(content="1. 计算", raw={})
+            yield ChatCompletion(content=" [tool: echo]", raw={}, usage=Usage(prompt_tokens=7, completion_tokens=4))
+
+    async def collect(client):
+        options = {"temperature": 0.0, "max_tokens": 64, "model": "m"}
+        return [chunk async for chunk in client.stream_chat([ChatMessage("user", "算一下")], **options)]
+
+    cassette = Cassette()
+    chunks = asyncio.run(collect(RecordingLLMClient(StreamingLLM(), cassette)))
+
+    assert [chunk.content for chunk in chunks] == ["1. 计算", " [tool: echo]"]
+    assert cassette.interactions[0]["response"]["content"] == "1. 计算 [tool: echo]"
+    replayed = asyncio.run(collect(ReplayLLMClient(cassette.interactions, strict=True)))
+    assert [chunk.content for chunk in replayed] == ["1. 计算 [tool: echo]"]
+    assert replayed[0].usage == Usage(prompt_tokens=7, completion_tokens=4)
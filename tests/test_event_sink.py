@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from manus.agents.flows import AgentEvent
+from manus.agents.orchestrator import ManusAgent
+from manus.config import ManusSettings
+from manus.events import JsonlEventSink, read_events
+from manus.llm import ChatCompletion, LLMClient
+
+
+def test_sink_stores_large_strings_once_and_resolves_refs(tmp_path):
+    sink = JsonlEventSink(tmp_path, inline_limit=10, max_field_chars=50)
+    task = "任务描述" * 5
+    for step in range(3):
+        sink.write(
+            AgentEvent(type="tool", message=f"Step {step}", payload={"input": {"context": {"original_task": task}}}),
+            run_id="run-1",
+        )
+    sink.write(AgentEvent(type="final", message="答案", payload={"answer": "x" * 80}), run_id="run-1")
+    sink.close()
+
+    raw = next(tmp_path.glob("events-*.jsonl"))
+    assert raw.read_text(encoding="utf-8").count(task) == 1
+
+    records = list(read_events(tmp_path))
+    assert [r["seq"] for r in records] == [1, 2, 3, 4]
+    assert all(r["payload"]["input"]["context"]["original_task"] == task for r in records[:3])
+    assert records[-1]["payload"]["answer"].startswith("x" * 50 + "…[truncated 30")
+
+
+def test_sink_rotates_segments_and_supports_gzip(tmp_path):
+    sink = JsonlEventSink(tmp_path, max_bytes=200, buffer_size=1, compress=True)
+    for idx in range(6):
+        sink.write(AgentEvent(type="tool", message=f"event {idx}", payload={"n": idx}), run_id="r")
+    sink.close()
+
+    assert len(list(tmp_path.glob("events-*.jsonl.gz"))) > 1
+    assert [r["payload"]["n"] for r in read_events(tmp_path)] == list(range(6))
+
+
+def test_concurrent_sinks_never_share_a_segment(tmp_path):
+    # 同一目录下的两个 sink（如两个进程）同一秒开始写，各自独占分段文件
+    first = JsonlEventSink(tmp_path, buffer_size=1)
+    second = JsonlEventSink(tmp_path, buffer_size=1)
+    for idx in range(3):
+        first.write(AgentEvent(type="tool", message="a", payload={"n": idx}), run_id="a")
+        second.write(AgentEvent(type="tool", message="b", payload={"n": idx}), run_id="b")
+    first.close()
+    second.close()
+
+    assert first.current_path is None
+    segments = sorted(tmp_path.glob("events-*.jsonl"))
+    assert len(segments) == 2
+    for segment in segments:
+        runs = {line.split('"run":"')[1][0] for line in segment.read_text(encoding="utf-8").splitlines()}
+        assert len(runs) == 1
+
+
+class PlanLLM(LLMClient):
+    async def chat(self, messages, *, temperature, max_tokens, model, tools=None):
+        return ChatCompletion(content="1. 计算 1+1 [tool: calculator]", raw={})
+
+
+def test_agent_can_skip_retaining_events_when_sink_is_set(tmp_path):
+    with pytest.raises(ValueError):
+        ManusAgent(settings=ManusSettings(), llm_client=PlanLLM(), retain_events=False)
+
+    sink = JsonlEventSink(tmp_path)
+    agent = ManusAgent(settings=ManusSettings(), llm_client=PlanLLM(), event_sink=sink, retain_events=False)
+    result = asyncio.run(agent.arun("任务"))
+    sink.close()
+
+    assert result["events"] == []
+    assert [r["type"] for r in read_events(tmp_path)] == ["plan", "tool", "final"]
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import pytest
+
+from manus.tools import FederatedSearchTool, LocalSearchTool, ToolInput
+
+
+def _corpus(path, docs):
+    path.write_text("\n".join(json.dumps(doc, ensure_ascii=False) for doc in docs), encoding="utf-8")
+    return path
+
+
+def _tool(tmp_path):
+    team_a = _corpus(
+        tmp_path / "a.jsonl",
+        [
+            {"title": "A1", "text": "router router router latency"},
+            {"title": "A2", "text": "router cache"},
+        ],
+    )
+    team_b = _corpus(tmp_path / "b.jsonl", [{"title": "B1", "text": "router"}, {"title": "B2", "text": "billing"}])
+    return FederatedSearchTool.from_paths({"team-a": team_a, "team-b": team_b}, top_k=3)
+
+
+def test_federated_search_merges_on_globally_comparable_scores(tmp_path):
+    tool = _tool(tmp_path)
+
+    output = asyncio.run(tool.arun(ToolInput(task="router", context={})))
+
+    results = output.metadata["results"]
+    # 弱分片的首条（B1 只出现一次 router）不会被抬到与 A1 并列
+    assert (results[0]["shard"], results[0]["title"]) == ("team-a", "A1")
+    assert results[0]["score"] == 1.0
+    assert results[1]["score"] == results[2]["score"] < 0.5
+    assert {r["title"] for r in results[1:]} == {"A2", "B1"}
+    tool.close()
+
+
+def test_federated_search_filters_shards_from_context(tmp_path):
+    tool = _tool(tmp_path)
+
+    output = asyncio.run(
+        tool.arun(ToolInput(task="router", context={"shards": ["team-b", "team-x"]}))
+    )
+
+    assert {r["shard"] for r in output.metadata["results"]} == {"team-b"}
+    assert output.metadata["missing_shards"] == ["team-x"]
+    tool.close()
+
+
+def test_federated_search_accepts_a_single_shard_name(tmp_path):
+    tool = _tool(tmp_path)
+
+    output = asyncio.run(tool.arun(ToolInput(task="router", context={"shards": "team-b"})))
+
+    assert [r["title"] for r in output.metadata["results"]] == ["B1"]
+    assert output.metadata["missing_shards"] == []
+    tool.close()
+
+
+def test_hybrid_federated_scores_match_a_single_merged_index(tmp_path):
+    docs_a = [{"title": "A1", "text": " ".join(["router"] * 6)}, {"title": "A2", "text": "router router router"}]
+    docs_b = [{"title": "B1", "text": "router"}, {"title": "B2", "text": "billing"}]
+    paths = {"a": _corpus(tmp_path / "a.jsonl", docs_a), "b": _corpus(tmp_path / "b.jsonl", docs_b)}
+    merged = LocalSearchTool(data_path=_corpus(tmp_path / "all.jsonl", docs_a + docs_b), mode="hybrid")
+    tool = FederatedSearchTool.from_paths(paths, mode="hybrid", normalize="none", top_k=3)
+
+    hits = asyncio.run(tool.search("router"))
+
+    # 弱分片 b 的词法分按全局最高分归一化，与合并成一个索引时一致
+    expected = {doc["title"]: score for score, doc in merged.search("router", 3)}
+    assert {doc["title"]: pytest.approx(score, abs=1e-5) for score, _, doc in hits} == expected
+    assert [doc["title"] for _, _, doc in hits][-1] == "B1"
+    with pytest.raises(ValueError):
+        tool.add_shard("lexical", LocalSearchTool(data_path=paths["a"]))
+    tool.close()
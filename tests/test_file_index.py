@@ -0,0 +1,146 @@
+import os
+import threading
+
+import pytest
+
+from manus.tools import TrigramIndex
+
+
+def _write(root, rel: str, text: str, mtime: int | None = None):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+    return path
+
+
+def test_candidates_are_filtered_by_trigrams_before_verification(tmp_path):
+    _write(tmp_path, "agent/loop.py", "def run_agent():\n    return plan_steps()\n")
+    _write(tmp_path, "agent/plan.py", "def plan_steps():\n    pass\n")
+    _write(tmp_path, "docs/notes.md", "nothing relevant here\n")
+    _write(tmp_path, "node_modules/pkg/index.js", "plan_steps()\n")
+    (tmp_path / "blob.bin").write_bytes(b"plan_steps\0\0")
+    index = TrigramIndex(tmp_path)
+
+    hits, stats = index.search("plan_steps")
+
+    assert stats["files_indexed"] == 4
+    assert stats["candidates"] == 2
+    # 文件名包含查询词的文件排在前面
+    assert [(hit.path, hit.line) for hit in hits] == [("agent/plan.py", 1), ("agent/loop.py", 2)]
+    assert hits[0].column == 5
+
+    hits, stats = index.search(r"def\s+\w+_agent", regex=True)
+    assert [(hit.path, hit.line) for hit in hits] == [("agent/loop.py", 1)]
+    assert stats["candidates"] == 1
+
+    hits, _ = index.search("PLAN_STEPS", case_sensitive=True)
+    assert hits == []
+    hits, _ = index.search("def", glob="*plan.py")
+    assert [hit.path for hit in hits] == ["agent/plan.py"]
+
+
+def test_alternation_falls_back_to_all_files(tmp_path):
+    _write(tmp_path, "a.py", "alpha = 1\n")
+    _write(tmp_path, "b.py", "beta = 2\n")
+    index = TrigramIndex(tmp_path)
+
+    hits, stats = index.search("alpha|beta", regex=True)
+
+    assert stats["candidates"] == 2
+    assert [hit.path for hit in hits] == ["a.py", "b.py"]
+    with pytest.raises(ValueError):
+        index.search("")
+
+
+def test_refresh_only_reindexes_changed_files(tmp_path):
+    keep = _write(tmp_path, "keep.py", "stable_marker = 1\n", mtime=1_000)
+    _write(tmp_path, "edit.py", "old_marker = 1\n", mtime=1_000)
+    gone = _write(tmp_path, "gone.py", "gone_marker = 1\n", mtime=1_000)
+    index = TrigramIndex(tmp_path)
+    assert index.refresh() == {"added": 3, "updated": 0, "removed": 0}
+
+    _write(tmp_path, "edit.py", "new_marker = 2\n", mtime=2_000)
+    gone.unlink()
+    _write(tmp_path, "added.py", "new_marker = 3\n")
+
+    # 查询不会在路径上遍历目录，沿用旧索引直到下一次 refresh
+    assert index.search("new_marker")[0] == []
+
+    assert index.refresh() == {"added": 1, "updated": 1, "removed": 1}
+    hits, stats = index.search("new_marker")
+    assert sorted(hit.path for hit in hits) == ["added.py", "edit.py"]
+    assert stats["files_indexed"] == 3
+    assert index.search("old_marker")[0] == []
+    assert index.search("gone_marker")[0] == []
+    assert keep.exists() and index.refresh() == {"added": 0, "updated": 0, "removed": 0}
+
+
+def test_replaced_ids_are_compacted_without_losing_postings(tmp_path):
+    _write(tmp_path, "a.py", "shared_marker = 0\n", mtime=1_000)
+    _write(tmp_path, "b.py", "shared_marker = 0\n", mtime=1_000)
+    index = TrigramIndex(tmp_path)
+    index.refresh()
+
+    for version in range(1, 4):
+        _write(tmp_path, "a.py", f"shared_marker = {version}\nmarker_{version} = 1\n", mtime=1_000 + version)
+        index.refresh()
+
+    # 三次修改后旧 id 多于存活文件，已触发压缩
+    assert len(index._paths) < 5
+    assert index.candidates(["shared_marker"]) == ["a.py", "b.py"]
+    assert index.candidates(["marker_3"]) == ["a.py"]
+    assert index.candidates(["marker_1"]) == []
+
+
+def test_symlinks_are_not_indexed(tmp_path):
+    outside = tmp_path / "outside"
+    _write(outside, "secret.txt", "secret_marker\n")
+    root = tmp_path / "repo"
+    _write(root, "real.py", "visible_marker = 1\n")
+    (root / "link.txt").symlink_to(outside / "secret.txt")
+    (root / "linked_dir").symlink_to(outside, target_is_directory=True)
+    index = TrigramIndex(root)
+
+    assert index.search("secret_marker")[0] == []
+    assert [hit.path for hit in index.search("visible_marker")[0]] == ["real.py"]
+    assert len(index) == 1
+
+
+def test_verification_is_capped_with_name_matches_first(tmp_path):
+    for idx in range(5):
+        _write(tmp_path, f"mod{idx}.py", "import common_helper\n")
+    _write(tmp_path, "z_common_helper.py", "def common_helper():\n    pass\n")
+    index = TrigramIndex(tmp_path, max_candidates=2)
+
+    hits, stats = index.search("common_helper")
+
+    assert (stats["candidates"], stats["verified"], stats["truncated"]) == (6, 2, True)
+    assert hits[0].path == "z_common_helper.py"
+    assert len({hit.path for hit in hits}) == 2
+
+
+def test_queries_are_not_blocked_while_a_refresh_reads_files(tmp_path, monkeypatch):
+    _write(tmp_path, "a.py", "alpha_marker = 1\n")
+    index = TrigramIndex(tmp_path)
+    index.refresh()
+    _write(tmp_path, "b.py", "beta_marker = 1\n")
+
+    reading, release = threading.Event(), threading.Event()
+    read_grams = index._read_grams
+
+    def slow_read(rel):
+        reading.set()
+        release.wait(5)
+        return read_grams(rel)
+
+    monkeypatch.setattr(index, "_read_grams", slow_read)
+    refresher = threading.Thread(target=index.refresh)
+    refresher.start()
+    assert reading.wait(5)
+    # 刷新卡在读文件上时，查询照常使用已有索引
+    assert [hit.path for hit in index.search("alpha_marker")[0]] == ["a.py"]
+    release.set()
+    refresher.join()
+    assert [hit.path for hit in index.search("beta_marker")[0]] == ["b.py"]
@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+import pytest
+
+from manus.agents.orchestrator import ManusAgent
+from manus.config import ManusSettings
+from manus.llm import ChatCompletion, LLMClient, ToolCall
+from manus.tools import build_default_registry
+
+
+class ToolCallingLLM(LLMClient):
+    def __init__(self, calls):
+        self.calls = calls
+        self.sent_tools = None
+
+    async def chat(self, messages, *, temperature, max_tokens, model, tools=None):
+        if tools is not None:
+            self.sent_tools = tools
+            return ChatCompletion(content="", raw={}, tool_calls=self.calls)
+        return ChatCompletion(content="done", raw={})
+
+
+def test_registry_validates_tool_arguments():
+    registry = build_default_registry()
+
+    assert registry.validate_arguments("calculator", {"expression": "1+1"}) == {"expression": "1+1"}
+    with pytest.raises(ValueError):
+        registry.validate_arguments("calculator", {})
+    with pytest.raises(ValueError):
+        registry.validate_arguments("batch_search", {"queries": ["a", 1]})
+    spec = {item["function"]["name"]: item for item in registry.as_openai_tools()}
+    assert spec["parse_file"]["function"]["parameters"]["required"] == ["path"]
+
+
+def test_function_call_plan_passes_validated_arguments_to_tools():
+    llm = ToolCallingLLM(
+        [
+            ToolCall(id="1", name="calculator", arguments=json.dumps({"expression": "6*7"})),
+            ToolCall(id="2", name="calculator", arguments="{}"),
+            ToolCall(id="3", name="missing_tool", arguments="{}"),
+            ToolCall(id="4", name="search", arguments=json.dumps({"query": "FlowToolcallAgent", "top_k": 1})),
+        ]
+    )
+    settings = ManusSettings(planner_mode="function_call")
+    agent = ManusAgent(settings=settings, llm_client=llm, tool_registry=build_default_registry())
+
+    result = asyncio.run(agent.arun("计算并检索"))
+
+    assert llm.sent_tools
+    plan = result["plan"]
+    assert [s.suggested_tool for s in plan.steps] == ["calculator", "search"]
+    assert "已丢弃无效调用" in plan.raw_text
+    tool_events = [e for e in result["events"] if e.type == "tool"]
+    assert tool_events[0].payload["output"]["metadata"]["value"] == 42
+    assert len(tool_events[1].payload["output"]["metadata"]["results"]) == 1
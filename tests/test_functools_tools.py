@@ -28,6 +28,23 @@ def test_parse_file_reads_repo_file(tmp_path):
         _run("parse_file", context={"path": str(outside_file)})
 
 
+def test_find_in_files_hits_feed_parse_file_paging():
+    found = _run("find_in_files", context={"query": "class TrigramIndex", "glob": "*.py"})
+    hit = found.metadata["hits"][0]
+    assert hit["path"] == "manus/tools/file_index.py"
+    assert found.content.startswith("manus/tools/file_index.py:")
+
+    # "path:line" 结果原样传给 parse_file，按行分页读取
+    page = _run("parse_file", context={"path": f"{hit['path']}:{hit['line']}", "max_lines": 3})
+    assert page.content.startswith("class TrigramIndex")
+    assert page.metadata["start_line"] == hit["line"]
+    assert page.metadata["next_line"] == hit["line"] + 3
+
+    head = _run("parse_file", context={"path": "README.md", "max_chars": 20})
+    rest = _run("parse_file", context={"path": "README.md", "offset": head.metadata["next_offset"], "max_chars": 20})
+    assert rest.metadata["offset"] == 20 and rest.content
+
+
 def test_execute_python_returns_stdout_and_result():
     code = "result = 3 * 7\nprint('value', result)"
     output = _run("execute_python", task=code)
@@ -38,3 +55,102 @@ def test_execute_python_returns_stdout_and_result():
 def test_qwen_search_alias_uses_local_index():
     output = _run("qwen_search", task="FlowToolcallAgent")
     assert output.metadata["results"]
+
+
+def test_execute_python_keeps_state_per_run():
+    registry = build_default_registry()
+
+    def run(code, tool="execute_python", **context):
+        tool_input = ToolInput(task=code, context=context)
+        return asyncio.run(registry.call(tool, tool_input))
+
+    first = run("data = [i * i for i in range(100)]", run_id="r1")
+    assert first.metadata["session_vars"] == ["data"]
+    assert first.metadata["session_bytes"] > 0
+
+    # 别名共享同一解释器会话，且上一步的变量可直接使用
+    second = run("result = sum(data)", tool="python", run_id="r1")
+    assert second.metadata["result"] == 328350
+    assert second.metadata["session_runs"] == 2
+    assert run("print('ok')", run_id="r1").metadata["result"] is None
+    # 相同的值再赋一次也算本步结果
+    assert run("result = 1", run_id="r1").metadata["result"] == 1
+    assert run("result = 1", run_id="r1").metadata["result"] == 1
+
+    assert "执行失败" in run("result = sum(data)", run_id="r2").content
+    assert run("", run_id="r1", reset=True).metadata["reset"] is True
+    assert "执行失败" in run("result = sum(data)", run_id="r1").content
+
+
+def test_interpreter_pool_evicts_idle_and_oversized_sessions(monkeypatch):
+    from manus.tools import InterpreterPool
+    from manus.tools.functools_component import _INTERPRETERS, _python_globals
+
+    now = [0.0]
+    pool = InterpreterPool(globals_factory=_python_globals, idle_timeout=10, max_sessions=2, clock=lambda: now[0])
+    pool.get("a").namespace["x"] = 1
+    now[0] = 5
+    pool.get("b")
+    now[0] = 12
+    assert pool.evict_idle() == ["a"]
+    pool.get("c")
+    pool.get("d")
+    assert "b" not in pool and len(pool) == 2
+
+    monkeypatch.setattr(_INTERPRETERS, "max_bytes", 10_000)
+    output = _run("execute_python", task="big = [i for i in range(5000)]", context={"run_id": "huge"})
+    assert output.metadata["session_reset"] is True
+    assert "huge" not in _INTERPRETERS
+
+
+def test_execute_python_runs_off_the_event_loop():
+    registry = build_default_registry()
+    ticks: list[int] = []
+
+    async def scenario():
+        async def ticker():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0.001)
+
+        task = asyncio.ensure_future(ticker())
+        await asyncio.sleep(0)
+        before = len(ticks)
+        code = "result = sum(i * i for i in range(2_000_000))\nprint('done')"
+        output = await registry.call("execute_python", ToolInput(task=code, context={}))
+        during = len(ticks) - before
+        task.cancel()
+        return output, during
+
+    output, during = asyncio.run(scenario())
+    assert output.content == "done"
+    # exec 在线程里执行，期间事件循环上的其他协程照常推进
+    assert during > 1
+
+
+def test_execute_python_serializes_runs_of_one_session():
+    registry = build_default_registry()
+    # 去掉调度器，避免 compute 类的并发上限先把两次调用串行化
+    registry.scheduler = None
+
+    async def scenario():
+        def call(code):
+            return registry.call("execute_python", ToolInput(task=code, context={"session_id": "shared"}))
+
+        slow = asyncio.ensure_future(call("result = 'slow'\nfor i in range(3_000_000):\n    pass"))
+        await asyncio.sleep(0.02)
+        fast = await call("x = 1")
+        return await slow, fast
+
+    slow, fast = asyncio.run(scenario())
+    # 后来的执行等前一次结束后才开始，不会清掉它的 result
+    assert slow.metadata["result"] == "slow"
+    assert fast.metadata["result"] is None
+
+
+def test_execute_python_schema_keeps_session_controls_host_side():
+    registry = build_default_registry()
+
+    assert set(registry.schema("execute_python")["properties"]) == {"code"}
+    with pytest.raises(ValueError):
+        registry.validate_arguments("execute_python", {"code": "1", "session_id": "other-run"})
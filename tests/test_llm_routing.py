@@ -0,0 +1,154 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from manus.llm import ChatCompletion, ChatMessage, HttpLLMClient, LLMClient, LLMEndpoint, RoutingLLMClient
+
+
+def _stub_server(name: str, delay: float):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(delay)
+            body = json.dumps({"choices": [{"message": {"content": name}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def stub_servers():
+    servers = {"fast": _stub_server("fast", 0.01), "slow": _stub_server("slow", 0.5)}
+    yield servers
+    for server in servers.values():
+        server.shutdown()
+
+
+def _endpoint(name, server):
+    host, port = server.server_address
+    return LLMEndpoint(name=name, client=HttpLLMClient(base_url=f"http://{host}:{port}", api_key="k"))
+
+
+async def _ask(client):
+    result = await client.chat([ChatMessage(role="user", content="hi")], temperature=0, max_tokens=8, model="m")
+    return result.content
+
+
+def test_router_prefers_lowest_latency_endpoint(stub_servers):
+    router = RoutingLLMClient([_endpoint(n, s) for n, s in stub_servers.items()])
+
+    async def scenario():
+        # 前两次请求分别探测两个 endpoint，之后应稳定路由到 fast
+        return [await _ask(router) for _ in range(4)]
+
+    answers = asyncio.run(scenario())
+
+    assert answers[2:] == ["fast", "fast"]
+    assert router.stats()["slow"].latency_ewma > router.stats()["fast"].latency_ewma
+
+
+def test_hedged_request_returns_first_response(stub_servers):
+    slow_first = [_endpoint("slow", stub_servers["slow"]), _endpoint("fast", stub_servers["fast"])]
+    router = RoutingLLMClient(slow_first, hedge_after=0.05)
+
+    answer = asyncio.run(_ask(router))
+
+    assert answer == "fast"
+    # slow 的请求被取消，没有记录延迟
+    assert router.stats()["slow"].latency_ewma is None
+    assert router.stats()["fast"].latency_ewma is not None
+
+
+class FlakyLLM(LLMClient):
+    def __init__(self):
+        self.calls = 0
+
+    async def chat(self, messages, *, temperature, max_tokens, model):
+        self.calls += 1
+        raise RuntimeError("boom")
+
+
+class EchoLLM(LLMClient):
+    async def chat(self, messages, *, temperature, max_tokens, model):
+        return ChatCompletion(content="ok", raw={})
+
+
+def _flaky_router(flaky, **options):
+    router = RoutingLLMClient([LLMEndpoint("flaky", flaky), LLMEndpoint("echo", EchoLLM())], **options)
+    router._stats["echo"].latency_ewma = 1.0
+    return router
+
+
+def test_failing_endpoint_is_demoted_before_it_ever_succeeds():
+    flaky = FlakyLLM()
+    router = _flaky_router(flaky)
+
+    async def scenario():
+        return [await _ask(router) for _ in range(5)]
+
+    # 首次探测失败后按先验延迟加错误惩罚排到 echo 之后
+    assert asyncio.run(scenario()) == ["ok"] * 5
+    assert flaky.calls == 1
+
+
+def test_failing_endpoint_is_circuit_broken():
+    flaky = FlakyLLM()
+    # 关闭错误惩罚，flaky 与 echo 得分相同，只能靠熔断跳过
+    router = _flaky_router(flaky, error_penalty=0.0, failure_threshold=2, cooldown=60)
+
+    async def scenario():
+        return [await _ask(router) for _ in range(5)]
+
+    assert asyncio.run(scenario()) == ["ok"] * 5
+    assert flaky.calls == 2
+    assert router.stats()["flaky"].open_until > 0
+
+
+def test_endpoints_with_same_name_keep_separate_stats():
+    router = RoutingLLMClient([LLMEndpoint("u", EchoLLM()), LLMEndpoint("u", FlakyLLM())])
+
+    asyncio.run(_ask(router))
+
+    assert set(router.stats()) == {"u", "u#2"}
+    assert router.stats()["u"].requests == 1
+    assert router.stats()["u#2"].requests == 0
+
+
+def test_http_client_pools_one_connection_pool_per_loop(stub_servers):
+    host, port = stub_servers["fast"].server_address
+    client = HttpLLMClient(base_url=f"http://{host}:{port}", api_key="k")
+
+    async def pooled():
+        assert await _ask(client) == "fast"
+        pool = await client._pooled_client()
+        assert await _ask(client) == "fast"
+        # 同一循环内复用同一个连接池
+        assert await client._pooled_client() is pool
+        return pool
+
+    first = asyncio.run(pooled())
+    # asyncio.run 结束时随循环一起关闭，不会泄漏连接
+    assert first.is_closed
+    second = asyncio.run(pooled())
+    assert second is not first and second.is_closed
+
+    async def explicit_close():
+        pool = await client._pooled_client()
+        await client.aclose()
+        return pool
+
+    assert asyncio.run(explicit_close()).is_closed
+    assert client._clients == {}
@@ -1,4 +1,8 @@
 import asyncio
+import json
+import os
+
+import pytest
 
 from manus.tools import ToolInput
 from manus.tools.local_search import LocalSearchTool
@@ -9,3 +13,95 @@ def test_local_search_returns_scored_results():
     output = asyncio.run(tool.arun(ToolInput(task="FlowToolcallAgent", context={})))
     assert "FlowToolcallAgent" in output.content
     assert output.metadata["results"]
+
+
+def _write_jsonl(path, docs):
+    path.write_text("\n".join(json.dumps(doc, ensure_ascii=False) for doc in docs), encoding="utf-8")
+
+
+def test_local_search_incremental_updates(tmp_path):
+    corpus = tmp_path / "corpus.jsonl"
+    _write_jsonl(corpus, [{"title": "Alpha", "text": "alpha router notes"}])
+    tool = LocalSearchTool(data_path=corpus)
+
+    tool.add_documents([{"title": "Beta", "text": "beta router guide"}])
+    assert [doc["title"] for _, doc in tool.search("router")] == ["Alpha", "Beta"]
+    with pytest.raises(ValueError):
+        tool.add_documents([{"title": "Beta", "text": "dup"}])
+
+    tool.upsert([{"title": "Beta", "text": "router router router"}])
+    assert tool.search("router")[0][1]["title"] == "Beta"
+
+    assert tool.remove_documents(["Alpha"]) == 1
+    assert [doc["title"] for doc in tool.documents] == ["Beta"]
+
+    # 热加载后运行时的增删改仍然生效
+    _write_jsonl(
+        corpus, [{"title": "Alpha", "text": "alpha router notes"}, {"title": "Delta", "text": "delta router"}]
+    )
+    assert tool.reload(force=True) is True
+    assert sorted(doc["title"] for doc in tool.documents) == ["Beta", "Delta"]
+    assert tool.search("router")[0][1]["text"] == "router router router"
+
+
+def test_runtime_edits_are_atomic_and_yield_to_later_file_edits(tmp_path):
+    corpus = tmp_path / "corpus.jsonl"
+    _write_jsonl(corpus, [{"title": "A", "text": "file v1"}])
+    tool = LocalSearchTool(data_path=corpus)
+
+    with pytest.raises(ValueError):
+        tool.add_documents([{"title": "B", "text": "b"}, {"title": "A", "text": "dup"}])
+    assert tool.reload(force=True) is True
+    # 失败的批量添加不会在热加载后冒出来
+    assert [doc["title"] for doc in tool.documents] == ["A"]
+
+    tool.upsert([{"title": "A", "text": "runtime"}, {"title": "C", "text": "c"}])
+    tool.reload(force=True)
+    assert {doc["title"]: doc["text"] for doc in tool.documents} == {"A": "runtime", "C": "c"}
+
+    # 文件之后修改了 A：以文件为准，运行时的旧版本被丢弃
+    _write_jsonl(corpus, [{"title": "A", "text": "file v2"}, {"title": "C", "text": "c"}])
+    tool.reload(force=True)
+    assert {doc["title"]: doc["text"] for doc in tool.documents} == {"A": "file v2", "C": "c"}
+    assert tool._overlay == {}
+
+
+def test_local_search_reload_keeps_unchanged_entries(tmp_path):
+    corpus = tmp_path / "corpus.jsonl"
+    _write_jsonl(corpus, [{"title": "Alpha", "text": "alpha"}, {"title": "Beta", "text": "beta"}])
+    tool = LocalSearchTool(data_path=corpus)
+    before = tool._snapshot
+    assert tool.reload() is False
+
+    _write_jsonl(corpus, [{"title": "Alpha", "text": "alpha"}, {"title": "Gamma", "text": "gamma"}])
+    stat = os.stat(corpus)
+    os.utime(corpus, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert tool.reload() is True
+    after = tool._snapshot
+    assert after.entries["Alpha"] is before.entries["Alpha"]
+    assert set(after.entries) == {"Alpha", "Gamma"}
+    # 旧快照不受影响
+    assert set(before.entries) == {"Alpha", "Beta"}
+
+
+def test_dense_mode_matches_cjk_queries():
+    lexical = LocalSearchTool()
+    dense = LocalSearchTool(mode="dense")
+    query = "支持代理参数与超时的浏览器会话"
+
+    assert lexical.search(query) == []
+    assert dense.search(query)[0][1]["title"] == "Browser Session"
+
+
+def _titles(hits):
+    return [doc["title"] for _, doc in hits]
+
+
+def test_hybrid_batch_search_matches_single_queries():
+    tool = LocalSearchTool(mode="hybrid", top_k=2)
+    queries = ["FlowToolcallAgent", "训练数据脚本", "重试与速率控制"]
+
+    batched = tool.search_many(queries)
+
+    assert [_titles(hits) for hits in batched] == [_titles(tool.search(q)) for q in queries]
+    assert batched[0][0][1]["title"] == "Flow Tool Service"
@@ -0,0 +1,85 @@
+from manus.memory import MemoryStore, SqliteMemoryStore
+
+
+def test_sqlite_store_resumes_session_tail(tmp_path):
+    db = tmp_path / "sessions.db"
+    store = SqliteMemoryStore(db, session_id="s1")
+    for idx in range(10):
+        store.add("tool", f"event {idx}", metadata={"idx": idx})
+    other = SqliteMemoryStore(db, session_id="s2")
+    other.add("tool", "other session")
+    store.close()
+    other.close()
+
+    resumed = SqliteMemoryStore(db, session_id="s1", cache_size=3)
+
+    assert len(resumed) == 10
+    assert [e.content for e in resumed.tail(2)] == ["event 8", "event 9"]
+    assert resumed.tail(1)[0].metadata == {"idx": 9}
+    # 超出缓存窗口的部分从 SQLite 读取
+    assert [e.content for e in resumed.tail(5)] == [f"event {i}" for i in range(5, 10)]
+    assert resumed.as_prompt(1) == [{"role": "tool", "content": "event 9"}]
+    assert SqliteMemoryStore.list_sessions(db) == ["s1", "s2"]
+    resumed.close()
+
+
+def test_sqlite_store_appends_after_resume_and_clears(tmp_path):
+    db = tmp_path / "sessions.db"
+    store = SqliteMemoryStore(db, session_id="s1")
+    store.add("tool", "first")
+    store.close()
+
+    resumed = SqliteMemoryStore(db, session_id="s1")
+    resumed.add("tool", "second")
+    resumed.flush()
+    assert [e.content for e in resumed.tail(5)] == ["first", "second"]
+
+    resumed.clear()
+    resumed.close()
+    with SqliteMemoryStore(db, session_id="s1") as cleared:
+        assert len(cleared) == 0
+
+
+def test_memory_search_ranks_english_and_cjk():
+    store = MemoryStore()
+    store.add("tool", "weather in Paris is sunny")
+    store.add("tool", "上海今天的天气多云转晴")
+    store.add("tool", "python execution finished")
+
+    assert store.search("paris weather", k=1)[0].content == "weather in Paris is sunny"
+    assert store.search("上海天气", k=1)[0].content == "上海今天的天气多云转晴"
+    assert store.search("nothing relevant") == []
+
+
+def test_sqlite_search_reads_evicted_events(tmp_path):
+    db = tmp_path / "sessions.db"
+    store = SqliteMemoryStore(db, session_id="s1", cache_size=2)
+    store.add("tool", "季度营收报告：增长 12%")
+    for idx in range(5):
+        store.add("tool", f"event {idx}")
+    # 已被挤出窗口的事件仍可检索
+    assert store.search("营收报告", k=1)[0].content == "季度营收报告：增长 12%"
+    store.close()
+
+    # index_history=True 时为全部历史建索引，被挤出窗口的事件依旧能召回
+    with SqliteMemoryStore(db, session_id="s1", cache_size=2, index_history=True) as resumed:
+        assert resumed.search("营收报告", k=1)[0].content == "季度营收报告：增长 12%"
+    # 默认只索引恢复的尾部窗口
+    with SqliteMemoryStore(db, session_id="s1", cache_size=2) as windowed:
+        assert {event.content for event in windowed.search("event", k=5)} == {"event 3", "event 4"}
+
+
+def test_sqlite_reads_skip_flush_once_rows_are_committed(tmp_path, monkeypatch):
+    with SqliteMemoryStore(tmp_path / "sessions.db", session_id="s1", cache_size=2) as store:
+        for idx in range(5):
+            store.add("tool", f"event {idx}")
+        store.flush()
+
+        def fail():
+            raise AssertionError("不应阻塞等待写线程")
+
+        monkeypatch.setattr(store, "flush", fail)
+        # 早于缓存窗口的事件已提交，直接回表读取，窗口内的部分来自缓存
+        assert [e.content for e in store.tail(4)] == [f"event {i}" for i in range(1, 5)]
+        assert store._event_at(0).content == "event 0"
+        monkeypatch.undo()
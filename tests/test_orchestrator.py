@@ -0,0 +1,82 @@
+import asyncio
+
+from manus.agents.orchestrator import ManusAgent
+from manus.config import ManusSettings
+from manus.llm import ChatCompletion, LLMClient
+from manus.tools import ToolInput, ToolOutput, ToolRegistry
+from manus.tools.base import FunctionTool
+
+
+class ScriptedLLM(LLMClient):
+    def __init__(self, plan: str, *, summary_delay: float = 0.0):
+        self.plan = plan
+        self.summary_delay = summary_delay
+        self.prompts: list[str] = []
+        self.chat_contexts: list[str] = []
+
+    async def chat(self, messages, *, temperature, max_tokens, model):
+        self.prompts.append(messages[-1].content)
+        self.chat_contexts.append("\n".join(m.content for m in messages))
+        if messages[-1].content.startswith("任务"):
+            return ChatCompletion(content=self.plan, raw={})
+        await asyncio.sleep(self.summary_delay)
+        return ChatCompletion(content="总结完成", raw={})
+
+
+def _registry(seen_contexts: list[dict]) -> ToolRegistry:
+    async def fast(tool_input: ToolInput) -> ToolOutput:
+        seen_contexts.append(tool_input.context)
+        return ToolOutput(content="fast ok", metadata={})
+
+    async def slow(tool_input: ToolInput) -> ToolOutput:
+        await asyncio.sleep(5)
+        return ToolOutput(content="slow ok", metadata={})
+
+    registry = ToolRegistry()
+    registry.register(FunctionTool(name="fast", description="fast", func=fast))
+    registry.register(FunctionTool(name="slow", description="slow", func=slow))
+    return registry
+
+
+def test_tool_timeout_yields_partial_answer():
+    contexts: list[dict] = []
+    llm = ScriptedLLM("1. 慢步骤 [tool: slow]\n2. 快步骤 [tool: fast]")
+    settings = ManusSettings(tool_timeout=0.05)
+    agent = ManusAgent(settings=settings, llm_client=llm, tool_registry=_registry(contexts))
+
+    result = asyncio.run(agent.arun("任务"))
+
+    assert [e.type for e in result["events"]] == ["plan", "timeout", "tool", "final"]
+    final = result["events"][-1].payload
+    assert final["partial"] is True
+    assert final["incomplete_steps"] == [1]
+    assert result["answer"] == "总结完成"
+    assert "部分步骤未完成（原因：执行超时）" in llm.prompts[-1]
+    assert contexts[0]["timeout"] == 0.05
+
+
+def test_run_deadline_falls_back_to_finished_results():
+    contexts: list[dict] = []
+    llm = ScriptedLLM("1. 快步骤 [tool: fast]\n2. 慢步骤 [tool: slow]", summary_delay=5)
+    settings = ManusSettings(run_timeout=0.3)
+    agent = ManusAgent(settings=settings, llm_client=llm, tool_registry=_registry(contexts))
+
+    result = asyncio.run(agent.arun("任务"))
+
+    assert result["partial"] is True
+    assert "fast ok" in result["answer"]
+    assert "deadline" in contexts[0]
+
+
+def test_summary_recalls_relevant_history():
+    contexts: list[dict] = []
+    llm = ScriptedLLM("1. 快步骤 [tool: fast]")
+    settings = ManusSettings(summary_recall_k=2)
+    agent = ManusAgent(settings=settings, llm_client=llm, tool_registry=_registry(contexts))
+    agent.memory.add("tool", "季度营收报告：增长 12%")
+    for idx in range(10):
+        agent.memory.add("tool", f"无关记录 {idx}")
+
+    asyncio.run(agent.arun("任务：总结季度营收"))
+
+    assert "相关历史:\n季度营收报告" in llm.chat_contexts[-1]
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from manus.agents.orchestrator import ManusAgent
+from manus.config import ManusSettings
+from manus.llm import ChatCompletion, ChatMessage, HttpLLMClient, LLMClient
+from manus.tools import ToolInput, ToolOutput, ToolRegistry
+from manus.tools.base import FunctionTool
+
+_PLAN = ["好的，计划如下：\n", "1. 慢查询 [tool: slow]\n2. 快", "查询 [tool: fast]\n", "3. 再查 [tool: slow]"]
+
+
+class StreamingLLM(LLMClient):
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.finished_at: float | None = None
+
+    async def chat(self, messages, *, temperature, max_tokens, model, tools=None):
+        return ChatCompletion(content="总结", raw={})
+
+    async def stream_chat(self, messages, *, temperature, max_tokens, model):
+        for chunk in _PLAN:
+            yield ChatCompletion(content=chunk, raw={})
+            await asyncio.sleep(self.delay)
+        self.finished_at = time.perf_counter()
+
+
+def _registry(started: list[tuple[str, float]]) -> ToolRegistry:
+    def make(name: str, seconds: float):
+        async def run(tool_input: ToolInput) -> ToolOutput:
+            started.append((f"{name}{tool_input.context['step']}", time.perf_counter()))
+            await asyncio.sleep(seconds)
+            return ToolOutput(content=f"{name} done", metadata={})
+
+        return FunctionTool(name=name, description=name, func=run)
+
+    registry = ToolRegistry()
+    registry.register(make("slow", 0.1))
+    registry.register(make("fast", 0.0))
+    return registry
+
+
+def test_pipelined_steps_overlap_planning_and_commit_in_order():
+    started: list[tuple[str, float]] = []
+    llm = StreamingLLM(delay=0.05)
+    agent = ManusAgent(
+        settings=ManusSettings(planner_mode="pipelined"), llm_client=llm, tool_registry=_registry(started)
+    )
+
+    result = asyncio.run(agent.arun("任务"))
+
+    # 第一个工具在规划流结束前就已开始
+    assert started[0][1] < llm.finished_at
+    # 同一工具的步骤按计划顺序串行，不同工具可以重叠
+    assert [name for name, _ in started] == ["slow1", "fast2", "slow3"]
+    types = [event.type for event in result["events"]]
+    assert types == ["dispatch", "dispatch", "dispatch", "plan", "tool", "tool", "tool", "final"]
+    assert [e.message for e in result["events"] if e.type == "tool"] == [
+        "Step 1: slow",
+        "Step 2: fast",
+        "Step 3: slow",
+    ]
+    assert [e.content for e in agent.memory.tail(3)] == ["slow: slow done", "fast: fast done", "slow: slow done"]
+    assert [s.instruction for s in result["plan"].steps] == ["慢查询", "快查询", "再查"]
+    assert result["plan"].raw_text.startswith("好的")
+
+
+def test_pipelined_plan_timeout_keeps_dispatched_steps():
+    started: list[tuple[str, float]] = []
+    agent = ManusAgent(
+        settings=ManusSettings(planner_mode="pipelined", run_timeout=1.0),
+        llm_client=StreamingLLM(delay=0.5),
+        tool_registry=_registry(started),
+    )
+
+    result = asyncio.run(agent.arun("任务"))
+
+    plan_event = next(e for e in result["events"] if e.type == "plan")
+    assert plan_event.message == "规划超时"
+    # 超时前已收到的计划文本保留在 raw_text 中
+    assert result["plan"].raw_text.startswith("好的，计划如下：\n1. 慢查询")
+    assert [e.message for e in result["events"] if e.type == "tool"] == ["Step 1: slow"]
+    assert result["partial"] is True
+
+
+def _sse_server(chunks: list[str]):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            assert body["stream"] is True
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for text in chunks:
+                event = {"choices": [{"delta": {"content": text}}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+            usage = {"choices": [], "usage": {"prompt_tokens": 5, "completion_tokens": 3}}
+            self.wfile.write(f"data: {json.dumps(usage)}\n\ndata: [DONE]\n\n".encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_http_client_streams_sse_deltas():
+    server = _sse_server(["1. a", " [tool: x]\n", "2. b"])
+    host, port = server.server_address
+    client = HttpLLMClient(base_url=f"http://{host}:{port}", api_key="k")
+
+    async def collect():
+        chunks = []
+        async for chunk in client.stream_chat(
+            [ChatMessage(role="user", content="hi")], temperature=0, max_tokens=8, model="m"
+        ):
+            chunks.append(chunk)
+        await client.aclose()
+        return chunks
+
+    try:
+        chunks = asyncio.run(collect())
+    finally:
+        server.shutdown()
+
+    assert "".join(c.content for c in chunks) == "1. a [tool: x]\n2. b"
+    assert chunks[-1].usage.total_tokens == 8
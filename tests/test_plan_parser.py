@@ -1,4 +1,10 @@
-from manus.agents.planning import _parse_plan
+import asyncio
+
+from manus.agents.planning import PlanBuilder, _parse_plan, _plan_is_valid
+from manus.config import DEFAULT_PHASE, PLANNING_PHASE, ManusSettings, PhaseConfig
+from manus.llm import ChatCompletion, LLMClient
+from manus.memory import MemoryStore
+from manus.tools import build_default_registry
 
 
 def test_parse_plan_extracts_tool_annotations():
@@ -15,3 +21,56 @@ def test_parse_plan_extracts_tool_annotations():
     assert steps[1].suggested_tool == "calculator"
     assert steps[2].suggested_tool is None
     assert steps[2].instruction.startswith("汇总")
+
+
+class ModelScriptedLLM(LLMClient):
+    def __init__(self, replies: dict[str, str]):
+        self.replies = replies
+        self.calls: list[tuple[str, int]] = []
+
+    async def chat(self, messages, *, temperature, max_tokens, model):
+        self.calls.append((model, max_tokens))
+        return ChatCompletion(content=self.replies[model], raw={})
+
+
+def _build(settings: ManusSettings, llm: LLMClient):
+    planner = PlanBuilder(llm_client=llm, settings=settings)
+    return asyncio.run(planner.build("任务", MemoryStore(), build_default_registry()))
+
+
+def test_planning_phase_uses_its_own_model():
+    settings = ManusSettings()
+    settings.llm.model = "large"
+    settings.phases[PLANNING_PHASE] = PhaseConfig(model="small", max_tokens=128, escalate_to=DEFAULT_PHASE)
+    llm = ModelScriptedLLM({"small": "1. 检索资料 [tool: search]", "large": "unused"})
+
+    plan = _build(settings, llm)
+
+    assert llm.calls == [("small", 128)]
+    assert plan.model == "small" and not plan.escalated
+
+
+def test_planning_escalates_when_output_is_not_a_plan():
+    settings = ManusSettings()
+    settings.llm.model = "large"
+    settings.phases[PLANNING_PHASE] = PhaseConfig(model="small", escalate_to=DEFAULT_PHASE)
+    llm = ModelScriptedLLM(
+        {"small": "1. 用不存在的工具 [tool: nope]", "large": "1. 检索 [tool: search]\n2. 计算 [tool: calculator]"}
+    )
+
+    plan = _build(settings, llm)
+
+    assert [model for model, _ in llm.calls] == ["small", "large"]
+    assert plan.escalated and plan.model == "large"
+    assert [step.suggested_tool for step in plan.steps] == ["search", "calculator"]
+
+
+def test_mixed_case_tool_names_resolve_to_registered_tools():
+    registry = build_default_registry()
+
+    assert _plan_is_valid("1. 跑代码 [tool: PythonInterpreter]", registry)
+    assert _plan_is_valid("1. 跑代码 [tool: pythoninterpreter]", registry)
+    assert not _plan_is_valid("1. 跑代码 [tool: nope]", registry)
+    step = _parse_plan("1. 跑代码 [tool: PythonInterpreter]")[0]
+    assert registry.resolve(step.suggested_tool) == "PythonInterpreter"
+    assert registry.resolve("SEARCH") == "search"
@@ -0,0 +1,86 @@
+import asyncio
+
+from manus.agents.orchestrator import ManusAgent
+from manus.config import DEFAULT_PHASE, PLANNING_PHASE, ManusSettings, PhaseConfig
+from manus.llm import PROCESS_USAGE, ChatCompletion, ChatMessage, LLMClient, estimate_tokens, usage_for
+from manus.tools import ToolInput, ToolOutput, ToolRegistry
+from manus.tools.base import FunctionTool
+
+
+class MeteredLLM(LLMClient):
+    def __init__(self, plan: str = "1. 计算 [tool: echo]", usage: dict | None = None):
+        self.plan = plan
+        self.usage = usage
+        self.calls: list[int] = []
+
+    async def chat(self, messages, *, temperature, max_tokens, model, tools=None):
+        self.calls.append(max_tokens)
+        content = self.plan if messages[-1].content.startswith("任务") else "总结"
+        raw = {"usage": self.usage} if self.usage else {}
+        return ChatCompletion(content=content, raw=raw)
+
+
+def _agent(llm: LLMClient, **settings) -> ManusAgent:
+    async def echo(tool_input: ToolInput) -> ToolOutput:
+        return ToolOutput(content="42", metadata={})
+
+    registry = ToolRegistry()
+    registry.register(FunctionTool(name="echo", description="echo", func=echo))
+    return ManusAgent(settings=ManusSettings(**settings), llm_client=llm, tool_registry=registry)
+
+
+def test_estimates_when_provider_omits_usage():
+    assert estimate_tokens("你好世界") == 4
+    assert estimate_tokens("abcdefgh") == 2
+    messages = [ChatMessage(role="user", content="abcd")]
+    reported = usage_for(
+        ChatCompletion(content="x", raw={"usage": {"prompt_tokens": 7, "completion_tokens": 3}}), messages
+    )
+    assert (reported.total_tokens, reported.estimated) == (10, False)
+    estimated = usage_for(ChatCompletion(content="abcd", raw={}), messages)
+    assert estimated.estimated and estimated.completion_tokens == 1
+
+
+def test_run_usage_is_reported_per_phase():
+    PROCESS_USAGE.reset()
+    llm = MeteredLLM(usage={"prompt_tokens": 100, "completion_tokens": 20})
+    result = asyncio.run(_agent(llm).arun("任务"))
+
+    usage = result["usage"]
+    assert usage["total_tokens"] == 240
+    assert usage["phases"] == {"planning": 120, "summary": 120}
+    assert result["events"][-1].payload["usage"] == usage
+    assert PROCESS_USAGE.total.total_tokens == 240
+
+
+def test_run_budget_skips_escalation_and_shortens_summary():
+    PROCESS_USAGE.reset()
+    llm = MeteredLLM(plan="不可解析", usage={"prompt_tokens": 100, "completion_tokens": 20})
+    phases = {PLANNING_PHASE: PhaseConfig(escalate_to=DEFAULT_PHASE)}
+    agent = _agent(llm, run_token_budget=100, phases=phases)
+
+    result = asyncio.run(agent.arun("任务"))
+
+    # 超预算后既不升级重试，也不再调用总结模型
+    assert len(llm.calls) == 1
+    assert result["answer"].startswith("（token 预算已用尽")
+    assert result["usage"]["total_tokens"] == 120
+
+    llm = MeteredLLM(usage={"prompt_tokens": 100, "completion_tokens": 20})
+    asyncio.run(_agent(llm, run_token_budget=400).arun("任务"))
+    assert 64 <= llm.calls[-1] < 1024
+
+
+def test_process_budget_stops_planning():
+    PROCESS_USAGE.reset()
+    llm = MeteredLLM(usage={"prompt_tokens": 100, "completion_tokens": 20})
+    asyncio.run(_agent(llm, process_token_budget=100).arun("任务"))
+    assert PROCESS_USAGE.total.total_tokens == 120
+
+    llm.calls.clear()
+    result = asyncio.run(_agent(llm, process_token_budget=100).arun("任务"))
+
+    assert llm.calls == []
+    assert result["events"][0].message == "token 预算已用尽"
+    assert result["partial"] is True
+    PROCESS_USAGE.reset()
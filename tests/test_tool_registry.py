@@ -0,0 +1,38 @@
+from manus.tools import build_default_registry
+
+
+def test_prompt_block_collapses_aliases_and_is_memoized():
+    registry = build_default_registry()
+
+    block = registry.as_prompt_block()
+
+    assert "- execute_python: 执行 Python 代码（别名: PythonInterpreter, execute_python_qwen3, python）" in block
+    assert "\n- python:" not in block
+    assert registry.as_prompt_block() is block
+    assert registry.as_prompt_block(["python", "calculator"]) == registry.as_prompt_block(
+        ["calculator", "execute_python"]
+    )
+    # 别名依旧可以按名称调用
+    assert registry.get("PythonInterpreter").name == "PythonInterpreter"
+
+
+def test_shortlist_picks_relevant_tools_and_pinned_ones():
+    registry = build_default_registry()
+
+    names = registry.shortlist("查询上海的温度与风速", 2, pinned=["search"])
+
+    assert "get_temperature_and_windspeed" in names
+    assert "search" in names
+    assert names == sorted(names)
+    assert "execute_python" in registry.shortlist("用 PythonInterpreter 跑一下", 1)
+
+
+def test_shortlist_matches_tool_names_on_word_boundaries():
+    registry = build_default_registry()
+
+    # "research" 里包含 "search"，但不算点名
+    assert "search" not in registry.shortlist("write a research summary", 0)
+    assert "search" in registry.shortlist("please search:FlowToolcallAgent", 0)
+    assert registry.shortlist("调用python计算", 0) == ["execute_python"]
+    assert registry.aliases_of("execute_python") == ["PythonInterpreter", "execute_python_qwen3", "python"]
+    assert registry.aliases_of("python") == []
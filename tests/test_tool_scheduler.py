@@ -0,0 +1,193 @@
+import asyncio
+import threading
+
+import pytest
+
+from manus.agents.orchestrator import ManusAgent
+from manus.config import ManusSettings
+from manus.llm import ChatCompletion, LLMClient
+from manus.tools import (
+    ResourceClass,
+    ToolInput,
+    ToolOutput,
+    ToolRegistry,
+    ToolRejected,
+    ToolScheduler,
+    run_in_thread,
+)
+from manus.tools.base import FunctionTool
+
+
+def _scheduler(**limits) -> ToolScheduler:
+    return ToolScheduler([ResourceClass("heavy", **limits)], assignments={"work": "heavy"})
+
+
+def test_concurrency_cap_and_wait_metrics():
+    scheduler = _scheduler(max_concurrency=2)
+    running = peak = 0
+
+    async def job():
+        nonlocal running, peak
+        async with scheduler.slot("work"):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def main():
+        await asyncio.gather(*(job() for _ in range(6)))
+
+    asyncio.run(main())
+
+    metrics = scheduler.metrics()["heavy"]
+    assert peak == 2
+    assert (metrics.admitted, metrics.running, metrics.queued) == (6, 0, 0)
+    assert metrics.max_wait > 0
+
+
+def test_sheds_load_when_queue_full_or_wait_too_long():
+    async def hold(scheduler, seconds):
+        async with scheduler.slot("work"):
+            await asyncio.sleep(seconds)
+
+    async def main(scheduler):
+        results = await asyncio.gather(*(hold(scheduler, 0.05) for _ in range(3)), return_exceptions=True)
+        return [r for r in results if isinstance(r, ToolRejected)]
+
+    full = _scheduler(max_concurrency=1, max_queue=1)
+    rejected = asyncio.run(main(full))
+    assert [r.reason for r in rejected] == ["队列已满"]
+    assert full.metrics()["heavy"].rejected == 1
+
+    impatient = _scheduler(max_concurrency=1, max_wait=0.01)
+    rejected = asyncio.run(main(impatient))
+    assert {r.reason for r in rejected} == {"排队超时"}
+    assert impatient.metrics()["heavy"].timed_out == 2
+    assert impatient.metrics()["heavy"].queued == 0
+
+
+def test_cancelled_waiter_frees_its_queue_position():
+    scheduler = _scheduler(max_concurrency=1, max_queue=1)
+
+    async def hold():
+        async with scheduler.slot("work"):
+            await asyncio.sleep(0.05)
+
+    async def main():
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(hold(), 0.01)
+        await asyncio.gather(holder, hold())
+
+    asyncio.run(main())
+    metrics = scheduler.metrics()["heavy"]
+    assert (metrics.admitted, metrics.queued, metrics.rejected) == (2, 0, 0)
+
+
+def test_fair_admission_across_runs():
+    scheduler = _scheduler(max_concurrency=2)
+    order: list[str] = []
+
+    async def job(run_id):
+        async with scheduler.slot("work", run_id=run_id):
+            order.append(run_id)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        # run a 先占满两个名额并排队两次，随后到达的 run b 应先于 a 的剩余调用
+        tasks = [asyncio.create_task(job("a")) for _ in range(4)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(job("b")))
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order[:3] == ["a", "a", "b"]
+
+
+def test_priority_wins_shared_global_slots():
+    scheduler = ToolScheduler(
+        [ResourceClass("low", max_concurrency=4, priority=-1), ResourceClass("high", max_concurrency=4, priority=1)],
+        assignments={"bulk": "low", "chat": "high"},
+        max_total=1,
+    )
+    order: list[str] = []
+
+    async def job(name):
+        async with scheduler.slot(name):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        tasks = [asyncio.create_task(job("bulk")) for _ in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(job("chat")))
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order[:2] == ["bulk", "chat"]
+
+
+class PlanLLM(LLMClient):
+    def __init__(self):
+        self.prompts: list[str] = []
+
+    async def chat(self, messages, *, temperature, max_tokens, model, tools=None):
+        self.prompts.append(messages[-1].content)
+        if messages[-1].content.startswith("任务"):
+            return ChatCompletion(content="1. 计算 [tool: work]\n2. 再算 [tool: work]", raw={})
+        return ChatCompletion(content="总结", raw={})
+
+
+def test_agent_marks_rejected_steps_incomplete():
+    async def work(tool_input: ToolInput) -> ToolOutput:
+        return ToolOutput(content="ok", metadata={})
+
+    scheduler = _scheduler(max_concurrency=1, max_queue=0)
+    registry = ToolRegistry(scheduler=scheduler)
+    registry.register(FunctionTool(name="work", description="work", func=work))
+
+    llm = PlanLLM()
+
+    async def main():
+        agent = ManusAgent(settings=ManusSettings(), llm_client=llm, tool_registry=registry)
+        # 先占住唯一名额，使 agent 的调用被削峰
+        async with scheduler.slot("work"):
+            return await agent.arun("任务")
+
+    result = asyncio.run(main())
+
+    assert [e.type for e in result["events"]] == ["plan", "rejected", "rejected", "final"]
+    assert result["partial"] is True
+    assert result["events"][-1].payload["incomplete_steps"] == [1, 2]
+    # 总结提示说明真实原因，而不是一律归为超时
+    assert "原因：系统繁忙被限流" in llm.prompts[-1]
+    assert "超时" not in llm.prompts[-1]
+
+
+def test_timed_out_thread_keeps_its_slot_until_it_finishes():
+    gate = threading.Event()
+
+    async def work(tool_input: ToolInput) -> ToolOutput:
+        await run_in_thread(gate.wait, 5)
+        return ToolOutput(content="ok", metadata={})
+
+    scheduler = _scheduler(max_concurrency=1, max_queue=0)
+    registry = ToolRegistry(scheduler=scheduler)
+    registry.register(FunctionTool(name="work", description="work", func=work))
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(registry.call("work", ToolInput(task="", context={})), 0.05)
+        # 调用方已超时，但线程还在跑：名额不归还，新调用被削峰
+        assert scheduler.metrics()["heavy"].running == 1
+        with pytest.raises(ToolRejected):
+            await registry.call("work", ToolInput(task="", context={}))
+        gate.set()
+        for _ in range(200):
+            if scheduler.metrics()["heavy"].running == 0:
+                break
+            await asyncio.sleep(0.01)
+        return scheduler.metrics()["heavy"].running
+
+    assert asyncio.run(main()) == 0